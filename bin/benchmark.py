@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+
+"""
+Benchmarks the core traversals and the JSON schema normalizer and parser on synthetic inputs
+whose depth exceeds the recursion limit by far.
+Optionally measures time and memory for a JSON schema file.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import gc
+import itertools
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fences.core.node import Node, NoOpDecision, NoOpLeaf, Reference  # noqa: E402
+from fences.json_schema.normalize import normalize, check_normalized, NormalizationConfig  # noqa: E402
+from fences.json_schema.parse import parse, default_config  # noqa: E402
+from fences.json_schema.config import FormatSamples  # noqa: E402
+
+
+def measure(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<20} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def measure_memory(label: str, func):
+    gc.collect()
+    tracemalloc.start()
+    result = measure(label, func)
+    gc.collect()
+    print(f"{'':<20} {tracemalloc.get_traced_memory()[0] / 1e6:8.1f}MB")
+    tracemalloc.stop()
+    return result
+
+
+class _AnyFormat(dict):
+    # Accepts unknown string formats
+    def __missing__(self, key):
+        return FormatSamples()
+
+
+def benchmark_json_schema(file_name: str):
+    with open(file_name) as file:
+        schema = yaml.safe_load(file)
+    schema = measure_memory('normalize', lambda: normalize(schema, NormalizationConfig(full_merge=False)))
+    config = default_config()
+    config.normalize = False
+    config.format_samples = _AnyFormat(config.format_samples)
+    graph = measure_memory('parse', lambda: parse(schema, config))
+    print(f"{'':<20} {sum(1 for _ in graph.items()):8} nodes")
+    measure_memory('compile', graph.compile)
+    paths = measure_memory('generate_paths', lambda: list(graph.generate_paths()))
+    print(f"{'':<20} {len(paths):8} paths")
+    removed = measure('intern_leafs', graph.intern_leafs)
+    print(f"{'':<20} {removed:8} leafs removed")
+    print(f"{'':<20} {sum(1 for _ in graph.items()):8} nodes")
+    measure_memory('compile (interned)', graph.compile)
+    removed = measure('share_subgraphs', graph.share_subgraphs)
+    print(f"{'':<20} {removed:8} nodes removed")
+    print(f"{'':<20} {sum(1 for _ in graph.items()):8} nodes")
+    paths = measure_memory('generate_paths', lambda: list(graph.generate_paths()))
+    print(f"{'':<20} {len(paths):8} paths")
+
+
+def create_graph(depth: int) -> Node:
+    # Alternating all/any decisions, each level is connected by a reference
+    nodes = []
+    for idx in range(depth):
+        node = NoOpDecision(f"node{idx}", idx % 2 == 1)
+        node.add_transition(NoOpLeaf(None, False))
+        if idx + 1 < depth:
+            node.add_transition(Reference(None, f"node{idx+1}"))
+        else:
+            node.add_transition(NoOpLeaf(None, True))
+        nodes.append(node)
+    return nodes[0].resolve(nodes[1:])
+
+
+def create_schema(depth: int) -> dict:
+    schema = {}
+    sub_schema = schema
+    for _ in range(depth):
+        sub_schema['properties'] = {'a': {}}
+        sub_schema['required'] = ['a']
+        sub_schema = sub_schema['properties']['a']
+    sub_schema['type'] = 'string'
+    return schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=10000,
+                        help="Depth of the synthetic graph")
+    parser.add_argument('--schema-depth', type=int, default=10000,
+                        help="Depth of the synthetic JSON schema")
+    parser.add_argument('--samples', type=int, default=100,
+                        help="Number of paths to execute (and to generate for the synthetic JSON schema)")
+    parser.add_argument('--json-schema', type=str,
+                        help="JSON schema file (json or yaml) to measure time and memory for")
+    args = parser.parse_args()
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+
+    print(f"graph depth: {args.depth}")
+    root = measure('resolve', lambda: create_graph(args.depth))
+    measure('items', lambda: sum(1 for _ in root.items()))
+    paths = measure('generate_paths', lambda: list(root.generate_paths()))
+    measure('execute', lambda: [root.execute(i.path) for i in paths[:args.samples]])
+    plans = measure('compile_path', lambda: [root.compile_path(i.path) for i in paths[:args.samples]])
+    measure('execute_many', lambda: list(root.execute_many(plans)))
+    measure('optimize', root.optimize)
+
+    print(f"schema depth: {args.schema_depth}")
+    schema = create_schema(args.schema_depth)
+    normalized = measure('normalize', lambda: normalize(schema))
+    measure('check_normalized', lambda: check_normalized(normalized))
+    config = default_config()
+    config.normalize = False
+    graph = measure('parse', lambda: parse(normalized, config))
+    # The number of paths grows with the depth, only the first ones are generated
+    paths = measure('generate_paths', lambda: list(itertools.islice(graph.generate_paths(), args.samples)))
+    measure('execute', lambda: [graph.execute(i.path) for i in paths])
+
+    if args.json_schema:
+        print(f"json schema: {args.json_schema}")
+        benchmark_json_schema(args.json_schema)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ from fences import parse_json_schema
 from fences.json_schema.parse import default_config
 from fences.json_schema.normalize import normalize
 from fences.core.util import ConfusionMatrix
+from fences.output.sink import DirectorySink
 import json_schema_tool
 
 import os
@@ -14,19 +15,17 @@ import time
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 TEST_DATA_DIR = os.path.join(SCRIPT_DIR, 'test-data')
-TEST_DATA_DIR_VALID = os.path.join(TEST_DATA_DIR, 'valid')
-TEST_DATA_DIR_INVALID = os.path.join(TEST_DATA_DIR, 'invalid')
 def main():
     # Setting these to true will interfere with the time measurement
     save_to_file = False
     validate = False
+    sink = None
     if save_to_file:
         # Remove old data if any
         if os.path.exists(TEST_DATA_DIR):
             shutil.rmtree(TEST_DATA_DIR)
-        os.mkdir(TEST_DATA_DIR)
-        os.mkdir(TEST_DATA_DIR_VALID)
-        os.mkdir(TEST_DATA_DIR_INVALID)
+        sink = DirectorySink(TEST_DATA_DIR, partition=True,
+                             encode=lambda sample: json.dumps(sample, indent=2).encode())
 
     # Generate test data
     with open(os.path.join(SCRIPT_DIR, 'aas.yml')) as file:
@@ -47,27 +46,28 @@ def main():
     graph = parse_json_schema(schema, config)
 
     mat = ConfusionMatrix()
-    for idx, i in enumerate(graph.generate_paths()):
+    for i in graph.generate_paths():
         sample = graph.execute(i.path)
         if validate:
             ok = validator.validate(sample).ok
         else:
             ok = True
         if i.is_valid:
-            path = os.path.join(TEST_DATA_DIR, "valid", f"{idx}.json")
             if ok:
                 mat.valid_accepted += 1
             else:
                 mat.valid_rejected += 1
         else:
-            path = os.path.join(TEST_DATA_DIR, "invalid", f"{idx}.json")
             if ok:
                 mat.invalid_accepted += 1
             else:
                 mat.invalid_rejected += 1
 
-        if save_to_file:
-            json.dump(sample, open(path, "w"), indent=2)
+        if sink is not None:
+            sink.write(sample, i.is_valid)
+
+    if sink is not None:
+        sink.close()
 
     elapsed = int(time.perf_counter() - start)
     print(f"Took {elapsed} seconds")
@@ -0,0 +1,104 @@
+from .node import Node
+from .util import encode_key
+
+from typing import Optional, Callable
+import gc
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+_version: Optional[str] = None
+
+
+def _fences_version() -> str:
+    # Digest of the fences sources, changes with every release and every local modification
+    global _version
+    if _version is None:
+        digest = hashlib.sha256()
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for directory, sub_directories, files in os.walk(package_dir):
+            sub_directories.sort()
+            for file in sorted(files):
+                if file.endswith('.py'):
+                    path = os.path.join(directory, file)
+                    digest.update(os.path.relpath(path, package_dir).encode())
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+class GraphCache:
+    """
+    Content-addressed cache of graphs in a directory.
+
+    Graphs are stored together with their compiled representation, see Node.compile().
+    They are keyed by a hash of everything they are created from (e.g. the schema and the config)
+    and the version of fences.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *sources: any) -> str:
+        """
+        Returns the key of a graph created from the given sources.
+        Sources are json values, dataclasses, enums, sets and callables,
+        callables are identified by their name, code, captured values and defaults.
+        Raises a ValueError if the sources cannot be encoded, e.g. if they contain a cycle.
+        """
+        data = json.dumps([_fences_version(), *sources], sort_keys=True, default=encode_key)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _file_name(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pickle')
+
+    def load(self, key: str) -> Optional[Node]:
+        """
+        Returns the cached graph or None, if there is no (readable) entry for the key
+        """
+        # Loading creates many objects at once, the garbage collector would run repeatedly
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self._file_name(key), 'rb') as f:
+                graph = pickle.load(f)
+            root = graph.nodes[0]
+        except Exception:
+            # Unreadable, corrupted or written by an incompatible version
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return root
+
+    def store(self, key: str, root: Node):
+        """
+        Stores a graph, replaces an existing entry atomically
+        """
+        fd, tmp_file_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(root.compile(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file_name, self._file_name(key))
+        except BaseException:
+            os.remove(tmp_file_name)
+            raise
+
+    def get(self, create: Callable[[], Node], *sources: any) -> Node:
+        """
+        Returns the cached graph for the given sources, calls create() to create it on a cache miss.
+        If the sources cannot be encoded, the graph is not cached.
+        """
+        try:
+            key = self.key(*sources)
+        except ValueError:
+            return create()
+        root = self.load(key)
+        if root is None:
+            root = create()
+            self.store(key, root)
+        return root
@@ -0,0 +1,850 @@
+from .node import Node, Decision, Leaf, ResultEntry, Path, OutgoingTransition, IncomingTransition
+from .exception import InternalException
+from .util import BitSet
+
+from typing import List, Optional, Tuple, Generator, Callable, Iterable
+from array import array
+from collections import deque
+import copy
+import heapq
+
+# Distance of unreachable nodes, larger than any actual distance.
+# All indices and distances are stored in arrays of 32 bit integers.
+INFINITE_DISTANCE = 2**31 - 1
+
+
+class CompiledGraph:
+    """
+    Frozen, integer-indexed representation of a graph.
+
+    Nodes are numbered in the order of Node.items(), the root has index 0.
+    Transitions are stored in compressed sparse row (CSR) format and are
+    identified by their position in succ_targets:
+    - the outgoing transitions of node i are succ_offsets[i] ... succ_offsets[i+1]-1
+    - the incoming transitions of node i are pred_edges[pred_offsets[i]:pred_offsets[i+1]]
+
+    Create instances using Node.compile().
+    The graph must not be modified afterwards.
+
+    Instances can be pickled, even if the graph is too deep to be pickled directly.
+    Unpickling creates a copy of the graph, its root is nodes[0].
+    """
+
+    def __init__(self, root: Node) -> None:
+        self.nodes: List[Node] = list(root.items())
+        index = {id(node): idx for idx, node in enumerate(self.nodes)}
+        num_nodes = len(self.nodes)
+
+        # Node properties
+        self.all_transitions = bytearray(num_nodes)
+        self.is_decision = bytearray(num_nodes)
+        self.is_leaf = bytearray(num_nodes)
+        self.is_valid = bytearray(num_nodes)
+
+        # Outgoing transitions
+        self.succ_offsets = array('i', [0])
+        self.succ_targets = array('i')
+        self.edge_sources = array('i')
+        for idx, node in enumerate(self.nodes):
+            if isinstance(node, Decision):
+                self.is_decision[idx] = True
+                self.all_transitions[idx] = node.all_transitions
+                for transition in node.outgoing_transitions:
+                    self.succ_targets.append(index[id(transition.target)])
+                    self.edge_sources.append(idx)
+            elif isinstance(node, Leaf):
+                self.is_leaf[idx] = True
+                self.is_valid[idx] = node.is_valid
+            self.succ_offsets.append(len(self.succ_targets))
+
+        # Incoming transitions
+        # Their order is kept since it decides between routes of equal length
+        self.pred_offsets = array('i', [0])
+        self.pred_edges = array('i')
+        for idx, node in enumerate(self.nodes):
+            for transition in node.incoming_transitions:
+                source = index.get(id(transition.source))
+                if source is None:
+                    # Source is not reachable from the root
+                    continue
+                edge = self.succ_offsets[source] + transition.outgoing_idx
+                if edge >= self.succ_offsets[source+1] or self.succ_targets[edge] != idx:
+                    raise InternalException(
+                        f"Incoming transition of node {idx} has no outgoing counterpart")
+                self.pred_edges.append(edge)
+            self.pred_offsets.append(len(self.pred_edges))
+
+        # Distance analysis, both indexed by transition, INFINITE_DISTANCE if unreachable
+        num_edges = len(self.succ_targets)
+        self.len_to_root = array('i', [INFINITE_DISTANCE]) * num_edges
+        self.len_to_valid_node = array('i', [INFINITE_DISTANCE]) * num_edges
+        self._analyze_forwards()
+        self._analyze_backwards()
+        self._build_route_tree()
+        self._build_completions()
+
+        # Bound apply() functions, created by compile_path()
+        self._applies: Optional[List[Callable[[any], any]]] = None
+        self._mark_compiled()
+
+    def __getstate__(self):
+        # The nodes are pickled without their transitions, which are restored from
+        # the CSR arrays. Otherwise, pickling would recurse once per level of the graph.
+        state = self.__dict__.copy()
+        state['nodes'] = [_detach(node) for node in self.nodes]
+        state['_applies'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for node in range(len(self.nodes)):
+            if self.is_decision[node]:
+                self.nodes[node].outgoing_transitions = [
+                    OutgoingTransition(self.nodes[target])
+                    for target in self.succ_targets[self.succ_offsets[node]:self.succ_offsets[node+1]]
+                ]
+        for node in range(len(self.nodes)):
+            for edge in self.pred_edges[self.pred_offsets[node]:self.pred_offsets[node+1]]:
+                source = self.edge_sources[edge]
+                self.nodes[node].incoming_transitions.append(
+                    IncomingTransition(self.nodes[source], edge - self.succ_offsets[source]))
+        # The restored graph is compiled already
+        self._mark_compiled()
+
+    def _mark_compiled(self):
+        # Caches this graph in its root until one of its nodes is modified, see Node._invalidate()
+        for node in self.nodes:
+            if node._compiled is None:
+                node._compiled = _COMPILED
+        self.nodes[0]._compiled = self
+
+    def _analyze_forwards(self):
+        # Length of the shortest route from the root to the source of each transition
+        # Breadth first search, each node is visited once
+        distance = [None] * len(self.nodes)
+        distance[0] = 0
+        queue = deque([0])
+        while queue:
+            node = queue.popleft()
+            for edge in range(self.succ_offsets[node], self.succ_offsets[node+1]):
+                self.len_to_root[edge] = distance[node]
+                target = self.succ_targets[edge]
+                if distance[target] is None:
+                    distance[target] = distance[node] + 1
+                    queue.append(target)
+
+    def _analyze_backwards(self):
+        # Length of the shortest completion of each transition's target to valid leafs:
+        # - a valid leaf has length 0
+        # - a decision having all_transitions set has the maximum length of its transitions
+        # - any other decision has the minimum length of its transitions plus one
+        # Multi-source breadth first search starting at all valid leafs.
+        # Nodes are finalized in order of increasing length, so steps of length 0
+        # (all_transitions) are queued at the front, steps of length 1 at the back.
+        num_nodes = len(self.nodes)
+        distance = [INFINITE_DISTANCE] * num_nodes
+        finalized = bytearray(num_nodes)
+        remaining = [self.succ_offsets[idx+1] - self.succ_offsets[idx] for idx in range(num_nodes)]
+        queue = deque()
+        for idx in range(num_nodes):
+            if self.is_leaf[idx] and self.is_valid[idx]:
+                distance[idx] = 0
+                queue.append(idx)
+
+        while queue:
+            node = queue.popleft()
+            if finalized[node]:
+                continue
+            finalized[node] = True
+            length = distance[node]
+            for idx in range(self.pred_offsets[node], self.pred_offsets[node+1]):
+                edge = self.pred_edges[idx]
+                self.len_to_valid_node[edge] = length
+                source = self.edge_sources[edge]
+                if finalized[source]:
+                    continue
+                if self.all_transitions[source]:
+                    # All transitions are known once the last one is finalized
+                    remaining[source] -= 1
+                    if remaining[source] == 0:
+                        distance[source] = length
+                        queue.appendleft(source)
+                elif distance[source] > length + 1:
+                    distance[source] = length + 1
+                    queue.append(source)
+
+    def _build_route_tree(self):
+        # Transition leading to each node on its shortest route from the root.
+        # Among routes of equal length, the first incoming transition wins.
+        self.route_edge = array('i', [-1]) * len(self.nodes)
+        for node in range(1, len(self.nodes)):
+            min_len = INFINITE_DISTANCE
+            for idx in range(self.pred_offsets[node], self.pred_offsets[node+1]):
+                edge = self.pred_edges[idx]
+                if self.len_to_root[edge] < min_len:
+                    min_len = self.len_to_root[edge]
+                    self.route_edge[node] = edge
+
+    def _build_completions(self):
+        # Transition taken to complete each decision not having all_transitions set:
+        # the first one with the shortest completion to valid leafs.
+        # Falls back to the first transition if there is no valid completion.
+        num_nodes = len(self.nodes)
+        self.completion_edge = array('i', [-1]) * num_nodes
+        for node in range(num_nodes):
+            start = self.succ_offsets[node]
+            end = self.succ_offsets[node+1]
+            if self.all_transitions[node] or start == end:
+                continue
+            selected = start
+            min_len = INFINITE_DISTANCE
+            for edge in range(start, end):
+                if min_len > self.len_to_valid_node[edge]:
+                    selected = edge
+                    min_len = self.len_to_valid_node[edge]
+            self.completion_edge[node] = selected
+
+        # Memoized results of completion()
+        self._completion_fragment: List[Optional[Tuple[int, ...]]] = [None] * num_nodes
+        self._completion_satisfiable = bytearray(num_nodes)
+
+    def completion(self, node: int) -> Tuple[Tuple[int, ...], bool]:
+        """
+        Returns the path fragment completing the given node towards valid leafs
+        and if this completion is satisfiable, i.e. does not fall back to invalid leafs.
+        Results are memoized.
+        """
+        if self._completion_fragment[node] is None:
+            self._compute_completion(node)
+        return self._completion_fragment[node], bool(self._completion_satisfiable[node])
+
+    def _successors_to_complete(self, node: int) -> range:
+        # Transitions whose targets are part of the node's completion
+        start = self.succ_offsets[node]
+        end = self.succ_offsets[node+1]
+        if self.all_transitions[node] or start == end:
+            return range(start, end)
+        edge = self.completion_edge[node]
+        return range(edge, edge + 1)
+
+    def _compute_completion(self, root: int):
+        # Post-order traversal using an explicit stack:
+        # a node is computed once the completions of all its successors are known
+        in_progress = bytearray(len(self.nodes))
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if self._completion_fragment[node] is not None:
+                stack.pop()
+                continue
+            if not in_progress[node]:
+                in_progress[node] = True
+                for edge in reversed(self._successors_to_complete(node)):
+                    target = self.succ_targets[edge]
+                    if self._completion_fragment[target] is not None:
+                        continue
+                    if in_progress[target]:
+                        raise InternalException(
+                            f"Completion of node {node} runs into a cycle without valid leafs")
+                    stack.append(target)
+                continue
+            stack.pop()
+
+            parts: Path = []
+            satisfiable = True
+            successors = self._successors_to_complete(node)
+            if not self.all_transitions[node] and successors:
+                edge = self.completion_edge[node]
+                parts.append(edge - self.succ_offsets[node])
+                satisfiable = self.len_to_valid_node[edge] != INFINITE_DISTANCE
+            for edge in successors:
+                target = self.succ_targets[edge]
+                parts.extend(self._completion_fragment[target])
+                satisfiable = satisfiable and self._completion_satisfiable[target]
+            self._completion_fragment[node] = tuple(parts)
+            self._completion_satisfiable[node] = satisfiable
+
+    def compile_path(self, path: Path) -> "ExecutionPlan":
+        """
+        Compiles a path into an execution plan, see Node.compile_path()
+        """
+        if self._applies is None:
+            self._applies = [node.apply for node in self.nodes]
+
+        applies: List[Callable[[any], any]] = []
+        sources: List[int] = []
+        result = None
+        path_idx = 0
+        # Pending nodes and the step providing their input data (0 is the input of the plan)
+        stack = [(0, 0)]
+        while stack:
+            node, source = stack.pop()
+            applies.append(self._applies[node])
+            sources.append(source)
+            output = len(applies)
+            start = self.succ_offsets[node]
+            end = self.succ_offsets[node+1]
+            if not self.is_decision[node]:
+                result = output
+            elif self.all_transitions[node]:
+                # The result of the last node is returned
+                result = None
+                for edge in range(end - 1, start - 1, -1):
+                    stack.append((self.succ_targets[edge], output))
+            else:
+                if path_idx >= len(path):
+                    raise InternalException(
+                        f"Path too short, got {len(path)} decisions")
+                edge = start + path[path_idx]
+                if edge >= end:
+                    raise InternalException(
+                        f"Invalid decision {path[path_idx]} at index {path_idx}")
+                path_idx += 1
+                stack.append((self.succ_targets[edge], output))
+        if path_idx != len(path):
+            raise InternalException("Path not fully consumed")
+        return ExecutionPlan(applies, sources, result)
+
+    def generate_paths(self, shard_index: int = 0, shard_count: int = 1,
+                       minimal: bool = False, order_by_coverage: bool = False,
+                       cover_edges: bool = False) -> Generator[ResultEntry, None, None]:
+        """
+        Generates as many paths until all nodes in the graph are reached.
+        See Node.generate_paths().
+        """
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            raise ValueError(f"Invalid shard {shard_index} of {shard_count}")
+
+        if order_by_coverage:
+            # The order depends on all paths, shards select from the ordered sequence
+            entries = self._order_by_coverage(list(self._generate_paths(0, 1, minimal, cover_edges)))
+            for index, entry in enumerate(entries):
+                if index % shard_count == shard_index:
+                    yield entry
+        else:
+            yield from self._generate_paths(shard_index, shard_count, minimal, cover_edges)
+
+    def _generate_paths(self, shard_index: int, shard_count: int,
+                        minimal: bool, cover_edges: bool) -> Generator[ResultEntry, None, None]:
+        # Visit valid leafs first
+        leafs = [idx for idx in range(len(self.nodes)) if self.is_leaf[idx]]
+        to_visit = [idx for idx in leafs if self.is_valid[idx]] + \
+            [idx for idx in leafs if not self.is_valid[idx]]
+
+        # Which leafs are targeted depends on the nodes reached by all previous paths, hence,
+        # all shards build all paths (i.e. mark the reached nodes) but only materialize their own ones.
+        # Building is linear in the size of the graph, materializing in the size of the paths.
+        builder = _PathBuilder(self)
+        index = 0
+        if minimal:
+            cover = _GreedyCover(self)
+            while cover.gain[0] > 0:
+                path, covered = cover.build(index % shard_count == shard_index)
+                if path is not None:
+                    yield ResultEntry(self.nodes[covered[0]], path, True)
+                index += 1
+            for idx in leafs:
+                if cover.covered[idx]:
+                    builder.covered[idx] = True
+            builder.covered_edges = cover.covered_edges
+
+        # Remaining leafs are targeted one by one
+        for target in to_visit:
+            if builder.covered[target]:
+                continue
+            builder.build(target)
+            if index % shard_count == shard_index:
+                path, satisfiable = builder.path(target)
+                yield ResultEntry(self.nodes[target], path, bool(self.is_valid[target]) and satisfiable)
+            index += 1
+
+        if cover_edges:
+            # Transitions not passed yet, e.g. leading to nodes reached via other transitions
+            for edge in range(len(self.succ_targets)):
+                if edge in builder.covered_edges or self._is_dead_end(self.succ_targets[edge]):
+                    continue
+                builder.build_through(edge)
+                if index % shard_count == shard_index:
+                    path, satisfiable = builder.path_through(edge)
+                    target = self._first_leaf(self.succ_targets[edge])
+                    yield ResultEntry(self.nodes[target], path, bool(self.is_valid[target]) and satisfiable)
+                index += 1
+
+    def _is_dead_end(self, node: int) -> bool:
+        # Decisions without any option cannot be executed
+        return bool(self.is_decision[node] and not self.all_transitions[node]
+                    and self.succ_offsets[node] == self.succ_offsets[node+1])
+
+    def _first_leaf(self, node: int) -> int:
+        # First leaf reached by the completion of node
+        while self.is_decision[node]:
+            start = self.succ_offsets[node]
+            if start == self.succ_offsets[node+1]:
+                break
+            node = self.succ_targets[start if self.all_transitions[node] else self.completion_edge[node]]
+        return node
+
+    def _order_by_coverage(self, entries: List[ResultEntry]) -> Generator[ResultEntry, None, None]:
+        # Greedy: the path reaching the most leafs not reached by any previous path comes next.
+        # Gains only decrease, so a gain is recomputed only when its path is about to be selected.
+        reached = [set(self.leafs_on_path(entry.path)) for entry in entries]
+        num_leafs = sum(self.is_leaf)
+        covered = bytearray(len(self.nodes))
+        num_covered = 0
+        queue = [(-len(leafs), idx) for idx, leafs in enumerate(reached)]
+        heapq.heapify(queue)
+        while queue:
+            _, idx = heapq.heappop(queue)
+            gain = sum(1 for leaf in reached[idx] if not covered[leaf])
+            if queue and gain < -queue[0][0]:
+                heapq.heappush(queue, (-gain, idx))
+                continue
+            for leaf in reached[idx]:
+                covered[leaf] = True
+            num_covered += gain
+            entry = entries[idx]
+            yield ResultEntry(entry.target, entry.path, entry.is_valid, num_covered / num_leafs)
+
+    def leafs_on_path(self, path: Path) -> List[int]:
+        """
+        Returns the indices of the leafs reached by a path, in the order of execution
+        """
+        return self._traverse(path)[0]
+
+    def edges_on_path(self, path: Path) -> List[int]:
+        """
+        Returns the indices of the transitions passed by a path, in the order of execution
+        """
+        return self._traverse(path)[1]
+
+    def edge_coverage(self, paths: Iterable[Path]) -> Tuple[int, int]:
+        """
+        Returns the number of transitions passed by the given paths and the total number of transitions
+        """
+        covered = BitSet(len(self.succ_targets))
+        for path in paths:
+            for edge in self.edges_on_path(path):
+                covered.add(edge)
+        return len(covered), covered.size
+
+    def _traverse(self, path: Path) -> Tuple[List[int], List[int]]:
+        # Leafs and transitions reached by a path
+        succ_offsets = self.succ_offsets
+        succ_targets = self.succ_targets
+        is_leaf = self.is_leaf
+        all_transitions = self.all_transitions
+        leafs: List[int] = []
+        edges: List[int] = []
+        path_idx = 0
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if is_leaf[node]:
+                leafs.append(node)
+                continue
+            start = succ_offsets[node]
+            end = succ_offsets[node+1]
+            if all_transitions[node]:
+                edges.extend(range(start, end))
+                stack.extend(reversed(succ_targets[start:end]))
+            elif start != end:
+                try:
+                    edge = start + path[path_idx]
+                except IndexError:
+                    raise InternalException(f"Path too short, got {len(path)} decisions")
+                if edge >= end:
+                    raise InternalException(f"Invalid decision {path[path_idx]} at index {path_idx}")
+                edges.append(edge)
+                stack.append(succ_targets[edge])
+                path_idx += 1
+        if path_idx != len(path):
+            raise InternalException("Path not fully consumed")
+        return leafs, edges
+
+
+# Marks nodes being part of a compiled graph, see Node._compiled
+_COMPILED = object()
+
+
+def _detach(node: Node) -> Node:
+    # Shallow copy of a node without transitions
+    node = copy.copy(node)
+    node.incoming_transitions = []
+    if isinstance(node, Decision):
+        node.outgoing_transitions = []
+    node._compiled = None
+    return node
+
+
+class ExecutionPlan:
+    """
+    A path compiled into a flat list of steps, created by Node.compile_path().
+    Step i applies a node to the output of a previous step (or the input data)
+    and stores its output in register i+1, register 0 holds the input data.
+    """
+
+    def __init__(self, applies: List[Callable[[any], any]], sources: List[int], result: Optional[int]) -> None:
+        self.applies = applies
+        self.sources = sources
+        self.result = result
+
+    def execute(self, data: any = None) -> any:
+        """
+        Executes the plan, same as Node.execute() on the original path
+        """
+        registers = [data]
+        append = registers.append
+        for apply, source in zip(self.applies, self.sources):
+            append(apply(registers[source]))
+        if self.result is None:
+            return None
+        return registers[self.result]
+
+
+class _PathBuilder:
+    """
+    Builds paths along the route tree of a compiled graph.
+
+    A path to a node consists of a head (the route and everything generated before it)
+    and a tail (everything generated after it).
+    Both are computed once per node and shared by all paths passing it.
+
+    Building a path marks all reached nodes in covered and all passed transitions in covered_edges,
+    materializing it computes its heads and tails. Paths can be built without being materialized,
+    e.g. if they belong to another shard.
+    """
+
+    def __init__(self, graph: CompiledGraph) -> None:
+        self.graph = graph
+        num_nodes = len(graph.nodes)
+        self.covered = bytearray(num_nodes)
+        self.covered_edges = BitSet(len(graph.succ_targets))
+        self.completed = bytearray(num_nodes)
+        # Nodes whose route is built
+        self.routed = bytearray(num_nodes)
+        self.head: List[Optional[Tuple[int, ...]]] = [None] * num_nodes
+        self.tail: List[Optional[Tuple[int, ...]]] = [None] * num_nodes
+        self.satisfiable = bytearray(num_nodes)
+        self.routed[0] = True
+        self.head[0] = ()
+        self.tail[0] = ()
+        self.satisfiable[0] = True
+
+    def build(self, target: int):
+        """
+        Marks all nodes reached by the path to the given node
+        """
+        graph = self.graph
+        self.covered[0] = True
+
+        # Up to the closest node on the route which is built already
+        node = target
+        while not self.routed[node]:
+            self.routed[node] = True
+            self.covered[node] = True
+            edge = graph.route_edge[node]
+            parent = graph.edge_sources[edge]
+            if graph.all_transitions[parent]:
+                for sibling in range(graph.succ_offsets[parent], graph.succ_offsets[parent+1]):
+                    self.covered_edges.add(sibling)
+                    if sibling != edge:
+                        self._complete(graph.succ_targets[sibling])
+            else:
+                self.covered_edges.add(edge)
+            node = parent
+
+    def path(self, target: int) -> Tuple[Path, bool]:
+        """
+        Returns the path to the given node and whether it is satisfiable,
+        the path must have been built already
+        """
+        self._materialize(target)
+        return [*self.head[target], *self.tail[target]], bool(self.satisfiable[target])
+
+    def build_through(self, edge: int):
+        """
+        Marks all nodes and transitions reached by the path passing the given transition
+        """
+        graph = self.graph
+        source = graph.edge_sources[edge]
+        self.build(source)
+        for edge in self._passed_edges(edge):
+            self.covered_edges.add(edge)
+            self._complete(graph.succ_targets[edge])
+
+    def path_through(self, edge: int) -> Tuple[Path, bool]:
+        """
+        Returns a path passing the given transition and whether it is satisfiable,
+        the path must have been built already
+        """
+        graph = self.graph
+        source = graph.edge_sources[edge]
+        self._materialize(source)
+        middle: Path = []
+        if not graph.all_transitions[source]:
+            middle.append(edge - graph.succ_offsets[source])
+        satisfiable = self.satisfiable[source]
+        for edge in self._passed_edges(edge):
+            fragment, fragment_satisfiable = graph.completion(graph.succ_targets[edge])
+            middle.extend(fragment)
+            satisfiable = satisfiable and fragment_satisfiable
+        return [*self.head[source], *middle, *self.tail[source]], bool(satisfiable)
+
+    def _passed_edges(self, edge: int) -> range:
+        # Transitions of the source of edge which are passed together with edge
+        graph = self.graph
+        source = graph.edge_sources[edge]
+        if graph.all_transitions[source]:
+            return range(graph.succ_offsets[source], graph.succ_offsets[source+1])
+        return range(edge, edge + 1)
+
+    def _materialize(self, target: int):
+        # Computes the heads and tails along the route to target
+        graph = self.graph
+
+        # Find the closest node on the route whose head and tail are known already
+        chain = []
+        node = target
+        while self.head[node] is None:
+            chain.append(node)
+            node = graph.edge_sources[graph.route_edge[node]]
+
+        for node in reversed(chain):
+            edge = graph.route_edge[node]
+            parent = graph.edge_sources[edge]
+            start = graph.succ_offsets[parent]
+            if graph.all_transitions[parent]:
+                before: Path = []
+                after: Path = []
+                satisfiable = True
+                for sibling in range(start, graph.succ_offsets[parent+1]):
+                    if sibling == edge:
+                        continue
+                    fragment, fragment_satisfiable = graph.completion(graph.succ_targets[sibling])
+                    (before if sibling < edge else after).extend(fragment)
+                    satisfiable = satisfiable and fragment_satisfiable
+                self.head[node] = self.head[parent] + tuple(before)
+                self.tail[node] = tuple(after) + self.tail[parent]
+                self.satisfiable[node] = self.satisfiable[parent] and satisfiable
+            else:
+                self.head[node] = self.head[parent] + (edge - start,)
+                self.tail[node] = self.tail[parent]
+                self.satisfiable[node] = self.satisfiable[parent]
+
+    def _complete(self, node: int):
+        # Marks all nodes and transitions reached by the completion of node
+        graph = self.graph
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if self.completed[node]:
+                continue
+            self.completed[node] = True
+            self.covered[node] = True
+            start = graph.succ_offsets[node]
+            end = graph.succ_offsets[node+1]
+            if graph.all_transitions[node]:
+                for edge in range(start, end):
+                    self.covered_edges.add(edge)
+                stack.extend(graph.succ_targets[start:end])
+            elif start != end:
+                self.covered_edges.add(graph.completion_edge[node])
+                stack.append(graph.succ_targets[graph.completion_edge[node]])
+
+
+# Gain of nodes which cannot be part of a valid path
+_IMPOSSIBLE = -1
+
+
+class _GreedyCover:
+    """
+    Builds valid paths covering as many valid leafs as possible,
+    i.e. a greedy approximation of the minimum set cover.
+
+    The gain of a node is the number of uncovered valid leafs reached by its best valid expansion:
+    - a valid leaf has gain 1 if it is uncovered, 0 otherwise, an invalid leaf is _IMPOSSIBLE
+    - a decision having all_transitions set has the sum of the gains of its transitions
+    - any other decision has the maximum gain of its transitions
+    Leafs reached more than once are counted more than once, so the gain is an upper bound.
+
+    Back edges of a depth first search are not expanded, their targets are completed instead
+    (with gain 0), hence the remaining transitions form an acyclic graph and paths are finite.
+    """
+
+    def __init__(self, graph: CompiledGraph) -> None:
+        self.graph = graph
+        num_nodes = len(graph.nodes)
+        self.covered = bytearray(num_nodes)
+        self.covered_edges = BitSet(len(graph.succ_targets))
+        self.completed = bytearray(num_nodes)
+        self.back_edge = bytearray(len(graph.succ_targets))
+        order = self._post_order()
+
+        # Gains of back edges are fixed, all other transitions have the gain of their target
+        self._fixed_gain: List[Optional[int]] = [None] * len(graph.succ_targets)
+        for edge in range(len(graph.succ_targets)):
+            if self.back_edge[edge]:
+                try:
+                    satisfiable = graph.completion(graph.succ_targets[edge])[1]
+                except InternalException:
+                    satisfiable = False
+                self._fixed_gain[edge] = 0 if satisfiable else _IMPOSSIBLE
+
+        # Successors come before their predecessors in post order,
+        # except for back edges
+        self.rank = array('i', [0]) * num_nodes
+        self.gain = [0] * num_nodes
+        for rank, node in enumerate(order):
+            self.rank[node] = rank
+            self.gain[node] = self._compute_gain(node)
+
+    def _post_order(self) -> List[int]:
+        # Depth first search from the root, marks back edges
+        graph = self.graph
+        NEW, IN_PROGRESS, DONE = 0, 1, 2
+        state = bytearray(len(graph.nodes))
+        state[0] = IN_PROGRESS
+        order: List[int] = []
+        stack = [(0, graph.succ_offsets[0])]
+        while stack:
+            node, edge = stack[-1]
+            if edge < graph.succ_offsets[node+1]:
+                stack[-1] = (node, edge + 1)
+                target = graph.succ_targets[edge]
+                if state[target] == NEW:
+                    state[target] = IN_PROGRESS
+                    stack.append((target, graph.succ_offsets[target]))
+                elif state[target] == IN_PROGRESS:
+                    self.back_edge[edge] = True
+                continue
+            stack.pop()
+            state[node] = DONE
+            order.append(node)
+        return order
+
+    def _edge_gain(self, edge: int) -> int:
+        gain = self._fixed_gain[edge]
+        if gain is None:
+            return self.gain[self.graph.succ_targets[edge]]
+        return gain
+
+    def _compute_gain(self, node: int) -> int:
+        graph = self.graph
+        if graph.is_leaf[node]:
+            if not graph.is_valid[node]:
+                return _IMPOSSIBLE
+            return 0 if self.covered[node] else 1
+        if not graph.is_decision[node]:
+            return 0
+        gains = self.gain
+        fixed_gain = self._fixed_gain
+        succ_targets = graph.succ_targets
+        all_transitions = graph.all_transitions[node]
+        result = 0 if all_transitions else _IMPOSSIBLE
+        for edge in range(graph.succ_offsets[node], graph.succ_offsets[node+1]):
+            gain = fixed_gain[edge]
+            if gain is None:
+                gain = gains[succ_targets[edge]]
+            if not all_transitions:
+                if gain > result:
+                    result = gain
+            elif gain == _IMPOSSIBLE:
+                return _IMPOSSIBLE
+            else:
+                result += gain
+        return result
+
+    def _select(self, node: int) -> int:
+        # Transition with the largest gain, the shortest completion decides between equal gains
+        graph = self.graph
+        selected = -1
+        best = (_IMPOSSIBLE, 0)
+        for edge in range(graph.succ_offsets[node], graph.succ_offsets[node+1]):
+            gain = self._edge_gain(edge)
+            if gain == _IMPOSSIBLE:
+                continue
+            key = (gain, -graph.len_to_valid_node[edge])
+            if selected == -1 or key > best:
+                selected = edge
+                best = key
+        return selected
+
+    def build(self, materialize: bool = True) -> Tuple[Optional[Path], List[int]]:
+        """
+        Builds the path with the largest gain, returns it and the newly covered leafs.
+        The gain of the root must be positive.
+        If materialize is not set, only the covered nodes are updated and the path is None.
+        """
+        graph = self.graph
+        path: Optional[Path] = [] if materialize else None
+        newly_covered: List[int] = []
+        # Pending nodes and whether to complete them instead of expanding them
+        stack = [(0, False)]
+        while stack:
+            node, complete = stack.pop()
+            if complete:
+                if materialize:
+                    path.extend(graph.completion(node)[0])
+                self._cover_completion(node, newly_covered)
+            elif graph.is_leaf[node]:
+                self._cover(node, newly_covered)
+            elif graph.is_decision[node]:
+                start = graph.succ_offsets[node]
+                if graph.all_transitions[node]:
+                    for edge in range(graph.succ_offsets[node+1] - 1, start - 1, -1):
+                        self.covered_edges.add(edge)
+                        stack.append((graph.succ_targets[edge], bool(self.back_edge[edge])))
+                else:
+                    edge = self._select(node)
+                    self.covered_edges.add(edge)
+                    if materialize:
+                        path.append(edge - start)
+                    stack.append((graph.succ_targets[edge], bool(self.back_edge[edge])))
+        self._update(newly_covered)
+        return path, newly_covered
+
+    def _cover(self, leaf: int, newly_covered: List[int]):
+        if not self.covered[leaf]:
+            self.covered[leaf] = True
+            newly_covered.append(leaf)
+
+    def _cover_completion(self, node: int, newly_covered: List[int]):
+        # Covers the leafs reached by the completion of node
+        graph = self.graph
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if self.completed[node]:
+                continue
+            self.completed[node] = True
+            start = graph.succ_offsets[node]
+            end = graph.succ_offsets[node+1]
+            if graph.is_leaf[node]:
+                self._cover(node, newly_covered)
+            elif graph.all_transitions[node]:
+                for edge in range(start, end):
+                    self.covered_edges.add(edge)
+                stack.extend(graph.succ_targets[start:end])
+            elif start != end:
+                self.covered_edges.add(graph.completion_edge[node])
+                stack.append(graph.succ_targets[graph.completion_edge[node]])
+
+    def _update(self, newly_covered: List[int]):
+        # Gains only decrease, the changes are propagated towards the root.
+        # Nodes are recomputed in post order, i.e. once all their successors are up to date.
+        graph = self.graph
+        queue = [(self.rank[node], node) for node in newly_covered]
+        heapq.heapify(queue)
+        queued = set(newly_covered)
+        while queue:
+            _, node = heapq.heappop(queue)
+            gain = self._compute_gain(node)
+            if gain == self.gain[node]:
+                continue
+            self.gain[node] = gain
+            for idx in range(graph.pred_offsets[node], graph.pred_offsets[node+1]):
+                edge = graph.pred_edges[idx]
+                source = graph.edge_sources[edge]
+                if not self.back_edge[edge] and source not in queued:
+                    queued.add(source)
+                    heapq.heappush(queue, (self.rank[source], source))
@@ -0,0 +1,78 @@
+from .util import encode_key
+
+from typing import Optional, Callable, Iterable, Generator, Set, Deque
+from collections import deque
+from xml.etree import ElementTree
+import hashlib
+import json
+
+
+def canonical_bytes(sample: any) -> bytes:
+    """
+    Returns a canonical representation of a sample: equal samples have equal representations.
+    Supports bytes, XML documents and json values, dicts are compared regardless of their key order.
+    """
+    if isinstance(sample, bytes):
+        return sample
+    if isinstance(sample, ElementTree.ElementTree):
+        sample = sample.getroot()
+    if isinstance(sample, ElementTree.Element):
+        return ElementTree.tostring(sample)
+    try:
+        return json.dumps(sample, sort_keys=True, separators=(',', ':'), default=encode_key).encode()
+    except (TypeError, ValueError):
+        # e.g. keys of different types or circular references
+        return repr(sample).encode()
+
+
+class Deduplicator:
+    """
+    Drops samples which are equal to a previous one.
+
+    Samples are identified by a 64 bit hash of their canonical representation, see canonical_bytes().
+    At most capacity hashes are kept, the oldest ones are forgotten first.
+    Hence, the memory is bounded but duplicates of samples further back than capacity samples are not detected.
+    """
+
+    def __init__(self, capacity: int = 2**20, canonical: Optional[Callable[[any], bytes]] = None) -> None:
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.canonical = canonical or canonical_bytes
+        self.num_samples = 0
+        self.num_duplicates = 0
+        self._hashes: Set[int] = set()
+        self._order: Deque[int] = deque()
+
+    def is_duplicate(self, sample: any) -> bool:
+        """
+        Returns True if the sample is equal to a previous one, remembers it otherwise
+        """
+        self.num_samples += 1
+        digest = hashlib.blake2b(self.canonical(sample), digest_size=8).digest()
+        key = int.from_bytes(digest, 'little')
+        if key in self._hashes:
+            self.num_duplicates += 1
+            return True
+        if len(self._order) == self.capacity:
+            self._hashes.discard(self._order.popleft())
+        self._hashes.add(key)
+        self._order.append(key)
+        return False
+
+    def filter(self, samples: Iterable[any]) -> Generator[any, None, None]:
+        """
+        Yields all samples which are not equal to a previous one
+        """
+        for sample in samples:
+            if not self.is_duplicate(sample):
+                yield sample
+
+    @property
+    def rate(self) -> float:
+        """
+        Fraction of samples dropped as duplicates so far
+        """
+        if self.num_samples == 0:
+            return 0
+        return self.num_duplicates / self.num_samples
@@ -1,7 +1,10 @@
 from .exception import ResolveReferenceException, InternalException
-from typing import List, Optional, Generator, Set, Dict, Tuple
+from typing import List, Optional, Generator, Set, Dict, Tuple, Iterable, Union, TYPE_CHECKING
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    from .compiled import CompiledGraph, ExecutionPlan
+
 Path = List[int]
 
 
@@ -10,13 +13,32 @@ class ResultEntry:
     target: "Leaf"
     path: Path
     is_valid: bool
+    # Fraction of leafs reached by this and all previous paths, only set if ordered by coverage
+    coverage: Optional[float] = None
 
 
 class Node:
+    # Graphs consist of many nodes, slots save the memory of per-instance dicts.
+    # Subclasses should define __slots__ as well.
+    __slots__ = ('id', 'incoming_transitions', '_compiled')
 
     def __init__(self, id: Optional[str] = None) -> None:
         self.id = id
         self.incoming_transitions: List["IncomingTransition"] = []
+        # Compiled graph cached by compile() if this node is its root, _COMPILED if this node
+        # is part of a compiled graph, None if it was modified since (see _invalidate())
+        self._compiled: Optional["CompiledGraph"] = None
+
+    def _invalidate(self):
+        # Drops the compiled graphs containing this node, i.e. the ones of its ancestors.
+        # The ancestors of modified nodes are modified as well, hence, the walk stops there.
+        stack: List[Node] = [self]
+        while stack:
+            node = stack.pop()
+            if node._compiled is None:
+                continue
+            node._compiled = None
+            stack.extend(i.source for i in node.incoming_transitions)
 
     def apply(self, data: any) -> any:
         """
@@ -34,16 +56,20 @@ class Node:
 
     def items(self) -> Generator["Node", None, None]:
         """
-        Iterates over the node and all it's children recursively
+        Iterates over the node and all it's children in depth-first order.
+        Uses an explicit stack, hence the depth of the graph is not limited by the recursion limit.
         """
-        already_visited: Set[Node] = set()
-        yield from self._items(already_visited)
-
-    def _items(self, already_visited: Set["Node"]) -> Generator["Node", None, None]:
-        if id(self) in already_visited:
-            return
-        already_visited.add(id(self))
-        yield self
+        already_visited: Set[int] = set()
+        stack: List[Node] = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in already_visited:
+                continue
+            already_visited.add(id(node))
+            yield node
+            if isinstance(node, Decision):
+                stack.extend(
+                    transition.target for transition in reversed(node.outgoing_transitions))
 
     def target(self, nodes_by_id: Dict[str, "Node"]) -> "Node":
         """
@@ -76,200 +102,204 @@ class Node:
 
         # Resolve references
         visited = set()
-
-        def _resolve(node: Node):
+        stack: List[Node] = [root]
+        while stack:
+            node = stack.pop()
             if id(node) in visited:
-                return
+                continue
             visited.add(id(node))
             if isinstance(node, Decision):
                 for idx, transition in enumerate(node.outgoing_transitions):
                     next_node = transition.target
                     if isinstance(next_node, Reference):
+                        node._invalidate()
                         target_node = next_node.target(nodes_by_id)
                         transition.target = target_node
                         target_node.incoming_transitions.append(
                             IncomingTransition(node, idx)
                         )
-                for transition in node.outgoing_transitions:
-                    _resolve(transition.target)
-        _resolve(root)
+                stack.extend(
+                    transition.target for transition in reversed(node.outgoing_transitions))
         return root
 
     def execute(self, path: Path, data=None) -> any:
         """
         Executes a path on the node
         """
-        idx, result = self._execute(path, 0, data)
-        if idx != len(path):  # pragma: no cover
+        path_idx = 0
+        result = None
+        # Pending nodes and their input data, in the order they are executed
+        stack: List[Tuple[Node, any]] = [(self, data)]
+        while stack:
+            node, data = stack.pop()
+            data = node.apply(data)
+            if not isinstance(node, Decision):
+                result = data
+            elif node.all_transitions:
+                # The result of the last node is returned
+                result = None
+                stack.extend(
+                    (transition.target, data) for transition in reversed(node.outgoing_transitions))
+            else:
+                if path_idx >= len(path):  # pragma: no cover
+                    raise InternalException(
+                        f"Path too short, got {len(path)} decisions")
+                idx = path[path_idx]
+                path_idx += 1
+                stack.append((node.outgoing_transitions[idx].target, data))
+        if path_idx != len(path):  # pragma: no cover
             raise InternalException("Path not fully consumed")
         return result
 
-    def _execute(self, path: Path, path_idx: int, data: any) -> Tuple[int, any]:
-        if path_idx > len(path):  # pragma: no cover
-            raise InternalException(
-                f"path_idx ({path_idx}) > len(path) ({len(path)})")
-
-        data = self.apply(data)
-
-        if not isinstance(self, Decision):
-            return path_idx, data
-
-        if self.all_transitions:
-            result = None
-            for transition in self.outgoing_transitions:
-                path_idx, result = transition.target._execute(
-                    path, path_idx, data)
-            # return the result of the last node
-            return path_idx, result
-        else:
-            idx = path[path_idx]
-            return self.outgoing_transitions[idx].target._execute(path, path_idx+1, data)
-
-    def _generate(self, result_path: Path, already_reached: Set) -> bool:
-        already_reached.add(id(self))
-
-        if not isinstance(self, Decision):
-            return True
-        if not self.outgoing_transitions:
-            return True
-
-        satisfiable = True
-
-        if self.all_transitions:
-            for transition in self.outgoing_transitions:
-                sub_satisfiable = transition.target._generate(result_path, already_reached)
-                satisfiable = satisfiable and sub_satisfiable
-        else:
-            selected = None
-            min_len = float('inf')
-            for idx, transition in enumerate(self.outgoing_transitions):
-                if min_len > transition._len_to_valid_node:
-                    selected = idx
-                    min_len = transition._len_to_valid_node
-            # No satisfiable transition found, fallback to an un-satisfiable one
-            if selected is None:
-                # print("No valid leaf detected, falling back to invalid one")
-                satisfiable = False
-                selected = 0
-
-            result_path.append(selected)
-            transition: OutgoingTransition = self.outgoing_transitions[selected]
-            sub_satisfiable = transition.target._generate(result_path, already_reached)
-            satisfiable = satisfiable and sub_satisfiable
-        return satisfiable
-
-    def _backward(self, path: Path, already_reached: Set) -> "Node":
-        already_reached.add(id(self))
-
-        if not self.incoming_transitions:
-            return self
-
-        predecessor_transition = None
-        min_len = float('inf')
-        for transition in self.incoming_transitions:
-            if transition._len_to_root < min_len:
-                min_len = transition._len_to_root
-                predecessor_transition = transition
-        path.append(predecessor_transition.outgoing_idx)
-        root = predecessor_transition.source._backward(path, already_reached)
-        return root
+    def compile_path(self, path: Path) -> "ExecutionPlan":
+        """
+        Compiles a path into a flat execution plan.
+        Executing the plan gives the same result as execute(), but avoids the
+        traversal of the graph. Use this to execute the same path many times.
+        """
+        return self.compile().compile_path(path)
 
-    def _forward(self, backward_path: Path, forward_path: Path, visited: Set) -> bool:
-        if len(backward_path) == 0:
-            return True
-        assert isinstance(self, Decision)
-        path_idx = backward_path.pop(-1)
-        if self.all_transitions:
-            satisfiable = True
-            for idx, transition in enumerate(self.outgoing_transitions):
-                if idx == path_idx:
-                    s = transition.target._forward(backward_path, forward_path, visited)
-                else:
-                    s = transition.target._generate(forward_path, visited)
-                satisfiable = satisfiable and s
-        else:
-            transition = self.outgoing_transitions[path_idx]
-            forward_path.append(path_idx)
-            satisfiable = transition.target._forward(backward_path, forward_path, visited)
-
-        return satisfiable
-
-    def _analyze_forwards(self, length: int):
-        if isinstance(self, Decision):
-            for idx, t in enumerate(self.outgoing_transitions):
-                # TODO: this is not efficient
-                incoming = [i for i in t.target.incoming_transitions if i.outgoing_idx == idx][0]
-                if incoming._len_to_root > length:
-                    incoming._len_to_root = length
-                    t.target._analyze_forwards(length+1)
-
-    def _analyze_backwards(self, length):
-
-        if isinstance(self, Decision):
-            if self.all_transitions:
-                length = max(i._len_to_valid_node for i in self.outgoing_transitions)
-                if length == float('inf'):
-                    return
-
-        for i in self.incoming_transitions:
-            out = i.outgoing_transition()
-            if out._len_to_valid_node > length:
-                out._len_to_valid_node = length
-                i.source._analyze_backwards(length+1)
-
-    def generate_paths(self) -> Generator[ResultEntry, None, None]:
+    def execute_many(self, paths: Iterable[Union[Path, "ExecutionPlan"]], data=None) -> Generator[any, None, None]:
+        """
+        Executes many paths (or plans created by compile_path()) and yields their results
+        """
+        from .compiled import ExecutionPlan
+        graph = self.compile()
+        for path in paths:
+            if not isinstance(path, ExecutionPlan):
+                path = graph.compile_path(path)
+            yield path.execute(data)
+
+    def compile(self) -> "CompiledGraph":
+        """
+        Freezes the graph into a compact, integer-indexed representation
+        which is used for path generation.
+        The result is cached until a node of the graph is modified using add_transition(),
+        resolve() or optimize().
+        """
+        from .compiled import CompiledGraph
+        compiled = self._compiled
+        if not isinstance(compiled, CompiledGraph):
+            compiled = CompiledGraph(self)
+        return compiled
+
+    def generate_paths(self, shard_index: int = 0, shard_count: int = 1,
+                       minimal: bool = False, order_by_coverage: bool = False,
+                       cover_edges: bool = False) -> Generator[ResultEntry, None, None]:
         """
         Generates as many paths until all nodes in the graph are reached.
         Execute a path using execute().
+
+        To split the work among independent workers, each worker passes its own
+        shard_index out of shard_count: the shards yield disjoint subsets of the
+        paths, all shards together yield the same paths as a single run.
+        Which paths are generated depends on the leafs reached by all previous paths, hence, each shard
+        still traverses the whole graph to find them, but only builds the paths it yields.
+
+        If minimal is set, valid paths are chosen greedily such that each covers as many
+        new valid leafs as possible, which approximates the smallest set of valid samples.
+        Invalid paths still target one invalid leaf each.
+
+        If order_by_coverage is set, the same paths are yielded such that each path reaches
+        as many leafs as possible which are not reached by previous paths. Hence, the first paths
+        give the largest coverage, their coverage (the fraction of reached leafs) is set
+        in the result entries. This requires generating all paths before yielding the first one.
+
+        If cover_edges is set, additional paths are generated until each transition is passed,
+        e.g. each transition to a shared node. Use CompiledGraph.edge_coverage() to check the
+        number of passed transitions.
         """
+        yield from self.compile().generate_paths(shard_index, shard_count, minimal, order_by_coverage, cover_edges)
 
-        # Reset counter, collect leafs
-        valid_nodes: List[Leaf] = []
-        invalid_nodes: List[Leaf] = []
-        for i in self.items():
-            if isinstance(i, Leaf):
-                if i.is_valid:
-                    valid_nodes.append(i)
-                else:
-                    invalid_nodes.append(i)
-        self._analyze_forwards(0)
-        for leaf in valid_nodes:
-            leaf._analyze_backwards(0)
-
-        # Visit valid nodes first
-        to_visit = valid_nodes + invalid_nodes
-
-        while to_visit:
-            # print(f"{len(to_visit)} nodes remaining")
-            next = to_visit[0]
-
-            # Generate a path to the root
-            backward_path: Path = []
-            visited = set()
-            root = next._backward(backward_path, visited)
-
-            # Follow path to the target node
-            forward_path = []
-            satisfiable = root._forward(backward_path, forward_path, visited)
-
-            # Yield
-            yield ResultEntry(next, forward_path, next.is_valid and satisfiable)
-
-            # Remove the visited nodes
-            path_idx = 0
-            while path_idx < len(to_visit):
-                if id(to_visit[path_idx]) in visited:
-                    del to_visit[path_idx]
-                else:
-                    path_idx += 1
-
-    def optimize(self):
+    def optimize(self, share_subgraphs: bool = False):
         """
         Reduces the number of nodes in this graph while keeping the meaning the same.
         This helps to speed up subsequent operations.
+
+        If share_subgraphs is set, structurally identical subgraphs are replaced by a single instance,
+        see share_subgraphs().
         """
         pass
 
+    def share_subgraphs(self) -> int:
+        """
+        Replaces structurally identical subgraphs by a single instance and returns the number of removed nodes.
+        Two nodes are identical if they have the same type and attributes (except for their ids)
+        and their successors are identical.
+        Nodes on cycles are kept as they are, the root is never replaced.
+        Like intern_leafs(), generate_paths() reaches shared nodes once only, hence it generates fewer paths.
+        """
+        NEW, IN_PROGRESS, DONE = 0, 1, 2
+        state: Dict[int, int] = {id(self): IN_PROGRESS}
+        pinned: Set[int] = {id(self)}
+        shapes: Dict[Tuple, Node] = {}
+        removed: List[Node] = []
+        stack: List[Tuple[Node, int]] = [(self, 0)]
+
+        # Bottom up, i.e. in post order, such that the successors of a node are canonical already
+        while stack:
+            node, idx = stack[-1]
+            if isinstance(node, Decision) and idx < len(node.outgoing_transitions):
+                stack[-1] = (node, idx + 1)
+                target = node.outgoing_transitions[idx].target
+                target_state = state.get(id(target), NEW)
+                if target_state == NEW:
+                    state[id(target)] = IN_PROGRESS
+                    stack.append((target, 0))
+                elif target_state == IN_PROGRESS:
+                    # Back edge, the target is on a cycle
+                    pinned.add(id(target))
+                continue
+            stack.pop()
+            state[id(node)] = DONE
+            if isinstance(node, Decision):
+                successors = tuple(id(i.target) for i in node.outgoing_transitions)
+            else:
+                successors = ()
+            shape = shapes.setdefault((*_leaf_key(node), successors), node)
+            if shape is node or id(node) in pinned:
+                continue
+            removed.append(node)
+            node._invalidate()
+            for transition in node.incoming_transitions:
+                transition.outgoing_transition().target = shape
+                shape.incoming_transitions.append(transition)
+            node.incoming_transitions = []
+
+        # Drop transitions coming from removed nodes
+        removed_ids = set(id(i) for i in removed)
+        for node in removed:
+            if isinstance(node, Decision):
+                for transition in node.outgoing_transitions:
+                    target = transition.target
+                    target.incoming_transitions = [
+                        i for i in target.incoming_transitions if id(i.source) not in removed_ids
+                    ]
+        return len(removed)
+
+    def intern_leafs(self) -> int:
+        """
+        Replaces identical leafs without id by a single instance and returns the number of removed leafs.
+        Leafs are identical if they have the same type and attributes.
+        This reduces the size of the graph, but generate_paths() reaches each of the
+        remaining leafs once only, hence it generates fewer paths.
+        """
+        decisions = [node for node in self.items() if isinstance(node, Decision)]
+        interned: Dict[Tuple[type, str], Leaf] = {}
+        removed: Set[int] = set()
+        for decision in decisions:
+            for idx, transition in enumerate(decision.outgoing_transitions):
+                leaf = transition.target
+                if not isinstance(leaf, Leaf) or leaf.id is not None:
+                    continue
+                canonical = interned.setdefault(_leaf_key(leaf), leaf)
+                if canonical is not leaf:
+                    decision._invalidate()
+                    transition.target = canonical
+                    canonical.incoming_transitions.append(IncomingTransition(decision, idx))
+                    removed.add(id(leaf))
+        return len(removed)
+
     def get_by_id(self, id: str) -> "Node":
         """
         Gets a specific node in the graph by it's id.
@@ -282,34 +312,66 @@ class Node:
 
 
 class Leaf(Node):
+    __slots__ = ('is_valid',)
+
     def __init__(self, id: str = None, is_valid: bool = True) -> None:
         super().__init__(id)
         self.is_valid = is_valid
 
 
+_STRUCTURAL_ATTRIBUTES = ('id', 'incoming_transitions', 'outgoing_transitions', '_compiled')
+
+
+def _value_key(value: any) -> any:
+    try:
+        hash(value)
+    except TypeError:
+        # Unhashable values (e.g. lists) are only identical to themselves
+        return id(value)
+    # Equal values of different types (e.g. 1 and True) are not identical
+    return type(value), value
+
+
+def _leaf_key(node: Node) -> Tuple[type, tuple]:
+    # Type and attributes of a node, except for the id and the graph structure
+    attributes = []
+    for cls in type(node).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name not in _STRUCTURAL_ATTRIBUTES:
+                attributes.append((name, _value_key(getattr(node, name, None))))
+    for name, value in sorted(getattr(node, '__dict__', {}).items()):
+        attributes.append((name, _value_key(value)))
+    return type(node), tuple(attributes)
+
+
 class OutgoingTransition:
+    __slots__ = ('target',)
+
     def __init__(self, target: Node) -> None:
         self.target = target
-        self._len_to_valid_node: int = float('inf')
 
 
 class IncomingTransition:
+    __slots__ = ('source', 'outgoing_idx')
+
     def __init__(self, source: "Decision", idx: int) -> None:
         self.source = source
         self.outgoing_idx = idx
-        self._len_to_root: int = float('inf')
 
     def outgoing_transition(self) -> OutgoingTransition:
         return self.source.outgoing_transitions[self.outgoing_idx]
 
 
 class Decision(Node):
+    __slots__ = ('all_transitions', 'outgoing_transitions')
+
     def __init__(self, id: str = None, all_transitions: bool = False) -> None:
         super().__init__(id)
         self.all_transitions = all_transitions
         self.outgoing_transitions: List[OutgoingTransition] = []
 
     def add_transition(self, target: Node):
+        self._invalidate()
         target.incoming_transitions.append(
             IncomingTransition(self, len(self.outgoing_transitions))
         )
@@ -317,23 +379,22 @@ class Decision(Node):
             OutgoingTransition(target)
         )
 
-    def _items(self, already_visited: Set["Node"]) -> Generator["Node", None, None]:
-        if id(self) in already_visited:
-            return
-        already_visited.add(id(self))
-        yield self
-        for transition in self.outgoing_transitions:
-            yield from transition.target._items(already_visited)
-
-    def optimize(self):
+    def optimize(self, share_subgraphs: bool = False):
         visited = set()
-        self._optimize(visited)
-
-    def _optimize(self, visited: Set):
-        if id(self) in visited:
-            return
-        visited.add(id(self))
-
+        stack: List[Decision] = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            node._merge_successors(visited)
+            stack.extend(
+                i.target for i in reversed(node.outgoing_transitions)
+                if isinstance(i.target, Decision))
+        if share_subgraphs:
+            self.share_subgraphs()
+
+    def _merge_successors(self, visited: Set):
         merge_with = self
         while True:
             if len(merge_with.outgoing_transitions) != 1:
@@ -348,6 +409,8 @@ class Decision(Node):
             merge_with = successor
 
         if merge_with is not self:
+            # Invalidates all merged nodes and self
+            merge_with._invalidate()
             self.outgoing_transitions = merge_with.outgoing_transitions
             self.all_transitions = merge_with.all_transitions
             for i in self.outgoing_transitions:
@@ -355,12 +418,10 @@ class Decision(Node):
                     if j.source is merge_with:
                         j.source = self
 
-        for i in self.outgoing_transitions:
-            if isinstance(i.target, Decision):
-                i.target._optimize(visited)
-
 
 class Reference(Node):
+    __slots__ = ('reference',)
+
     def __init__(self, id: str, reference: str) -> None:
         super().__init__(id)
         self.reference = reference
@@ -374,6 +435,8 @@ class Reference(Node):
 
 
 class NoOpDecision(Decision):
+    __slots__ = ()
+
     def apply(self, data: any) -> any:
         return data
 
@@ -382,6 +445,8 @@ class NoOpDecision(Decision):
 
 
 class NoOpLeaf(Leaf):
+    __slots__ = ()
+
     def apply(self, data: any) -> any:
         return data
 
@@ -0,0 +1,79 @@
+from .node import Node, ResultEntry, Path
+from .compiled import CompiledGraph
+from .dedup import Deduplicator
+
+from typing import List, Optional, Tuple, Generator, Callable
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+import pickle
+
+Sample = Tuple[ResultEntry, any]
+
+# Graph of the current worker process, set by _init_worker()
+_worker_graph: Optional[CompiledGraph] = None
+
+
+def _init_worker(pickled_graph: bytes):
+    global _worker_graph
+    _worker_graph = pickle.loads(pickled_graph)
+
+
+def _execute_chunk(paths: List[Path], postprocess: Optional[Callable[[any], any]]) -> List[any]:
+    root = _worker_graph.nodes[0]
+    samples = []
+    for path in paths:
+        sample = root.execute(path)
+        if postprocess is not None:
+            sample = postprocess(sample)
+        samples.append(sample)
+    return samples
+
+
+def generate_samples(root: Node,
+                     max_workers: Optional[int] = None,
+                     chunk_size: int = 64,
+                     ordered: bool = True,
+                     postprocess: Optional[Callable[[any], any]] = None,
+                     shard_index: int = 0,
+                     shard_count: int = 1,
+                     minimal: bool = False,
+                     order_by_coverage: bool = False,
+                     cover_edges: bool = False,
+                     deduplicator: Optional[Deduplicator] = None) -> Generator[Sample, None, None]:
+    """
+    Generates all samples of a graph using a pool of processes.
+    This is the same as calling root.execute() for each path of root.generate_paths().
+
+    The paths are generated once, the graph is pickled once and sent to each worker,
+    paths are executed in chunks of chunk_size paths.
+    Yields pairs of the result entry and the sample, in the order of generate_paths()
+    if ordered is set, otherwise as soon as they are available.
+
+    Samples are pickled to be sent back, use postprocess to convert them in the worker,
+    e.g. to serialize them. postprocess must be picklable, i.e. a module level function.
+    Use shard_index and shard_count to generate a shard only, minimal to generate fewer valid samples,
+    order_by_coverage to generate samples with the largest coverage first and cover_edges
+    to pass all transitions, see Node.generate_paths().
+    If a deduplicator is given, samples equal to a previous one (after postprocess) are dropped.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    entries = list(root.generate_paths(shard_index, shard_count, minimal, order_by_coverage, cover_edges))
+    chunks = [entries[idx:idx+chunk_size] for idx in range(0, len(entries), chunk_size)]
+    pickled_graph = pickle.dumps(root.compile())
+
+    executor = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(pickled_graph,))
+    futures: List[Future] = []
+    try:
+        for chunk in chunks:
+            futures.append(executor.submit(_execute_chunk, [i.path for i in chunk], postprocess))
+        chunk_by_future = dict(zip(futures, chunks))
+        for future in (futures if ordered else as_completed(futures)):
+            for entry, sample in zip(chunk_by_future[future], future.result()):
+                if deduplicator is None or not deduplicator.is_duplicate(sample):
+                    yield entry, sample
+    finally:
+        # Do not wait for remaining chunks if the generator is closed early
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
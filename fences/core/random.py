@@ -1,10 +1,14 @@
 from dataclasses import dataclass
+from bisect import bisect
+from itertools import accumulate
 import random
 
 from fences.regex.parse import parse
 from fences.core.exception import InternalException
+from fences.core.node import Node, Decision, Path
+from fences.core.compiled import INFINITE_DISTANCE
 
-from typing import Optional
+from typing import Optional, Callable, Generator, List
 
 
 @dataclass
@@ -43,3 +47,110 @@ def generate_random_number(min_value: Optional[int] = None, max_value: Optional[
         max_value = +1000
     assert min_value <= max_value
     return random.randint(min_value, max_value)
+
+
+class RandomWalker:
+    """
+    Generates random valid paths of a graph, e.g. for load tests.
+
+    At each decision, one of the transitions leading to valid leafs is chosen randomly.
+    weight(decision, idx) returns the relative weight of the decision's idx-th transition,
+    all transitions have the same weight by default.
+    After max_decisions random choices, each path is completed along the shortest route to valid leafs,
+    hence paths are finite even for recursive graphs.
+
+    Each walker has its own random number generator, walkers with the same seed generate the same paths.
+    The graph must not be modified while it is used by a walker.
+    """
+
+    def __init__(self, root: Node, seed: Optional[int] = None,
+                 weight: Optional[Callable[[Decision, int], float]] = None,
+                 max_decisions: int = 100) -> None:
+        self.root = root
+        self.rng = random.Random(seed)
+        self.max_decisions = max_decisions
+        graph = root.compile()
+        self.graph = graph
+
+        # Transitions to choose from and their cumulative weights, per decision
+        num_nodes = len(graph.nodes)
+        self._options: List[Optional[List[int]]] = [None] * num_nodes
+        self._cumulative_weights: List[Optional[List[float]]] = [None] * num_nodes
+        for node in range(num_nodes):
+            if not graph.is_decision[node] or graph.all_transitions[node]:
+                continue
+            start = graph.succ_offsets[node]
+            options = [
+                edge for edge in range(start, graph.succ_offsets[node+1])
+                if graph.len_to_valid_node[edge] != INFINITE_DISTANCE
+            ]
+            self._options[node] = options
+            if weight is not None:
+                self._cumulative_weights[node] = list(accumulate(
+                    weight(graph.nodes[node], edge - start) for edge in options))
+
+        if not self._is_valid_root():
+            raise ValueError("The graph has no valid paths")
+
+    def _is_valid_root(self) -> bool:
+        graph = self.graph
+        if graph.is_leaf[0]:
+            return bool(graph.is_valid[0])
+        distances = graph.len_to_valid_node[graph.succ_offsets[0]:graph.succ_offsets[1]]
+        if graph.all_transitions[0]:
+            return INFINITE_DISTANCE not in distances
+        return bool(self._options[0])
+
+    def _choose(self, node: int) -> int:
+        options = self._options[node]
+        cumulative_weights = self._cumulative_weights[node]
+        if cumulative_weights is None:
+            return options[self.rng.randrange(len(options))]
+        idx = bisect(cumulative_weights, self.rng.random() * cumulative_weights[-1])
+        return options[min(idx, len(options) - 1)]
+
+    def walk(self) -> Path:
+        """
+        Returns a random valid path
+        """
+        graph = self.graph
+        succ_offsets = graph.succ_offsets
+        succ_targets = graph.succ_targets
+        all_transitions = graph.all_transitions
+        is_leaf = graph.is_leaf
+        path: Path = []
+        remaining = self.max_decisions
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if is_leaf[node]:
+                continue
+            start = succ_offsets[node]
+            end = succ_offsets[node+1]
+            if all_transitions[node]:
+                stack.extend(reversed(succ_targets[start:end]))
+            elif start != end:
+                if remaining > 0:
+                    edge = self._choose(node)
+                    remaining -= 1
+                else:
+                    edge = graph.completion_edge[node]
+                path.append(edge - start)
+                stack.append(succ_targets[edge])
+        return path
+
+    def generate_paths(self, count: Optional[int] = None) -> Generator[Path, None, None]:
+        """
+        Generates count random valid paths, or infinitely many if count is None
+        """
+        idx = 0
+        while count is None or idx < count:
+            yield self.walk()
+            idx += 1
+
+    def generate_samples(self, count: Optional[int] = None, data: any = None) -> Generator[any, None, None]:
+        """
+        Generates count random valid samples, or infinitely many if count is None
+        """
+        for path in self.generate_paths(count):
+            yield self.root.execute(path, data)
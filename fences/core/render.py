@@ -7,7 +7,7 @@ def _to_graph_node(node: Node):
     attrs = {}
     lines = []
     if node.id:
-        lines.append(node.id)
+        lines.append(str(node.id))
     d = node.description()
     if d:
         lines.append(d)
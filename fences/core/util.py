@@ -1,7 +1,156 @@
-from typing import List, Optional
+from typing import List, Optional, Generator
+from dataclasses import is_dataclass, fields
+from enum import Enum
+from functools import partial
+from types import BuiltinFunctionType, CodeType, FunctionType, MethodType
+import hashlib
 
 Table = List[Optional[List[str]]]
 
+Recursion = Generator["Recursion", any, any]
+
+
+def trampoline(recursion: Recursion) -> any:
+    """
+    Evaluates a recursive function without using the call stack.
+    The function must be written as a generator which yields a generator for
+    each recursive call instead of calling itself, e.g. `result = yield f(x)`.
+    The yield expression evaluates to the return value of the recursive call.
+    """
+    stack: List[Recursion] = [recursion]
+    value = None
+    error: Optional[BaseException] = None
+    while stack:
+        try:
+            if error is None:
+                sub_recursion = stack[-1].send(value)
+            else:
+                # Propagate exceptions to the caller
+                sub_recursion = stack[-1].throw(error)
+        except StopIteration as e:
+            stack.pop()
+            value = e.value
+            error = None
+        except BaseException as e:
+            stack.pop()
+            if not stack:
+                raise
+            error = e
+        else:
+            stack.append(sub_recursion)
+            value = None
+            error = None
+    return value
+
+
+def _code_digest(code: CodeType) -> str:
+    # Hash of the byte code, the names and constants it uses, including nested functions
+    digest = hashlib.sha256()
+    stack = [code]
+    while stack:
+        code = stack.pop()
+        constants = []
+        for i in code.co_consts:
+            if isinstance(i, CodeType):
+                stack.append(i)
+            else:
+                constants.append(i)
+        digest.update(code.co_code)
+        digest.update(repr((code.co_names, constants)).encode())
+    return digest.hexdigest()
+
+
+def _cell_contents(cell) -> any:
+    try:
+        return cell.cell_contents
+    except ValueError:
+        # Variable is not assigned yet
+        return '__empty__'
+
+
+def _attributes(value: any) -> Optional[dict]:
+    # Values of the slots and the __dict__ of an object, None if it has neither
+    slots = []
+    for cls in type(value).__mro__:
+        names = getattr(cls, '__slots__', ())
+        slots.extend([names] if isinstance(names, str) else names)
+    if not slots and not hasattr(value, '__dict__'):
+        return None
+    result = {}
+    for name in slots:
+        if name not in ('__dict__', '__weakref__') and hasattr(value, name):
+            result[name] = getattr(value, name)
+    result.update(getattr(value, '__dict__', {}))
+    return result
+
+
+def encode_key(value: any) -> any:
+    """
+    Converts values not supported by json into a stable representation, use as default of json.dumps().
+    Raises a ValueError for values without a stable representation.
+    """
+    if is_dataclass(value) and not isinstance(value, type):
+        result = {f.name: getattr(value, f.name) for f in fields(value)}
+        result['__type__'] = type(value).__qualname__
+        return result
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, (FunctionType, MethodType)):
+        # Functions sharing the same name (e.g. lambdas) or code (e.g. closures) are distinguished
+        # by their code, the values they captured and their defaults
+        result = {
+            '__callable__': f"{value.__module__}.{value.__qualname__}",
+            'code': _code_digest(value.__code__),
+            'closure': [_cell_contents(i) for i in value.__closure__ or ()],
+            'defaults': value.__defaults__,
+            'kwdefaults': value.__kwdefaults__,
+        }
+        if isinstance(value, MethodType):
+            result['self'] = value.__self__
+        return result
+    if isinstance(value, partial):
+        return {'__callable__': 'functools.partial', 'func': value.func, 'args': value.args, 'keywords': value.keywords}
+    if isinstance(value, (type, BuiltinFunctionType)):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    attributes = _attributes(value)
+    if attributes is not None:
+        attributes['__type__'] = type(value).__qualname__
+        return attributes
+    if type(value).__repr__ is object.__repr__:
+        # The default representation contains the address, which changes with every run
+        raise ValueError(f"Cannot encode instances of {type(value).__qualname__}")
+    return repr(value)
+
+
+class BitSet:
+    """
+    Set of integers in range(size), stored as one bit per integer
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._bits = bytearray((size + 7) // 8)
+
+    def add(self, idx: int):
+        self._bits[idx >> 3] |= 1 << (idx & 7)
+
+    def __contains__(self, idx: int) -> bool:
+        return bool(self._bits[idx >> 3] & (1 << (idx & 7)))
+
+    def __len__(self) -> int:
+        return bin(int.from_bytes(self._bits, 'little')).count('1')
+
+    def __iter__(self) -> Generator[int, None, None]:
+        for byte_idx, byte in enumerate(self._bits):
+            while byte:
+                low_bit = byte & -byte
+                yield (byte_idx << 3) + low_bit.bit_length() - 1
+                byte ^= low_bit
+
 
 def pad(s: str, width: int) -> str:
     return " " * (width - len(s)) + s
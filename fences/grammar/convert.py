@@ -6,6 +6,8 @@ import string
 
 
 class CreateInput(Decision):
+    __slots__ = ()
+
     def description(self):
         return "Create Input"
 
@@ -14,6 +16,8 @@ class CreateInput(Decision):
 
 
 class FetchOutput(Leaf):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(None, True)
 
@@ -25,6 +29,8 @@ class FetchOutput(Leaf):
 
 
 class AppendString(Leaf):
+    __slots__ = ('string',)
+
     def __init__(self, is_valid: bool, string: str) -> None:
         super().__init__(None, is_valid)
         self.string = string
@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from typing import Callable, Set, List, Dict, Optional
 
 from .json_pointer import JsonPointer
+from .normalize import LazyNormalizer
 from fences.core.node import Decision, Node
 
 Handler = Callable[[dict, "Config", Set[str], JsonPointer], Decision]
@@ -22,3 +23,6 @@ class Config:
     normalize: bool
     format_samples: Dict[str, FormatSamples]
     post_processor: Optional[PostProcessor]
+    # If set (and normalize is set), sub-schemas are normalized by this normalizer once they are parsed,
+    # instead of normalizing the whole schema in advance
+    normalizer: Optional[LazyNormalizer] = None
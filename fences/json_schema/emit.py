@@ -0,0 +1,227 @@
+from .parse import SetValueLeaf, InsertKeyNode, CreateArrayNode, AppendArrayItemNode, \
+    CreateObjectNode, CreateInputNode, FetchOutputNode
+
+from fences.core.node import Node, NoOpDecision, NoOpLeaf, Path
+from fences.core.exception import InternalException
+
+from typing import List, Tuple, Optional, Iterable, Generator
+import json
+
+
+class _Unsupported(Exception):
+    # The path cannot be written directly, e.g. because a value is overwritten
+    pass
+
+
+_NO_OP, _KEY, _ITEM, _VALUE, _OBJECT, _ARRAY, _INPUT, _OUTPUT, _UNSUPPORTED = range(9)
+
+
+class _Container:
+    __slots__ = ('close', 'empty', 'keys')
+
+    def __init__(self, close: bytes) -> None:
+        self.close = close
+        self.empty = True
+        # Keys of an object
+        self.keys = set()
+
+    def finish(self, buffer: bytearray):
+        buffer += self.close
+
+
+class _Slot:
+    # A property of an object or an item of an array (with an empty prefix)
+    __slots__ = ('container', 'prefix', 'filled')
+
+    def __init__(self, container: Optional[_Container], prefix: bytes) -> None:
+        self.container = container
+        self.prefix = prefix
+        self.filled = False
+
+    def fill(self, buffer: bytearray, separator: bytes):
+        if self.filled:
+            raise _Unsupported()
+        self.filled = True
+        container = self.container
+        if container is None:
+            return
+        if self.prefix in container.keys:
+            raise _Unsupported()
+        container.keys.add(self.prefix)
+        if container.empty:
+            container.empty = False
+        else:
+            buffer += separator
+        buffer += self.prefix
+
+    def finish(self, buffer: bytearray):
+        # Array items are appended even if no value is set
+        if not self.filled:
+            buffer += b'null'
+
+
+class JsonEmitter:
+    """
+    Executes paths of a graph created by parse() and writes the samples as UTF-8 encoded JSON,
+    without creating the samples as python objects.
+    The output is the same as json.dumps(root.execute(path)).encode().
+
+    Keys and values of the graph are encoded once.
+    Paths which cannot be written directly (e.g. because a property is set twice by an allOf)
+    are executed and serialized instead.
+    """
+
+    def __init__(self, root: Node, compact: bool = False) -> None:
+        self.root = root
+        self.item_separator, self.key_separator = (',', ':') if compact else (', ', ': ')
+        self._separator = self.item_separator.encode()
+        self._graph = None
+        self._tables = None
+        self.num_fallbacks = 0
+
+    def _dumps(self, value: any) -> str:
+        return json.dumps(value, separators=(self.item_separator, self.key_separator))
+
+    def _compile(self) -> Tuple[List[int], List[Optional[bytes]], List[Tuple[int, ...]]]:
+        # Kind, encoded key or value and successors of each node of the compiled graph,
+        # the successors of all decisions are reversed
+        graph = self.root.compile()
+        if self._tables is not None and self._graph is graph:
+            return self._tables
+        kinds = []
+        fragments = []
+        successors = []
+        for idx, node in enumerate(graph.nodes):
+            fragment = None
+            if isinstance(node, (NoOpDecision, NoOpLeaf)):
+                kind = _NO_OP
+            elif isinstance(node, InsertKeyNode):
+                kind = _KEY
+                fragment = (self._dumps(node.key) + self.key_separator).encode()
+            elif isinstance(node, AppendArrayItemNode):
+                kind = _ITEM
+            elif isinstance(node, SetValueLeaf):
+                kind = _VALUE
+                try:
+                    fragment = self._dumps(node.value).encode()
+                except (TypeError, ValueError):
+                    kind = _UNSUPPORTED
+            elif isinstance(node, CreateObjectNode):
+                kind = _OBJECT
+            elif isinstance(node, CreateArrayNode):
+                kind = _ARRAY
+            elif isinstance(node, CreateInputNode):
+                kind = _INPUT
+            elif isinstance(node, FetchOutputNode):
+                kind = _OUTPUT
+            else:
+                kind = _UNSUPPORTED
+            kinds.append(kind)
+            fragments.append(fragment)
+            targets = graph.succ_targets[graph.succ_offsets[idx]:graph.succ_offsets[idx + 1]]
+            if graph.all_transitions[idx]:
+                successors.append(tuple(reversed(targets)))
+            else:
+                successors.append(tuple(targets))
+        self._graph = graph
+        self._tables = kinds, fragments, successors
+        return self._tables
+
+    def _write(self, path: Path, buffer: bytearray):
+        kinds, fragments, successors = self._compile()
+        if kinds[0] != _INPUT:
+            raise _Unsupported()
+        all_transitions = self._graph.all_transitions
+        is_decision = self._graph.is_decision
+        separator = self._separator
+        path_idx = 0
+        num_decisions = len(path)
+        written = False
+        # Pending nodes and their input data, the node is -1 if data must be finished
+        stack: List[Tuple[int, any]] = [(0, None)]
+        while stack:
+            node, data = stack.pop()
+            if node == -1:
+                data.finish(buffer)
+                continue
+
+            # Follow the decisions of the path without using the stack
+            while True:
+                kind = kinds[node]
+                if kind == _NO_OP:
+                    pass
+                elif kind == _KEY:
+                    data = _Slot(data, fragments[node])
+                elif kind == _VALUE:
+                    data.fill(buffer, separator)
+                    buffer += fragments[node]
+                elif kind == _ITEM:
+                    if data.empty:
+                        data.empty = False
+                    else:
+                        buffer += separator
+                    data = _Slot(None, b'')
+                    stack.append((-1, data))
+                elif kind == _OBJECT:
+                    data.fill(buffer, separator)
+                    buffer += b'{'
+                    data = _Container(b'}')
+                    stack.append((-1, data))
+                elif kind == _ARRAY:
+                    # Fails if an existing array is reused
+                    data.fill(buffer, separator)
+                    buffer += b'['
+                    data = _Container(b']')
+                    stack.append((-1, data))
+                elif kind == _INPUT:
+                    data = _Slot(None, b'')
+                elif kind == _OUTPUT:
+                    if not data.filled:
+                        raise _Unsupported()
+                    written = True
+                else:
+                    raise _Unsupported()
+
+                if not is_decision[node]:
+                    break
+                if all_transitions[node]:
+                    stack.extend((i, data) for i in successors[node])
+                    break
+                if path_idx >= num_decisions:
+                    raise InternalException(f"Path too short, got {num_decisions} decisions")
+                node = successors[node][path[path_idx]]
+                path_idx += 1
+        if path_idx != num_decisions:
+            raise InternalException("Path not fully consumed")
+        if not written:
+            raise _Unsupported()
+
+    def write(self, path: Path, buffer: bytearray):
+        """
+        Executes a path and appends the encoded sample to the buffer
+        """
+        start = len(buffer)
+        try:
+            self._write(path, buffer)
+        except _Unsupported:
+            del buffer[start:]
+            self.num_fallbacks += 1
+            buffer += self._dumps(self.root.execute(path)).encode()
+
+    def emit(self, path: Path) -> bytes:
+        """
+        Executes a path and returns the encoded sample
+        """
+        buffer = bytearray()
+        self.write(path, buffer)
+        return bytes(buffer)
+
+    def emit_many(self, paths: Iterable[Path]) -> Generator[bytes, None, None]:
+        """
+        Executes many paths and yields the encoded samples, reuses a single buffer
+        """
+        buffer = bytearray()
+        for path in paths:
+            del buffer[:]
+            self.write(path, buffer)
+            yield bytes(buffer)
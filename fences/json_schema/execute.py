@@ -0,0 +1,200 @@
+from .parse import KeyReference, InsertKeyNode, AppendArrayItemNode, CreateObjectNode
+
+from fences.core.node import Node, Decision, Path
+from fences.core.exception import InternalException
+
+from typing import List, Optional, Tuple, Dict
+
+
+class CopyOnWriteExecutor:
+    """
+    Executes paths of a graph created by parse() with structural sharing.
+
+    A base sample is executed once. Each further sample is created by executing only the parts of its path
+    which differ from the base path: the value of a property or an array item whose decisions are the same
+    as in the base sample is taken from the base sample instead of being created again.
+    Objects are copied from the base sample and only their differing properties are executed.
+    Hence, if a sample differs from the base sample in a single property, only the containers
+    on the route to this property are created.
+
+    Samples share objects with each other, they must not be modified.
+    By default, the base path is the shortest valid path.
+    """
+
+    def __init__(self, root: Node, base_path: Optional[Path] = None) -> None:
+        self.root = root
+        if base_path is None:
+            base_path = list(root.compile().completion(0)[0])
+        self.base_path = base_path
+
+        # The execution of the base path in pre order, one entry per executed node:
+        # the node, the range of the path consumed by it and its successors,
+        # the position of the next node not being a successor and the result after its successors.
+        self._nodes: List[Node] = []
+        self._path_start: List[int] = []
+        self._path_end: List[int] = []
+        self._end: List[int] = []
+        self._result: List[any] = []
+        # Key references of properties and array items
+        self._slots: Dict[int, KeyReference] = {}
+        # Objects which can be copied: their successors, items and the number of items before each successor
+        self._objects: Dict[int, Tuple[List[int], List[Tuple[str, any]], List[int]]] = {}
+        self.base_sample = self._execute_base()
+
+    def _execute_base(self) -> any:
+        path = self.base_path
+        path_idx = 0
+        result = None
+        objects: Dict[int, Tuple[int, dict]] = {}
+        num_items: Dict[int, int] = {}
+        # Pending nodes and their input data, None marks the end of the node at the given position
+        stack: List[Tuple[Optional[Node], any]] = [(self.root, None)]
+        while stack:
+            node, data = stack.pop()
+            if node is None:
+                position = data
+                self._end[position] = len(self._nodes)
+                self._path_end[position] = path_idx
+                self._result[position] = result
+                continue
+            position = len(self._nodes)
+            self._nodes.append(node)
+            self._path_start.append(path_idx)
+            self._path_end.append(-1)
+            self._end.append(-1)
+            self._result.append(None)
+            stack.append((None, position))
+            if isinstance(data, dict) and id(data) in objects:
+                num_items[position] = len(data)
+                if isinstance(node, InsertKeyNode) and node.key in data:
+                    # Properties are overwritten, the items cannot be copied in order
+                    objects[id(data)] = (-1, data)
+
+            data = node.apply(data)
+            if isinstance(node, (InsertKeyNode, AppendArrayItemNode)):
+                self._slots[position] = data
+            if isinstance(node, CreateObjectNode) and node.all_transitions:
+                objects[id(data)] = (position, data)
+
+            if not isinstance(node, Decision):
+                result = data
+            elif node.all_transitions:
+                result = None
+                stack.extend(
+                    (transition.target, data) for transition in reversed(node.outgoing_transitions))
+            else:
+                if path_idx >= len(path):
+                    raise InternalException(f"Path too short, got {len(path)} decisions")
+                stack.append((node.outgoing_transitions[path[path_idx]].target, data))
+                path_idx += 1
+        if path_idx != len(path):
+            raise InternalException("Path not fully consumed")
+
+        for position, data in objects.values():
+            if position == -1:
+                continue
+            children = self._children(position)
+            items = list(data.items())
+            self._objects[position] = (children, items, [num_items[i] for i in children] + [len(items)])
+        return result
+
+    def _children(self, position: int) -> List[int]:
+        # Positions of the successors of the node at the given position in the base execution
+        children = []
+        child = position + 1
+        while child < self._end[position]:
+            children.append(child)
+            child = self._end[child]
+        return children
+
+    def _same_decisions(self, path: Path, path_idx: int, start: int, end: int) -> bool:
+        # Whether path continues with the same decisions as the base path from start to end
+        return path[path_idx:path_idx + end - start] == self.base_path[start:end]
+
+    def _first_difference(self, path: Path, path_idx: int, children: List[int], first: int) -> int:
+        # Index of the first successor starting at first, whose decisions differ from the base path
+        # or len(children) if there is none, using binary search
+        start = self._path_start[children[first]]
+        low = first
+        high = len(children)
+        while low < high:
+            middle = (low + high) // 2
+            if self._same_decisions(path, path_idx, start, self._path_end[children[middle]]):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def execute(self, path: Path) -> any:
+        """
+        Executes a path, same as root.execute(path)
+        """
+        path_idx = 0
+        result = None
+        # Pending nodes, their input data and their position in the base execution (-1 if there is none).
+        # Objects being copied are continued at their successor with the given index, node is None then.
+        stack: List[Tuple[Optional[Node], any, int]] = [(self.root, None, 0)]
+        while stack:
+            node, data, position = stack.pop()
+
+            if node is None:
+                # Copy all successors with the same decisions as in the base path
+                object_position, first = position
+                children, items, num_items = self._objects[object_position]
+                if first == len(children):
+                    continue
+                end = self._first_difference(path, path_idx, children, first)
+                data.update(items[num_items[first]:num_items[end]])
+                if end > first:
+                    path_idx += self._path_end[children[end - 1]] - self._path_start[children[first]]
+                    result = self._result[children[end - 1]]
+                if end < len(children):
+                    child = children[end]
+                    stack.append((None, data, (object_position, end + 1)))
+                    stack.append((self._nodes[child], data, child))
+                continue
+
+            if position in self._slots:
+                start = self._path_start[position]
+                end = self._path_end[position]
+                if self._same_decisions(path, path_idx, start, end):
+                    # Same decisions as in the base sample, share its value
+                    reference = self._slots[position]
+                    value = reference.get() if reference.has_value else None
+                    if isinstance(node, InsertKeyNode):
+                        if reference.has_value:
+                            data[node.key] = value
+                    else:
+                        data.append(value)
+                    path_idx += end - start
+                    result = self._result[position]
+                    continue
+
+            data = node.apply(data)
+            if not isinstance(node, Decision):
+                result = data
+            elif node.all_transitions:
+                result = None
+                if position in self._objects:
+                    stack.append((None, data, (position, 0)))
+                elif position != -1:
+                    children = self._children(position)
+                    stack.extend(
+                        (self._nodes[child], data, child) for child in reversed(children))
+                else:
+                    stack.extend(
+                        (transition.target, data, -1) for transition in reversed(node.outgoing_transitions))
+            else:
+                if path_idx >= len(path):
+                    raise InternalException(f"Path too short, got {len(path)} decisions")
+                idx = path[path_idx]
+                if position != -1 and idx == self.base_path[self._path_start[position]]:
+                    # Same decision as in the base sample
+                    child = position + 1
+                    stack.append((self._nodes[child], data, child))
+                else:
+                    stack.append((node.outgoing_transitions[idx].target, data, -1))
+                path_idx += 1
+        if path_idx != len(path):
+            raise InternalException("Path not fully consumed")
+        return result
@@ -1,22 +1,57 @@
-from typing import Union
+from typing import Union, List, Optional
 from fences.core.exception import JsonPointerException
 
+_ROOT_HASH = hash('#')
+
 
 class JsonPointer:
 
-    def __init__(self, elements=None) -> None:
-        self.elements = elements or []
+    def __init__(self, elements=None, parent: Optional["JsonPointer"] = None) -> None:
+        # Appending shares the parent instead of copying its elements,
+        # hence the pointers of deeply nested schemas do not grow quadratically
+        self._parent = parent
+        self._elements: List[str] = elements or []
+        # Hash of all elements, continues the hash of the parent
+        self._hash = _ROOT_HASH if parent is None else parent._hash
+        for element in self._elements:
+            self._hash = hash((self._hash, element))
+
+    @property
+    def elements(self) -> List[str]:
+        if self._parent is None:
+            return self._elements
+        pointers: List[JsonPointer] = []
+        pointer = self
+        while pointer is not None:
+            pointers.append(pointer)
+            pointer = pointer._parent
+        elements = []
+        for pointer in reversed(pointers):
+            elements.extend(pointer._elements)
+        return elements
 
     def __add__(self, other: Union[str, int]) -> "JsonPointer":
         if isinstance(other, str):
-            return JsonPointer(self.elements + [other])
+            return JsonPointer([other], self)
         if isinstance(other, int):
-            return JsonPointer(self.elements + [str(other)])
+            return JsonPointer([str(other)], self)
         raise NotImplementedError()
 
     def __str__(self) -> str:
         return '#/' + '/'.join(self.elements)
 
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: any) -> bool:
+        if not isinstance(other, JsonPointer):
+            return NotImplemented
+        return self is other or (self._hash == other._hash and self.elements == other.elements)
+
+    def __reduce__(self):
+        # Pickling the parents would recurse once per element
+        return JsonPointer, (self.elements,)
+
     @classmethod
     def from_string(self, value: str) -> "JsonPointer":
         if value == '#/' or value == '#':
@@ -55,3 +90,32 @@ class JsonPointer:
             return self.lookup(data[i], index+1)
         else:
             raise JsonPointerException(f"Cannot lookup in {data}")
+
+
+class PointerId:
+    """
+    Id of a node created for a JSON pointer, e.g. '#/properties/a__PROP'.
+    The string is only built on demand, ids of nested schemas share the elements of their pointers.
+    Equals its string, but is hashed by its pointer: look up ids in dicts by PointerId only.
+    """
+    __slots__ = ('pointer', 'suffix')
+
+    def __init__(self, pointer: JsonPointer, suffix: str = '') -> None:
+        self.pointer = pointer
+        self.suffix = suffix
+
+    def __str__(self) -> str:
+        return str(self.pointer) + self.suffix
+
+    def __repr__(self) -> str:
+        return f"PointerId('{self}')"
+
+    def __hash__(self) -> int:
+        return hash((self.pointer, self.suffix))
+
+    def __eq__(self, other: any) -> bool:
+        if isinstance(other, PointerId):
+            return self.suffix == other.suffix and self.pointer == other.pointer
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
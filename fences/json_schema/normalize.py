@@ -1,9 +1,9 @@
-from typing import List, Union, Set, Dict, Tuple, Callable
+from typing import List, Union, Set, Dict, Tuple, Callable, Optional, FrozenSet
 from fences.core.exception import NormalizationException
+from fences.core.util import trampoline, Recursion
 from fences.json_schema.json_pointer import JsonPointer
 import hashlib
 import json
-import copy
 
 from dataclasses import dataclass, field
 
@@ -27,6 +27,22 @@ class NormalizationConfig:
     })
     additional_mergers: Dict[str, Merger] = field(default_factory=dict)
     detect_duplicate_subschemas: bool = False
+    # Maximum number of conjunctions created by merge_full() for a single merge,
+    # merge_simple() is used instead if there are more (None for no limit)
+    max_conjunctions: Optional[int] = 10000
+    # Remove anyOf options which are equal to or implied by other options
+    remove_redundant_options: bool = True
+
+
+@dataclass
+class NormalizationStatistics:
+    # Number of anyOf options before removing redundant ones
+    num_options: int = 0
+    # Number of options removed because they are equal to a previous option
+    num_duplicates: int = 0
+    # Number of options removed because they imply another option
+    num_subsumed: int = 0
+
 
 SchemaType = Union[dict, bool]
 
@@ -44,6 +60,215 @@ ALL_TYPES = [
 ]
 
 
+def _dumps(schema: any) -> str:
+    # Same as json.dumps(schema), but without limiting the depth of the schema
+    try:
+        return json.dumps(schema)
+    except RecursionError:
+        pass
+    parts: List[str] = []
+    # Pairs of (is_text, value), text is added to the output as is
+    stack = [(False, schema)]
+    while stack:
+        is_text, value = stack.pop()
+        if is_text:
+            parts.append(value)
+        elif isinstance(value, dict):
+            parts.append('{')
+            stack.append((True, '}'))
+            items = list(value.items())
+            for idx in reversed(range(len(items))):
+                key, sub_value = items[idx]
+                if not isinstance(key, str):
+                    key = json.dumps(key)
+                stack.append((False, sub_value))
+                stack.append((True, json.dumps(key) + ': '))
+                if idx:
+                    stack.append((True, ', '))
+        elif isinstance(value, list):
+            parts.append('[')
+            stack.append((True, ']'))
+            for idx in reversed(range(len(value))):
+                stack.append((False, value[idx]))
+                if idx:
+                    stack.append((True, ', '))
+        else:
+            parts.append(json.dumps(value))
+    return ''.join(parts)
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError("Schemas must not be modified during normalization")
+
+
+class _FrozenDict(dict):
+    """
+    Immutable dict, knows its structural hash
+    """
+    __slots__ = ('hash',)
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _immutable
+
+
+class _FrozenList(list):
+    """
+    Immutable list, knows its structural hash
+    """
+    __slots__ = ('hash',)
+    __setitem__ = __delitem__ = append = extend = insert = pop = remove = clear = sort = reverse = \
+        __iadd__ = __imul__ = _immutable
+
+
+_FROZEN = (_FrozenDict, _FrozenList)
+
+
+def _hash_text(value: Union[dict, list], child_hash: Callable[[any], str], sort_keys: bool = False) -> str:
+    # Hashes a dict or list, equal serializations (see json.dumps()) have equal hashes
+    if isinstance(value, dict):
+        # Keys are serialized like json.dumps() does
+        items = [(json.dumps(k if isinstance(k, str) else json.dumps(k)), v) for k, v in value.items()]
+        if sort_keys:
+            items.sort(key=lambda i: i[0])
+        text = '{' + ','.join(k + ':' + child_hash(v) for k, v in items)
+    else:
+        text = '[' + ','.join(child_hash(v) for v in value)
+    return '#' + hashlib.sha1(text.encode()).hexdigest()
+
+
+def _frozen_hash(value: any) -> str:
+    if isinstance(value, _FROZEN):
+        return value.hash
+    return json.dumps(value)
+
+
+def _freeze(schema: any) -> any:
+    # Converts a JSON value into frozen dicts and lists with their hashes, without recursion.
+    # Shared values are converted once, frozen values are kept.
+    frozen: Dict[int, any] = {}
+    in_progress: Set[int] = set()
+    stack = [schema]
+    while stack:
+        value = stack[-1]
+        if id(value) in frozen:
+            stack.pop()
+            continue
+        if isinstance(value, _FROZEN) or not isinstance(value, (dict, list)):
+            frozen[id(value)] = value
+            stack.pop()
+            continue
+        children = value.values() if isinstance(value, dict) else value
+        if id(value) not in in_progress:
+            # Freeze the children first
+            in_progress.add(id(value))
+            for child in children:
+                if id(child) in in_progress:
+                    raise NormalizationException("Schema contains a circular reference")
+                if id(child) not in frozen:
+                    stack.append(child)
+            continue
+        stack.pop()
+        in_progress.remove(id(value))
+        if isinstance(value, dict):
+            result = _FrozenDict((k, frozen[id(v)]) for k, v in value.items())
+        else:
+            result = _FrozenList(frozen[id(v)] for v in value)
+        result.hash = _hash_text(result, _frozen_hash)
+        frozen[id(value)] = result
+    return frozen[id(schema)]
+
+
+def _thaw(schema: dict) -> dict:
+    # Replaces all frozen dicts and lists in a plain dict by plain ones, without recursion
+    thawed: Dict[int, any] = {}
+    stack = [schema]
+    while stack:
+        container = stack.pop()
+        for key, value in (container.items() if type(container) is dict else enumerate(container)):
+            if isinstance(value, _FROZEN):
+                if id(value) not in thawed:
+                    thawed[id(value)] = dict(value) if isinstance(value, dict) else list(value)
+                    stack.append(thawed[id(value)])
+                container[key] = thawed[id(value)]
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+    return schema
+
+
+class _Memo:
+    """
+    Structural hashes of (sub-)schemas and the results of previous normalizations by hash.
+
+    The input schema is frozen, it knows its hashes.
+    Schemas created during the normalization are hashed once, hence, they must not be modified afterwards.
+    Equal hashes mean equal serializations, i.e. key order matters.
+    Canonical hashes do not depend on the order of keys.
+    """
+
+    def __init__(self, statistics: NormalizationStatistics) -> None:
+        self.statistics = statistics
+        # Hash of schemas created during the normalization by id, the schemas are kept to keep their ids unique
+        self._hashes: Dict[int, Tuple[any, str]] = {}
+        # Canonical hash of all schemas by id, frozen ones included
+        self._canonical_hashes: Dict[int, Tuple[any, str]] = {}
+        self.dnf: Dict[str, dict] = {}
+        self.normalized: Dict[str, dict] = {}
+        # Names of schemas in $defs by hash
+        self.ref_names: Dict[str, str] = {}
+
+    def _text(self, value: any) -> str:
+        if isinstance(value, _FROZEN):
+            return value.hash
+        if isinstance(value, (dict, list)):
+            return self._hashes[id(value)][1]
+        return json.dumps(value)
+
+    def hash(self, schema: any) -> str:
+        if isinstance(schema, _FROZEN):
+            return schema.hash
+        if not isinstance(schema, (dict, list)):
+            return json.dumps(schema)
+        hashes = self._hashes
+        if id(schema) in hashes:
+            return hashes[id(schema)][1]
+        # Frozen schemas cannot contain plain ones, hence, there are no cycles
+        stack = [schema]
+        while stack:
+            value = stack[-1]
+            children = value.values() if isinstance(value, dict) else value
+            missing = [i for i in children if isinstance(i, (dict, list))
+                       and not isinstance(i, _FROZEN) and id(i) not in hashes]
+            if missing:
+                # Hash the children first
+                stack.extend(missing)
+                continue
+            stack.pop()
+            hashes[id(value)] = (value, _hash_text(value, self._text))
+        return hashes[id(schema)][1]
+
+    def _canonical_text(self, value: any) -> str:
+        if isinstance(value, (dict, list)):
+            return self._canonical_hashes[id(value)][1]
+        return json.dumps(value)
+
+    def canonical_hash(self, schema: any) -> str:
+        if not isinstance(schema, (dict, list)):
+            return json.dumps(schema)
+        hashes = self._canonical_hashes
+        if id(schema) in hashes:
+            return hashes[id(schema)][1]
+        stack = [schema]
+        while stack:
+            value = stack[-1]
+            children = value.values() if isinstance(value, dict) else value
+            missing = [i for i in children if isinstance(i, (dict, list)) and id(i) not in hashes]
+            if missing:
+                # Hash the children first
+                stack.extend(missing)
+                continue
+            stack.pop()
+            hashes[id(value)] = (value, _hash_text(value, self._canonical_text, True))
+        return hashes[id(schema)][1]
+
+
 class Resolver:
 
     def __init__(self, schema: SchemaType):
@@ -168,7 +393,8 @@ def _merge_properties(result: dict, to_add: dict) -> dict:
     # Result:   a: 1a+2n, b: 1b+2b, c: 2c+1n, ...: 1n+2n
 
     props_result = result.get('properties', {})
-    props_result = copy.deepcopy(props_result)  # TODO: why?
+    # Schemas are shared, do not modify them
+    props_result = dict(props_result)
     props_to_add = to_add.get('properties', {})
     additional_result = result.get('additionalProperties')
     additional_to_add = to_add.get('additionalProperties')
@@ -210,10 +436,10 @@ def _merge_prefix_items(result: dict, to_add: dict) -> dict:
     result_prefix_items = []
 
     if len(prefix_items_a) > len(prefix_items_b):
-        prefix_items_b += [items_b] * \
+        prefix_items_b = prefix_items_b + [items_b] * \
             (len(prefix_items_a) - len(prefix_items_b))
     else:
-        prefix_items_a += [items_a] * \
+        prefix_items_a = prefix_items_a + [items_a] * \
             (len(prefix_items_b) - len(prefix_items_a))
 
     assert len(prefix_items_a) == len(prefix_items_b)
@@ -279,8 +505,32 @@ def merge_simple(schemas: List[SchemaType], config: NormalizationConfig) -> Sche
     return {'anyOf': results}
 
 
+# Bounds which contradict each other and the types they apply to, other types are not restricted by them
+_BOUNDS = [
+    ('minimum', 'maximum', {'number', 'integer'}),
+    ('minLength', 'maxLength', {'string'}),
+    ('minItems', 'maxItems', {'array'}),
+]
+
+
+def _is_unsatisfiable(schema: dict) -> bool:
+    # Detects conjunctions which cannot be satisfied by any value (but not all of them).
+    # Merging further schemas into them keeps them unsatisfiable.
+    if schema.get('type', True) == [] or schema.get('enum', True) == []:
+        return True
+    if 'type' not in schema:
+        return False
+    types = schema['type']
+    types = {types} if isinstance(types, str) else set(types)
+    for lower, upper, bounded_types in _BOUNDS:
+        if lower in schema and upper in schema and schema[lower] > schema[upper] and types <= bounded_types:
+            return True
+    return False
+
+
 def merge_full(schemas: List[SchemaType], config: NormalizationConfig) -> SchemaType:
     assert len(schemas) > 0
+    limit = config.max_conjunctions
     result = [{}]
     for schema in schemas:
         new_result = []
@@ -288,11 +538,114 @@ def merge_full(schemas: List[SchemaType], config: NormalizationConfig) -> Schema
             for i in result:
                 ii = i.copy()
                 _merge(ii, option, config)
+                if _is_unsatisfiable(ii):
+                    continue
                 new_result.append(ii)
+                if limit is not None and len(new_result) > limit:
+                    return merge_simple(schemas, config)
+        if not new_result:
+            return {'anyOf': [{'enum': []}]}
         result = new_result
     return {'anyOf': result}
 
 
+_SET_KEYWORDS = ['type', 'enum', 'NOT_enum', 'required']
+_LOWER_BOUNDS = ['minimum', 'exclusiveMinimum', 'minLength', 'minItems']
+_UPPER_BOUNDS = ['maximum', 'exclusiveMaximum', 'maxLength', 'maxItems']
+
+# Options of larger anyOfs are only checked for duplicates, checking for implications is quadratic
+_MAX_SUBSUMPTION_OPTIONS = 1000
+
+
+def _as_set(value: any) -> FrozenSet[str]:
+    # The canonical members of a keyword with set semantics (a type may be a single string)
+    if isinstance(value, str):
+        value = [value]
+    return frozenset(json.dumps(i, sort_keys=True) for i in value)
+
+
+def _summarize(option: dict, memo: _Memo) -> Tuple[FrozenSet[Tuple[str, str]], Dict[str, any]]:
+    # Splits an option into pairs of keywords and hashes of their values, which can only imply equal ones,
+    # and the remaining keywords compared by _implies(): sets for keywords with set semantics and bounds
+    exact = []
+    ordered = {}
+    for key, value in option.items():
+        if key in _SET_KEYWORDS:
+            ordered[key] = _as_set(value)
+        elif key in _LOWER_BOUNDS or key in _UPPER_BOUNDS:
+            ordered[key] = value
+        else:
+            exact.append((key, memo.canonical_hash(value)))
+    return frozenset(exact), ordered
+
+
+def _implies(a: Dict[str, any], b: Dict[str, any]) -> bool:
+    # Returns True if the keywords summarized by a imply the ones summarized by b (False if unknown)
+    for key, value_b in b.items():
+        if key not in a:
+            return False
+        value_a = a[key]
+        if key in ['type', 'enum']:
+            implied = value_a <= value_b
+        elif key in ['NOT_enum', 'required']:
+            implied = value_a >= value_b
+        elif key in _LOWER_BOUNDS:
+            implied = value_a >= value_b
+        else:
+            implied = value_a <= value_b
+        if not implied:
+            return False
+    return True
+
+
+def _remove_redundant_options(schema: dict, memo: _Memo) -> dict:
+    # anyOf: [a, b] equals anyOf: [b] if a is equal to b or implies b
+    statistics = memo.statistics
+    options = []
+    summaries = []
+    hashes = set()
+    for option in schema['anyOf']:
+        statistics.num_options += 1
+        exact, ordered = _summarize(option, memo)
+        # Independent of the order of keys and of keywords with set semantics
+        key = (exact, frozenset(ordered.items()))
+        if key in hashes:
+            statistics.num_duplicates += 1
+            continue
+        hashes.add(key)
+        options.append(option)
+        summaries.append((exact, ordered))
+
+    if len(options) > _MAX_SUBSUMPTION_OPTIONS:
+        return {'anyOf': options}
+    # Unsatisfiable options imply all others
+    unsatisfiable = [_is_unsatisfiable(i) for i in options]
+    groups: Dict[FrozenSet[Tuple[str, str]], List[int]] = {}
+    for idx, (exact, _) in enumerate(summaries):
+        groups.setdefault(exact, []).append(idx)
+
+    def implies(idx: int, other_idx: int) -> bool:
+        return unsatisfiable[idx] or (summaries[other_idx][0] <= summaries[idx][0] and
+                                      _implies(summaries[idx][1], summaries[other_idx][1]))
+
+    removed = [False] * len(options)
+    for idx, (exact, ordered) in enumerate(summaries):
+        for other_exact, group in groups.items():
+            if not unsatisfiable[idx] and not other_exact <= exact:
+                continue
+            for other_idx in group:
+                if other_idx == idx or removed[other_idx] or not implies(idx, other_idx):
+                    continue
+                # Keep the first one of equivalent options
+                if other_idx < idx or not implies(other_idx, idx):
+                    removed[idx] = True
+                    statistics.num_subsumed += 1
+                    break
+            if removed[idx]:
+                break
+    return {'anyOf': [i for i, is_removed in zip(options, removed) if not is_removed]}
+
+
 def _simplify_type(schema: dict):
     if 'type' not in schema:
         return schema
@@ -369,7 +722,7 @@ def _simplify_const(schema: dict) -> dict:
     schema = schema.copy()
     const = schema.pop('const')
     if 'enum' in schema:
-        schema['enum'] += [const]
+        schema['enum'] = schema['enum'] + [const]
     else:
         schema['enum'] = [const]
     return schema
@@ -407,7 +760,9 @@ def _simplify_dependent_required(schema: dict) -> dict:
     return {"allOf": [schema] + options}
 
 
-def _inline_refs(schema: dict, resolver: Resolver) -> Tuple[dict, bool]:
+def _inline_refs(schema: dict, resolver: Resolver) -> Recursion:
+    # Returns Tuple[dict, bool], evaluate using trampoline()
+    # The schema is not modified, it is returned as is if it does not contain references
     if schema is False:
         return NORM_FALSE.copy(), False
 
@@ -421,27 +776,36 @@ def _inline_refs(schema: dict, resolver: Resolver) -> Tuple[dict, bool]:
         del side_schema['$ref']
         pointer = JsonPointer.from_string(schema['$ref'])
         ref_schema = resolver.resolve(pointer)
-        # We need a deepcopy here, otherwise we cannot stringify it due to circular references
-        ref_schema = copy.deepcopy(ref_schema)
         schema = {'allOf': [side_schema, ref_schema]}
         contains_refs = True
 
+    new_schema = None
     for kw in ['anyOf', 'allOf', 'oneOf']:
-        for idx, sub_schema in enumerate(schema.get(kw, [])):
-            (new_schema, new_contains_refs) = _inline_refs(sub_schema, resolver)
-            schema[kw][idx] = new_schema
+        if kw not in schema:
+            continue
+        new_sub_schemas = []
+        for sub_schema in schema[kw]:
+            (new_sub_schema, new_contains_refs) = yield _inline_refs(sub_schema, resolver)
+            new_sub_schemas.append(new_sub_schema)
             contains_refs = contains_refs or new_contains_refs
+        if any(i is not j for i, j in zip(new_sub_schemas, schema[kw])):
+            new_schema = new_schema or schema.copy()
+            new_schema[kw] = new_sub_schemas
     for kw in ['not', 'if', 'then', 'else']:
         if kw in schema:
-            (new_schema, new_contains_refs) = _inline_refs(
+            (new_sub_schema, new_contains_refs) = yield _inline_refs(
                 schema[kw], resolver)
-            schema[kw] = new_schema
             contains_refs = contains_refs or new_contains_refs
+            if new_sub_schema is not schema[kw]:
+                new_schema = new_schema or schema.copy()
+                new_schema[kw] = new_sub_schema
 
-    return schema, contains_refs
+    return new_schema or schema, contains_refs
 
 
-def _to_dnf(schema: dict, config: NormalizationConfig) -> dict:
+def _to_dnf(schema: dict, config: NormalizationConfig, memo: _Memo) -> Recursion:
+    # Returns dict, evaluate using trampoline()
+    # The result is shared by all equal schemas, it must not be modified
 
     if schema is False:
         return NORM_FALSE.copy()
@@ -449,8 +813,11 @@ def _to_dnf(schema: dict, config: NormalizationConfig) -> dict:
     if schema is True:
         return NORM_TRUE.copy()
 
+    key = memo.hash(schema)
+    if key in memo.dnf:
+        return memo.dnf[key]
+
     schema = {k: v for k, v in schema.items() if k not in config.discard_fields}
-    schema = copy.deepcopy(schema)
     schema = _simplify_const(schema)
     schema = _simplify_if_then_else(schema)
     schema = _simplify_type(schema)
@@ -460,7 +827,7 @@ def _to_dnf(schema: dict, config: NormalizationConfig) -> dict:
     if 'anyOf' in schema:
         any_ofs = []
         for sub_schema in schema['anyOf']:
-            normalized_sub_schema = _to_dnf(sub_schema, config)
+            normalized_sub_schema = yield _to_dnf(sub_schema, config, memo)
             any_ofs.extend(normalized_sub_schema['anyOf'])
     else:
         any_ofs = [{}]
@@ -468,9 +835,9 @@ def _to_dnf(schema: dict, config: NormalizationConfig) -> dict:
     # oneOf
     if 'oneOf' in schema:
         one_ofs = []
-        normalized_sub_schemas = [
-            _to_dnf(sub_schema, config)for sub_schema in schema['oneOf']
-        ]
+        normalized_sub_schemas = []
+        for sub_schema in schema['oneOf']:
+            normalized_sub_schemas.append((yield _to_dnf(sub_schema, config, memo)))
         for idx, _ in enumerate(normalized_sub_schemas):
             options = merge([
                 invert(i, config) if sub_idx == idx else i
@@ -488,11 +855,11 @@ def _to_dnf(schema: dict, config: NormalizationConfig) -> dict:
             del side_schema[sub_schema]
     all_ofs.append({'anyOf': [side_schema]})
     for sub_schema in schema.get('allOf', []):
-        all_ofs.append(_to_dnf(sub_schema, config))
+        all_ofs.append((yield _to_dnf(sub_schema, config, memo)))
 
     # not
     if 'not' in schema:
-        norm_schema = _to_dnf(schema['not'], config)
+        norm_schema = yield _to_dnf(schema['not'], config, memo)
         all_ofs.append(invert(norm_schema, config))
 
     s = merge(all_ofs, config)
@@ -502,10 +869,25 @@ def _to_dnf(schema: dict, config: NormalizationConfig) -> dict:
         {'anyOf': one_ofs},
         s
     ], config)
+    if config.remove_redundant_options:
+        result = _remove_redundant_options(result, memo)
+    memo.dnf[key] = result
     return result
 
 
-def _normalize(schema: dict, resolver: Resolver, new_refs: Dict[str, dict], config: NormalizationConfig) -> dict:
+def _copy_option(option: dict) -> dict:
+    # Copies everything _normalize() modifies
+    option = option.copy()
+    if 'properties' in option:
+        option['properties'] = dict(option['properties'])
+    if 'prefixItems' in option:
+        option['prefixItems'] = list(option['prefixItems'])
+    return option
+
+
+def _normalize(schema: dict, resolver: Resolver, new_refs: Dict[str, dict],
+               config: NormalizationConfig, memo: _Memo) -> Recursion:
+    # Returns dict, evaluate using trampoline()
     if schema is False:
         return NORM_FALSE.copy()
 
@@ -516,45 +898,58 @@ def _normalize(schema: dict, resolver: Resolver, new_refs: Dict[str, dict], conf
         return NORM_TRUE.copy()
 
     # Check cache (to avoid stack overflows due to recursive schemas)
-    new_ref_name = hashlib.sha1(json.dumps(schema).encode()).hexdigest()
-    if new_ref_name in new_refs:
-        return {'anyOf': [{'$ref': f"#/$defs/{new_ref_name}"}]}
+    key = memo.hash(schema)
+    if key in memo.ref_names:
+        return {'anyOf': [{'$ref': f"#/$defs/{memo.ref_names[key]}"}]}
+    if key in memo.normalized:
+        return memo.normalized[key]
 
     # Inline all references (if any)
-    (schema, contains_refs) = _inline_refs(schema, resolver)
+    (inlined_schema, contains_refs) = yield _inline_refs(schema, resolver)
 
-    result = _to_dnf(schema, config)
+    dnf = yield _to_dnf(inlined_schema, config, memo)
+    result = {'anyOf': [_copy_option(i) for i in dnf['anyOf']]}
 
     contains_refs = contains_refs or config.detect_duplicate_subschemas
     # Store new schema if sub-schemas later try to reference it
     if contains_refs:
+        new_ref_name = hashlib.sha1(_dumps(schema).encode()).hexdigest()
+        memo.ref_names[key] = new_ref_name
         new_refs[new_ref_name] = result
 
     # Iterate sub-schemas
     for sub_schema in result['anyOf']:
         for kw in ['additionalProperties', 'items', 'additionalItems', 'contains']:
             if kw in sub_schema:
-                sub_schema[kw] = _normalize(
-                    sub_schema[kw], resolver, new_refs, config)
+                sub_schema[kw] = yield _normalize(
+                    sub_schema[kw], resolver, new_refs, config, memo)
 
         props: dict = sub_schema.get('properties', {})
         for name, sub_sub_schema in props.items():
-            props[name] = _normalize(
-                sub_sub_schema, resolver, new_refs, config)
+            props[name] = yield _normalize(
+                sub_sub_schema, resolver, new_refs, config, memo)
 
         prefix_items: list = sub_schema.get('prefixItems', [])
         for idx, sub_sub_schema in enumerate(prefix_items):
-            prefix_items[idx] = _normalize(
-                sub_sub_schema, resolver, new_refs, config)
+            prefix_items[idx] = yield _normalize(
+                sub_sub_schema, resolver, new_refs, config, memo)
 
     # Return
     if contains_refs:
         return {'anyOf': [{'$ref': f"#/$defs/{new_ref_name}"}]}
-    else:
-        return result
+    # Shared by all equal sub-schemas, converted into plain dicts and lists by _thaw()
+    result = _freeze(result)
+    memo.normalized[key] = result
+    return result
 
 
-def normalize(schema: SchemaType, config: NormalizationConfig = NormalizationConfig()) -> any:
+def normalize(schema: SchemaType, config: NormalizationConfig = NormalizationConfig(),
+              statistics: Optional[NormalizationStatistics] = None) -> any:
+    """
+    Returns an equivalent schema in disjunctive normal form, see check_normalized().
+    Equal sub-schemas share their normalized result.
+    If statistics is given, it is updated with the number of anyOf options removed as redundant.
+    """
     if schema is False:
         return NORM_FALSE.copy()
 
@@ -565,27 +960,120 @@ def normalize(schema: SchemaType, config: NormalizationConfig = NormalizationCon
         raise NormalizationException(
             f"Schema must be of type bool or dict, got {type(schema)}")
 
-    # TODO: deepcopy really needed?
-    new_schema = copy.deepcopy(schema)
-    for kw in ['$schema', '$defs']:
-        if kw in schema:
-            del new_schema[kw]
-    resolver = Resolver(schema)
+    # Sub-schemas are shared during normalization, they are frozen to ensure they are never modified
+    frozen_schema = _freeze(schema)
+    new_schema = {k: v for k, v in frozen_schema.items() if k not in ['$schema', '$defs']}
+    resolver = Resolver(frozen_schema)
     new_refs: Dict[str, dict] = {}
-    new_schema = _normalize(new_schema, resolver, new_refs, config)
+    memo = _Memo(statistics or NormalizationStatistics())
+    new_schema = dict(trampoline(_normalize(new_schema, resolver, new_refs, config, memo)))
     if '$schema' in schema:
         new_schema['$schema'] = schema['$schema']
     new_schema['$defs'] = new_refs
-    return new_schema
+    return _thaw(new_schema)
+
+
+def _freeze_sub_schemas(option: dict) -> dict:
+    # Sub-schemas are normalized later, the parser expects them to be dicts.
+    # Freezing them once avoids freezing them whenever they are normalized.
+    def freeze(sub_schema: any) -> any:
+        if sub_schema is True:
+            sub_schema = NORM_TRUE
+        elif sub_schema is False:
+            sub_schema = NORM_FALSE
+        return _freeze(sub_schema)
+
+    option = option.copy()
+    for kw in ['additionalProperties', 'items', 'additionalItems', 'contains']:
+        if kw in option:
+            option[kw] = freeze(option[kw])
+    if 'properties' in option:
+        option['properties'] = {k: freeze(v) for k, v in option['properties'].items()}
+    if 'prefixItems' in option:
+        option['prefixItems'] = [freeze(i) for i in option['prefixItems']]
+    return option
+
+
+class LazyNormalizer:
+    """
+    Normalizes the sub-schemas of a document on demand, e.g. while parsing, see Config.normalizer.
+
+    normalize() returns a single sub-schema in disjunctive normal form, but the sub-schemas of its options
+    (properties, items, ...) are not normalized yet, they are passed to normalize() once they are needed.
+    References are resolved within the document. Like normalize(), sub-schemas containing references are
+    replaced by references to definitions, use definition() to get them.
+    All results are memoized, hence, the same normalizer should be used for all sub-schemas of a document.
+    Results are shared, they must not be modified.
+    """
+
+    def __init__(self, document: SchemaType, config: NormalizationConfig = NormalizationConfig(),
+                 statistics: Optional[NormalizationStatistics] = None) -> None:
+        self.document = _freeze(document)
+        self.config = config
+        self._resolver = Resolver(self.document)
+        self._memo = _Memo(statistics or NormalizationStatistics())
+        # Inlined schemas of the definitions by name
+        self._definitions: Dict[str, dict] = {}
+        self._normalized_definitions: Dict[str, dict] = {}
+
+    def _to_dnf(self, schema: dict) -> dict:
+        dnf = trampoline(_to_dnf(schema, self.config, self._memo))
+        return {'anyOf': [_freeze_sub_schemas(i) for i in dnf['anyOf']]}
+
+    def normalize(self, schema: SchemaType) -> dict:
+        """
+        Normalizes a sub-schema of the document (or any schema referencing the document),
+        without normalizing its own sub-schemas
+        """
+        if schema is False:
+            return NORM_FALSE.copy()
+
+        if schema is True or len(schema) == 0:
+            return NORM_TRUE.copy()
+
+        schema = _freeze(schema)
+        memo = self._memo
+        key = memo.hash(schema)
+        if key in memo.ref_names:
+            return {'anyOf': [{'$ref': f"#/$defs/{memo.ref_names[key]}"}]}
+        if key in memo.normalized:
+            return memo.normalized[key]
+
+        (inlined_schema, contains_refs) = trampoline(_inline_refs(schema, self._resolver))
+        if contains_refs or self.config.detect_duplicate_subschemas:
+            # Normalized by definition(), to avoid endless recursions
+            name = hashlib.sha1(_dumps(schema).encode()).hexdigest()
+            memo.ref_names[key] = name
+            self._definitions[name] = inlined_schema
+            return {'anyOf': [{'$ref': f"#/$defs/{name}"}]}
+
+        result = self._to_dnf(inlined_schema)
+        memo.normalized[key] = result
+        return result
+
+    def definition(self, name: str) -> dict:
+        """
+        Returns the definition referenced by '#/$defs/<name>' in a result of normalize(),
+        in disjunctive normal form
+        """
+        if name in self._normalized_definitions:
+            return self._normalized_definitions[name]
+        try:
+            schema = self._definitions[name]
+        except KeyError:
+            raise NormalizationException(f"Unknown definition '{name}'")
+        result = self._to_dnf(schema)
+        self._normalized_definitions[name] = result
+        return result
 
 
 def check_normalized(schema: SchemaType) -> None:
     resolver = Resolver(schema)
     checked_refs = set()
-    _check_normalized(schema, resolver, checked_refs)
+    trampoline(_check_normalized(schema, resolver, checked_refs))
 
 
-def _check_normalized(schema: SchemaType, resolver: Resolver, checked_refs: Set[str]) -> None:
+def _check_normalized(schema: SchemaType, resolver: Resolver, checked_refs: Set[str]) -> Recursion:
     if not isinstance(schema, dict):
         raise NormalizationException(f"Must be a dict, got {schema}")
 
@@ -617,16 +1105,16 @@ def _check_normalized(schema: SchemaType, resolver: Resolver, checked_refs: Set[
             if ref not in checked_refs:
                 checked_refs.add(ref)
                 pointer = JsonPointer.from_string(ref)
-                _check_normalized(resolver.resolve(
+                yield _check_normalized(resolver.resolve(
                     pointer), resolver, checked_refs)
 
         # Traverse sub-schemas
         for kw in ['additionalProperties', 'items', 'additionalItems', 'contains']:
             if kw in schema:
-                _check_normalized(schema[kw], resolver, checked_refs)
+                yield _check_normalized(schema[kw], resolver, checked_refs)
 
         for i in sub_schema.get('properties', {}).values():
-            _check_normalized(i, resolver, checked_refs)
+            yield _check_normalized(i, resolver, checked_refs)
 
         for i in sub_schema.get('prefixItems', []):
-            _check_normalized(i, resolver, checked_refs)
+            yield _check_normalized(i, resolver, checked_refs)
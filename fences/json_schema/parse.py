@@ -1,14 +1,17 @@
-from typing import Set, Dict, List, Optional, Union
+from typing import Set, Dict, List, Optional, Union, Tuple
 
 from .exceptions import JsonSchemaException
-from .config import Config, FormatSamples
-from .json_pointer import JsonPointer
+from .config import Config, FormatSamples, Handler
+from .json_pointer import JsonPointer, PointerId
+from fences.core.exception import JsonPointerException
 from ..core.random import generate_random_string, StringProperties
 from .normalize import normalize
 
 from fences.core.node import Decision, Leaf, Node, Reference, NoOpLeaf, NoOpDecision
+from fences.core.cache import GraphCache
+from fences.core.util import trampoline, Recursion
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import base64
 
 
@@ -26,6 +29,7 @@ class KeyReference:
         return self.ref[self.key]
 
 class SetValueLeaf(Leaf):
+    __slots__ = ('value',)
 
     def __init__(self, id: str, is_valid: bool, value: any) -> None:
         super().__init__(id, is_valid)
@@ -40,6 +44,8 @@ class SetValueLeaf(Leaf):
 
 
 class InsertKeyNode(Decision):
+    __slots__ = ('key',)
+
     def __init__(self, id: str, key: str) -> None:
         super().__init__(id)
         self.key = key
@@ -52,6 +58,8 @@ class InsertKeyNode(Decision):
 
 
 class CreateArrayNode(Decision):
+    __slots__ = ()
+
     def apply(self, data: KeyReference) -> any:
         # Needed to handle allOf properly
         if data.has_value:
@@ -65,6 +73,8 @@ class CreateArrayNode(Decision):
 
 
 class AppendArrayItemNode(Decision):
+    __slots__ = ()
+
     def apply(self, data: any) -> KeyReference:
         data.append(None)
         return KeyReference(data, len(data)-1)
@@ -74,6 +84,8 @@ class AppendArrayItemNode(Decision):
 
 
 class CreateObjectNode(Decision):
+    __slots__ = ()
+
     def apply(self, data: KeyReference) -> KeyReference:
         value = {}
         data.set(value)
@@ -84,6 +96,8 @@ class CreateObjectNode(Decision):
 
 
 class CreateInputNode(Decision):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(None, False)
 
@@ -95,6 +109,8 @@ class CreateInputNode(Decision):
 
 
 class FetchOutputNode(Leaf):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(None, True)
 
@@ -221,7 +237,7 @@ def parse_enum(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPo
     valid_values = set(_read_list(data, 'enum', unparsed_keys, path, []))
     invalid_values = invalid_values - valid_values
     valid_values = valid_values - invalid_values
-    root = NoOpDecision(str(path), False)
+    root = NoOpDecision(PointerId(path), False)
     max_length = 0
     for value in valid_values:
         root.add_transition(SetValueLeaf(None, True, value))
@@ -232,12 +248,25 @@ def parse_enum(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPo
     return root
 
 
+def _reference_id(ref: str) -> Union[PointerId, str]:
+    # Node ids are PointerIds, hence references to them are PointerIds as well
+    try:
+        return PointerId(JsonPointer.from_string(ref))
+    except JsonPointerException:
+        return ref
+
+
 def parse_reference(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPointer) -> Node:
     ref = _read_string(data, '$ref', unparsed_keys, path)
-    return Reference(str(path), ref)
+    return Reference(PointerId(path), _reference_id(ref))
 
 
 def parse_object(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPointer) -> Node:
+    return trampoline(_parse_object(data, config, unparsed_keys, path))
+
+
+def _parse_object(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPointer) -> Recursion:
+    # Returns Node, evaluate using trampoline()
     props = _read_dict(data, 'properties', unparsed_keys, path, {})
 
     additional_props = _read_dict(data, 'additionalProperties', unparsed_keys, path, {})
@@ -259,7 +288,7 @@ def parse_object(data: dict, config: Config, unparsed_keys: Set[str], path: Json
             raise JsonSchemaException(f"Duplicate token '{token}' in ${sub_path}", sub_path)
         required_props.add(token)
 
-    super_root = NoOpDecision(f"{path}_OBJECT")
+    super_root = NoOpDecision(PointerId(path, '_OBJECT'))
 
     # Properties
     root = CreateObjectNode(None, True)
@@ -267,13 +296,13 @@ def parse_object(data: dict, config: Config, unparsed_keys: Set[str], path: Json
     for key, value in props.items():
         sub_path = path + 'properties' + key
 
-        property_root = NoOpDecision(f"{sub_path}__PROP", False)
+        property_root = NoOpDecision(PointerId(sub_path, '__PROP'), False)
         root.add_transition(property_root)
 
         # Insert property (always valid)
-        key_node = InsertKeyNode(f"{sub_path}__KEY", key)
+        key_node = InsertKeyNode(PointerId(sub_path, '__KEY'), key)
         property_root.add_transition(key_node)
-        value_node = parse_dict(value, config, sub_path)
+        value_node = yield _parse_dict(value, config, sub_path)
         key_node.add_transition(value_node)
 
         # Omit property (valid if not required)
@@ -286,9 +315,9 @@ def parse_object(data: dict, config: Config, unparsed_keys: Set[str], path: Json
     # All remaining properties only mentioned in 'required'
     for key in required_props:
         sub_path = path + 'required' + key
-        property_root = NoOpDecision(f"{sub_path}__PROP", False)
+        property_root = NoOpDecision(PointerId(sub_path, '__PROP'), False)
         root.add_transition(property_root)
-        key_node = InsertKeyNode(f"{sub_path}__KEY", key)
+        key_node = InsertKeyNode(PointerId(sub_path, '__KEY'), key)
         property_root.add_transition(key_node)
         value_node = generate_default_samples(config)
         key_node.add_transition(value_node)
@@ -343,6 +372,11 @@ def generate_default_samples(config: Config) -> Node:
 
 
 def parse_array(data: dict, config: Config, unparsed_keys: Set[str], pointer: JsonPointer) -> Node:
+    return trampoline(_parse_array(data, config, unparsed_keys, pointer))
+
+
+def _parse_array(data: dict, config: Config, unparsed_keys: Set[str], pointer: JsonPointer) -> Recursion:
+    # Returns Node, evaluate using trampoline()
     min_items = _read_int(data, 'minItems', unparsed_keys, pointer, 1)
     max_items = _read_int(data, 'maxItems', unparsed_keys, pointer, None)
     prefix_items = _read_list(data, 'prefixItems', unparsed_keys, pointer, {})
@@ -353,23 +387,23 @@ def parse_array(data: dict, config: Config, unparsed_keys: Set[str], pointer: Js
 
     items = _read_dict(data, 'items', unparsed_keys, pointer, None)
 
-    root_node = CreateArrayNode(f"{pointer}_ARRAY", True)
+    root_node = CreateArrayNode(PointerId(pointer, '_ARRAY'), True)
 
     # Prefix items
     if prefix_items:
-        prefix_items_node = NoOpDecision(f"{pointer}_PREFIX", True)
+        prefix_items_node = NoOpDecision(PointerId(pointer, '_PREFIX'), True)
         root_node.add_transition(prefix_items_node)
         for idx, item in enumerate(prefix_items):
-            node = parse_dict(item, config, pointer + 'prefixItems' + idx)
+            node = yield _parse_dict(item, config, pointer + 'prefixItems' + idx)
             append_node = AppendArrayItemNode(None)
             append_node.add_transition(node)
             prefix_items_node.add_transition(append_node)
 
     # Contained items
     if min_contains and contains is not None:
-        contains_items_node = NoOpDecision(f"{pointer}_CONTAINS", True)
+        contains_items_node = NoOpDecision(PointerId(pointer, '_CONTAINS'), True)
         root_node.add_transition(contains_items_node)
-        node = parse_dict(contains, config, pointer + 'contains')
+        node = yield _parse_dict(contains, config, pointer + 'contains')
         append_node = AppendArrayItemNode(None)
         append_node.add_transition(node)
         for _ in range(min_contains):
@@ -378,12 +412,12 @@ def parse_array(data: dict, config: Config, unparsed_keys: Set[str], pointer: Js
 
     # Items
     if min_items:
-        all_items_node = NoOpDecision(f"{pointer}_ITEMS", True)
+        all_items_node = NoOpDecision(PointerId(pointer, '_ITEMS'), True)
         root_node.add_transition(all_items_node)
         if items is None:
             items_node = generate_default_samples(config)
         else:
-            items_node = parse_dict(items, config, pointer + 'items')
+            items_node = yield _parse_dict(items, config, pointer + 'items')
 
         for _ in range(min_items):
             append_node = AppendArrayItemNode(None)
@@ -394,7 +428,7 @@ def parse_array(data: dict, config: Config, unparsed_keys: Set[str], pointer: Js
 
 
 def parse_boolean(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPointer) -> Node:
-    root = NoOpDecision(f"{path}_BOOLEAN")
+    root = NoOpDecision(PointerId(path, '_BOOLEAN'))
     root.add_transition(SetValueLeaf(None, True, value=True))
     root.add_transition(SetValueLeaf(None, True, value=False))
     return root
@@ -423,7 +457,7 @@ def parse_number(data: dict, config: Config, unparsed_keys: Set[str], path: Json
         if minimum is not None and valid_value < minimum:
             valid_value += multiple_of
 
-    root = NoOpDecision(f"{path}_NUMBER")
+    root = NoOpDecision(PointerId(path, '_NUMBER'))
     root.add_transition(SetValueLeaf(None, True, valid_value))
     for value in invalid_values:
         root.add_transition(SetValueLeaf(None, False, value))
@@ -432,18 +466,36 @@ def parse_number(data: dict, config: Config, unparsed_keys: Set[str], path: Json
 
 
 def parse_null(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPointer) -> Node:
-    root = NoOpDecision(f"{path}_NULL")
+    root = NoOpDecision(PointerId(path, '_NULL'))
     root.add_transition(SetValueLeaf(None, True, value=None))
     return root
 
 
-def parse_any_of_entry(entry: dict, config: Config, pointer: JsonPointer) -> Node:
+# Handlers implemented as generators, see _call_handler()
+_RECURSIVE_HANDLERS = {
+    parse_object: _parse_object,
+    parse_array: _parse_array,
+}
+
+
+def _call_handler(handler: Handler, data: dict, config: Config, unparsed_keys: Set[str], pointer: JsonPointer) -> Recursion:
+    # Returns Node, evaluate using trampoline()
+    # The built-in handlers parse sub-schemas without recursion
+    try:
+        handler = _RECURSIVE_HANDLERS[handler]
+    except KeyError:
+        return handler(data, config, unparsed_keys, pointer)
+    return (yield handler(data, config, unparsed_keys, pointer))
+
+
+def _parse_any_of_entry(entry: dict, config: Config, pointer: JsonPointer) -> Recursion:
+    # Returns Node, evaluate using trampoline()
     unparsed_keys = set(entry.keys())
 
     # try special keys first
     for key, handler in config.key_handlers.items():
         if key in entry:
-            return handler(entry, config, unparsed_keys, pointer)
+            return (yield _call_handler(handler, entry, config, unparsed_keys, pointer))
 
     root = NoOpDecision(None, False)
     if 'type' in entry:
@@ -462,7 +514,7 @@ def parse_any_of_entry(entry: dict, config: Config, pointer: JsonPointer) -> Nod
             handler = config.type_handlers[t]
         except KeyError:
             raise JsonSchemaException(f"Unknown type '{t}'", pointer)
-        root.add_transition(handler(entry, config, unparsed_keys, pointer))
+        root.add_transition((yield _call_handler(handler, entry, config, unparsed_keys, pointer)))
 
     # Generate counter-examples for all forbidden types
     for type, samples in config.default_samples.items():
@@ -481,13 +533,18 @@ def parse_any_of_entry(entry: dict, config: Config, pointer: JsonPointer) -> Nod
     return root
 
 
-def parse_dict(data: dict, config: Config, pointer: JsonPointer) -> Node:
-    root = NoOpDecision(str(pointer), False)
+def parse_any_of_entry(entry: dict, config: Config, pointer: JsonPointer) -> Node:
+    return trampoline(_parse_any_of_entry(entry, config, pointer))
+
+
+def _parse_normalized(data: dict, config: Config, pointer: JsonPointer) -> Recursion:
+    # Returns Node, evaluate using trampoline()
+    root = NoOpDecision(PointerId(pointer), False)
     unparsed_keys = set(data.keys())
     any_of = _read_list(data, 'anyOf', unparsed_keys, pointer)
 
     for idx, entry in enumerate(any_of):
-        result = parse_any_of_entry(
+        result = yield _parse_any_of_entry(
             entry, config, pointer + 'anyOf' + idx
         )
         if config.post_processor:
@@ -497,26 +554,80 @@ def parse_dict(data: dict, config: Config, pointer: JsonPointer) -> Node:
     return root
 
 
-def parse(data: dict, config=None) -> Node:
-    if config is None:
-        config = default_config()
+def _parse_dict(data: dict, config: Config, pointer: JsonPointer) -> Recursion:
+    # Returns Node, evaluate using trampoline()
+    if config.normalize and config.normalizer is not None:
+        data = config.normalizer.normalize(data)
+    return (yield _parse_normalized(data, config, pointer))
+
+
+def parse_dict(data: dict, config: Config, pointer: JsonPointer) -> Node:
+    return trampoline(_parse_dict(data, config, pointer))
 
-    if config.normalize:
-        data = normalize(data)
+
+def _parse_lazy(data: dict, config: Config) -> Tuple[Node, List[Node]]:
+    # Returns the root and the definitions it references
+    references: List[str] = []
+    parse_ref = config.key_handlers.get('$ref')
+    if parse_ref is not None:
+        def record_reference(data: dict, config: Config, unparsed_keys: Set[str], path: JsonPointer) -> Node:
+            references.append(data['$ref'])
+            return parse_ref(data, config, unparsed_keys, path)
+        config = replace(config, key_handlers={**config.key_handlers, '$ref': record_reference})
 
     pointer = JsonPointer()
-    unparsed_keys = set(data.keys())
+    data = {k: v for k, v in data.items() if k not in ['$schema', '$defs']}
+    root = parse_dict(data, config, pointer)
 
-    # Read definitions
+    # Definitions are parsed once they are referenced, they may reference further definitions
     all_nodes: List[Node] = []
-    definitions = _read_dict(data, '$defs', unparsed_keys, pointer, {})
-    for key, definition in definitions.items():
-        sub_path = pointer + '$defs' + key
-        node = parse_dict(definition, config, sub_path)
-        all_nodes.append(node)
+    prefix = str(pointer + '$defs') + '/'
+    parsed: Set[str] = set()
+    idx = 0
+    while idx < len(references):
+        reference = references[idx]
+        idx += 1
+        if reference in parsed:
+            continue
+        parsed.add(reference)
+        if not reference.startswith(prefix):
+            raise JsonSchemaException(f"Unknown reference '{reference}'", None)
+        name = reference[len(prefix):]
+        definition = config.normalizer.definition(name)
+        all_nodes.append(trampoline(_parse_normalized(definition, config, pointer + '$defs' + name)))
+    return root, all_nodes
+
+
+def parse(data: dict, config=None, cache: Optional[GraphCache] = None) -> Node:
+    if config is None:
+        config = default_config()
 
-    # Read root
-    root = parse_dict(data, config, pointer)
+    if cache is not None:
+        sources = [data, config]
+        if config.normalizer is not None:
+            # The normalizer is identified by its document and its configuration
+            sources = [data, replace(config, normalizer=None), config.normalizer.document, config.normalizer.config]
+        return cache.get(lambda: parse(data, config), 'json_schema', *sources)
+
+    if config.normalize and config.normalizer is not None:
+        root, all_nodes = _parse_lazy(data, config)
+    else:
+        if config.normalize:
+            data = normalize(data)
+
+        pointer = JsonPointer()
+        unparsed_keys = set(data.keys())
+
+        # Read definitions
+        all_nodes: List[Node] = []
+        definitions = _read_dict(data, '$defs', unparsed_keys, pointer, {})
+        for key, definition in definitions.items():
+            sub_path = pointer + '$defs' + key
+            node = parse_dict(definition, config, sub_path)
+            all_nodes.append(node)
+
+        # Read root
+        root = parse_dict(data, config, pointer)
     root = root.resolve(all_nodes)
 
     root.optimize()
@@ -0,0 +1,188 @@
+from .execute import CopyOnWriteExecutor
+
+from fences.core.node import Node, Path, ResultEntry
+from fences.core.exception import JsonPointerException
+
+from typing import List, Tuple, Optional, Iterable, Generator, TextIO, Set
+import json
+
+Patch = List[dict]
+
+
+def _escape(key: str) -> str:
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _equal(a: any, b: any) -> bool:
+    # Unlike ==, 1, 1.0 and True are different json values
+    return type(a) is type(b) and a == b
+
+
+def make_patch(base: any, sample: any) -> Patch:
+    """
+    Returns a JSON patch (RFC 6902) which transforms base into sample.
+    Sub-documents shared by both (e.g. created by a CopyOnWriteExecutor) are skipped without comparing them.
+    """
+    patch: Patch = []
+    stack: List[Tuple[any, any, str]] = [(base, sample, '')]
+    while stack:
+        a, b, path = stack.pop()
+        if a is b:
+            continue
+        if isinstance(a, dict) and isinstance(b, dict):
+            children = []
+            for key in a:
+                if key not in b:
+                    patch.append({'op': 'remove', 'path': f"{path}/{_escape(key)}"})
+            for key, value in b.items():
+                if key in a:
+                    children.append((a[key], value, f"{path}/{_escape(key)}"))
+                else:
+                    patch.append({'op': 'add', 'path': f"{path}/{_escape(key)}", 'value': value})
+            stack.extend(reversed(children))
+        elif isinstance(a, list) and isinstance(b, list):
+            common = min(len(a), len(b))
+            # Remove from the end, so the indices of the remaining items do not change
+            for idx in range(len(a) - 1, common - 1, -1):
+                patch.append({'op': 'remove', 'path': f"{path}/{idx}"})
+            for idx in range(common, len(b)):
+                patch.append({'op': 'add', 'path': f"{path}/{idx}", 'value': b[idx]})
+            stack.extend((a[idx], b[idx], f"{path}/{idx}") for idx in reversed(range(common)))
+        elif not _equal(a, b):
+            patch.append({'op': 'replace', 'path': path, 'value': b})
+    return patch
+
+
+def _copy_parent(document: any, path: str, owned: Set[int]) -> Tuple[any, any, str]:
+    # Returns the document, the container of the value at path and the last token.
+    # The containers on the way are copied, unless they are owned (i.e. copied before).
+    if not path.startswith('/'):
+        raise JsonPointerException(f"Invalid JSON pointer '{path}'")
+    tokens = [_unescape(i) for i in path[1:].split('/')]
+
+    def own(value: any) -> any:
+        if isinstance(value, (dict, list)) and id(value) not in owned:
+            value = dict(value) if isinstance(value, dict) else list(value)
+            owned.add(id(value))
+        return value
+
+    document = own(document)
+    parent = document
+    for token in tokens[:-1]:
+        try:
+            if isinstance(parent, list):
+                key = int(token)
+            elif isinstance(parent, dict):
+                key = token
+            else:
+                raise JsonPointerException(f"Cannot lookup '{token}' in {parent}")
+            child = own(parent[key])
+        except (KeyError, IndexError, ValueError):
+            raise JsonPointerException(f"'{path}' not in document")
+        parent[key] = child
+        parent = child
+    return document, parent, tokens[-1]
+
+
+def _index(container: list, token: str, size: int) -> int:
+    if token == '-':
+        return len(container)
+    try:
+        idx = int(token)
+    except ValueError:
+        raise JsonPointerException(f"{token} is not an integer for array lookup")
+    if idx < 0 or idx >= size:
+        raise JsonPointerException("Index not in array")
+    return idx
+
+
+def apply_patch(document: any, patch: Patch) -> any:
+    """
+    Applies a JSON patch created by make_patch() to a copy of the document and returns the copy.
+    Supports the operations add, remove and replace.
+    Only the containers on the patched paths are copied, the copy shares all other sub-documents
+    with the document and the values with the patch, they must not be modified.
+    """
+    # Ids of the containers copied for the result
+    owned: Set[int] = set()
+    for operation in patch:
+        op = operation['op']
+        if op not in ['add', 'remove', 'replace']:
+            raise ValueError(f"Unsupported operation '{op}'")
+        value = operation.get('value')
+        path = operation['path']
+        if path == '':
+            if op == 'remove':
+                document = None
+            else:
+                document = value
+            continue
+        document, parent, token = _copy_parent(document, path, owned)
+        if isinstance(parent, list):
+            if op == 'add':
+                parent.insert(_index(parent, token, len(parent) + 1), value)
+            elif op == 'remove':
+                del parent[_index(parent, token, len(parent))]
+            else:
+                parent[_index(parent, token, len(parent))] = value
+        elif isinstance(parent, dict):
+            if op != 'add' and token not in parent:
+                raise JsonPointerException(f"'{path}' not in document")
+            if op == 'remove':
+                del parent[token]
+            else:
+                parent[token] = value
+        else:
+            raise JsonPointerException(f"Cannot lookup '{token}' in {parent}")
+    return document
+
+
+def generate_patches(root: Node, entries: Optional[Iterable[ResultEntry]] = None,
+                     base_path: Optional[Path] = None) -> Tuple[any, Generator[Tuple[ResultEntry, Patch], None, None]]:
+    """
+    Returns a base document and a generator yielding each path together with the patch
+    transforming the base document into its sample.
+    Paths default to root.generate_paths(), the base path defaults to the shortest valid path.
+    """
+    executor = CopyOnWriteExecutor(root, base_path)
+    if entries is None:
+        entries = root.generate_paths()
+
+    def generate():
+        for entry in entries:
+            yield entry, make_patch(executor.base_sample, executor.execute(entry.path))
+
+    return executor.base_sample, generate()
+
+
+def write_patches(file: TextIO, root: Node, entries: Optional[Iterable[ResultEntry]] = None,
+                  base_path: Optional[Path] = None) -> int:
+    """
+    Writes the samples of a graph created by parse() as JSON lines:
+    the first line is {"base": <document>}, each further line is {"valid": <bool>, "patch": <patch>}.
+    Returns the number of samples written.
+    """
+    base, patches = generate_patches(root, entries, base_path)
+    file.write(json.dumps({'base': base}) + '\n')
+    count = 0
+    for entry, patch in patches:
+        file.write(json.dumps({'valid': entry.is_valid, 'patch': patch}) + '\n')
+        count += 1
+    return count
+
+
+def read_patches(file: TextIO) -> Generator[Tuple[any, bool], None, None]:
+    """
+    Reads samples written by write_patches(), yields each sample and whether it is valid.
+    Samples share the unchanged sub-documents with each other, they must not be modified.
+    """
+    base = json.loads(file.readline())['base']
+    for line in file:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        yield apply_patch(base, record['patch']), record['valid']
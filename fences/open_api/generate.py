@@ -1,12 +1,13 @@
-from typing import List, Dict, Optional, TYPE_CHECKING
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 
 from .open_api import Operation, ParameterPosition, Parameter
 from .format import format_parameter_value
 from .exceptions import MissingDependencyException
 
 from fences.json_schema import parse as json_schema
-from fences.json_schema.normalize import normalize as normalize_schema, NormalizationConfig
+from fences.json_schema.normalize import LazyNormalizer, NormalizationConfig
 from fences.core.node import Node, NoOpDecision, Decision, Leaf, NoOpLeaf
+from fences.core.cache import GraphCache
 
 from dataclasses import dataclass, field
 from urllib.parse import urlencode
@@ -24,6 +25,8 @@ class Request:
     path_parameters: dict = field(default_factory=dict)
     headers: dict = field(default_factory=dict)
     cookies: dict = field(default_factory=dict)
+    # The body and its encoding, if known in advance
+    _encoded_body: Optional[Tuple[any, bytes]] = field(default=None, repr=False, compare=False)
 
     def make_path(self) -> str:
         path = self.operation.path
@@ -46,6 +49,23 @@ class Request:
                 b = body_json
             print(f"  BODY: {b}")
 
+    def set_body(self, body: any, encoded_body: Optional[bytes] = None):
+        """
+        Sets the body, encoded_body is its UTF-8 encoded JSON representation, if known
+        """
+        self.body = body
+        self._encoded_body = None if encoded_body is None else (body, encoded_body)
+
+    def encode_body(self) -> Optional[bytes]:
+        """
+        Returns the body as UTF-8 encoded JSON
+        """
+        if self.body is None:
+            return None
+        if self._encoded_body is not None and self._encoded_body[0] is self.body:
+            return self._encoded_body[1]
+        return json.dumps(self.body).encode()
+
     def insert_param_values(self, position: ParameterPosition, values: dict):
         storage: dict = {
             ParameterPosition.QUERY: self.query_parameters,
@@ -61,11 +81,7 @@ class Request:
         except ImportError:
             raise MissingDependencyException("Please install the requests library")
 
-        if self.body is None:
-            body = None
-        else:
-            body = json.dumps(self.body)
-
+        body = self.encode_body()
         if host.endswith('/'):
             host = host[:-1]
         return requests.models.Request(
@@ -85,6 +101,8 @@ class Request:
 
 
 class CreateRequest(Decision):
+    __slots__ = ('operation',)
+
     def __init__(self, operation: Operation) -> None:
         super().__init__(operation.operation_id, True)
         self.operation = operation
@@ -97,6 +115,8 @@ class CreateRequest(Decision):
 
 
 class InsertParamLeaf(Leaf):
+    __slots__ = ('parameter', 'raw_value', 'values')
+
     def __init__(self, is_valid: bool, parameter: Parameter, raw_value: any) -> None:
         super().__init__(None, is_valid)
         self.parameter = parameter
@@ -112,12 +132,16 @@ class InsertParamLeaf(Leaf):
 
 
 class InsertBodyLeaf(Leaf):
+    __slots__ = ('body', 'encoded_body')
+
     def __init__(self, is_valid: bool, body: str) -> None:
         super().__init__(None, is_valid)
         self.body = body
+        # Encoded once, instead of for each request
+        self.encoded_body = json.dumps(body).encode()
 
     def apply(self, data: Request) -> any:
-        data.body = self.body
+        data.set_body(self.body, self.encoded_body)
         return data
 
     def description(self) -> str:
@@ -135,6 +159,25 @@ class SampleCache:
     def __init__(self) -> None:
         self.body_samples: Dict[str, Samples] = {}
         self.other_samples: Dict[str, Samples] = {}
+        # Normalizers of the components of all schemas by id, the components are kept next to
+        # their normalizer, hence their ids are not reused. Schemas without components share one normalizer.
+        # Components are normalized once they are used, and only once for all schemas.
+        self._normalizers: Dict[Optional[int], Tuple[dict, LazyNormalizer]] = {}
+
+    def _normalizer(self, components: Optional[dict]) -> LazyNormalizer:
+        key = None if components is None else id(components)
+        try:
+            return self._normalizers[key][1]
+        except KeyError:
+            pass
+        if components is None:
+            components = {}
+        norm_conf = NormalizationConfig(
+            full_merge=False,
+        )
+        normalizer = LazyNormalizer({'components': components}, norm_conf)
+        self._normalizers[key] = components, normalizer
+        return normalizer
 
     def _to_key(self, schema: any) -> str:
         return json.dumps(schema)
@@ -149,16 +192,14 @@ class SampleCache:
         except KeyError:
             pass
 
-        norm_conf = NormalizationConfig(
-            full_merge=False,
-        )
-        schema_norm = normalize_schema(schema, norm_conf)
         config = json_schema.default_config()
-        config.normalize = False
+        config.normalizer = self._normalizer(schema.get('components'))
         if not is_body:
             # do not deviate from base type
             config.default_samples.clear()
-        graph = json_schema.parse(schema_norm, config)
+        # Use the components known to the normalizer, they are not converted again
+        schema = {**schema, 'components': config.normalizer.document['components']}
+        graph = json_schema.parse(schema, config)
         samples = Samples()
         for i in graph.generate_paths():
             sample = graph.execute(i.path)
@@ -195,7 +236,9 @@ def generate_one_valid(operation: Operation, sample_cache: SampleCache, paramete
     return test_case
 
 
-def generate_all(operation: Operation, sample_cache: SampleCache, valid_values: Optional[Dict[str, List[any]]] = {}) -> Node:
+def generate_all(operation: Operation, sample_cache: SampleCache, valid_values: Optional[Dict[str, List[any]]] = {}, cache: Optional[GraphCache] = None) -> Node:
+    if cache is not None:
+        return cache.get(lambda: generate_all(operation, sample_cache, valid_values), 'open_api', operation, valid_values)
     op_root = CreateRequest(operation)
     for param in operation.parameters:
         param_root = NoOpDecision(f"{operation.operation_id}/{param.name}")
@@ -0,0 +1,281 @@
+from fences.core.node import Node, ResultEntry
+from fences.core.parallel import Sample
+
+from typing import Optional, Callable, Iterable, Generator, Dict, List, BinaryIO, Tuple
+from xml.etree import ElementTree
+import gzip
+import io
+import json
+import os
+
+
+def encode_json(sample: any) -> bytes:
+    """
+    Encodes a sample as single line JSON, bytes (e.g. created by a JsonEmitter) are returned as they are
+    """
+    if isinstance(sample, bytes):
+        return sample
+    return json.dumps(sample).encode()
+
+
+def encode_xml(sample: any) -> bytes:
+    """
+    Encodes an XML document as a single line, line breaks are replaced by character references
+    """
+    if isinstance(sample, bytes):
+        return sample
+    if isinstance(sample, ElementTree.ElementTree):
+        sample = sample.getroot()
+    data = ElementTree.tostring(sample, encoding='utf-8')
+    return data.replace(b'\r', b'&#13;').replace(b'\n', b'&#10;')
+
+
+def iterate_samples(root: Node, entries: Optional[Iterable[ResultEntry]] = None) -> Generator[Sample, None, None]:
+    """
+    Yields pairs of the result entry and the sample for all paths of root.generate_paths() (or the given entries).
+    Samples are executed one at a time, when they are requested.
+    """
+    if entries is None:
+        entries = root.generate_paths()
+    for entry in entries:
+        yield entry, root.execute(entry.path)
+
+
+def _partition_name(is_valid: bool) -> str:
+    return 'valid' if is_valid else 'invalid'
+
+
+class Sink:
+    """
+    Base class of all sinks, writes samples one at a time.
+
+    If partition is set, valid and invalid samples are written to different files.
+    If index is set, a tab separated file with this name lists the number of each sample,
+    whether it is valid (1 or 0), the file it is written to and the line within the file.
+    If sync_interval is positive, written data is synced to disk (fsync) every sync_interval samples
+    and when the sink is closed.
+    """
+
+    def __init__(self, encode: Callable[[any], bytes], partition: bool = False,
+                 index: Optional[str] = None, sync_interval: int = 0, buffer_size: int = 2**20) -> None:
+        if sync_interval < 0:
+            raise ValueError(f"sync_interval must not be negative, got {sync_interval}")
+        self.encode = encode
+        self.partition = partition
+        self.sync_interval = sync_interval
+        self.buffer_size = buffer_size
+        self.num_samples = 0
+        self.closed = False
+        self._index_directory = None
+        self._index: Optional[BinaryIO] = None
+        if index is not None:
+            self._index_directory = os.path.dirname(os.path.abspath(index))
+            self._index = open(index, 'wb', buffering=buffer_size)
+            self._index.write(b'sample\tvalid\tfile\tline\n')
+
+    def _write(self, data: bytes, is_valid: bool) -> Tuple[str, Optional[int]]:
+        # Writes an encoded sample, returns the file and the line it was written to
+        raise NotImplementedError()
+
+    def _sync(self):
+        # Syncs all data written so far to disk
+        raise NotImplementedError()
+
+    def _close(self):
+        raise NotImplementedError()
+
+    def write(self, sample: any, is_valid: bool):
+        """
+        Encodes and writes a sample
+        """
+        if self.closed:
+            raise ValueError("Sink is closed")
+        file_name, line = self._write(self.encode(sample), is_valid)
+        if self._index is not None:
+            file_name = os.path.relpath(file_name, self._index_directory)
+            line = '' if line is None else line
+            self._index.write(f"{self.num_samples}\t{int(is_valid)}\t{file_name}\t{line}\n".encode())
+        self.num_samples += 1
+        if self.sync_interval and self.num_samples % self.sync_interval == 0:
+            self.sync()
+
+    def write_all(self, samples: Iterable[Sample]) -> int:
+        """
+        Writes pairs of result entries and samples, e.g. created by iterate_samples() or generate_samples().
+        Samples are consumed one at a time. Returns the number of samples written.
+        """
+        count = 0
+        for entry, sample in samples:
+            self.write(sample, entry.is_valid)
+            count += 1
+        return count
+
+    def sync(self):
+        """
+        Syncs all samples written so far to disk
+        """
+        self._sync()
+        if self._index is not None:
+            self._index.flush()
+            os.fsync(self._index.fileno())
+
+    def close(self):
+        if self.closed:
+            return
+        if self.sync_interval:
+            self.sync()
+        self.closed = True
+        self._close()
+        if self._index is not None:
+            self._index.close()
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LineSink(Sink):
+    """
+    Writes one sample per line, samples must not contain line breaks.
+    If partition is set, the files are named like the given path with '.valid' or '.invalid'
+    inserted before the first extension, e.g. 'samples.valid.jsonl'.
+    If compress is set, the files are compressed using gzip.
+    """
+
+    def __init__(self, path: str, encode: Callable[[any], bytes], partition: bool = False,
+                 index: Optional[str] = None, sync_interval: int = 0, buffer_size: int = 2**20,
+                 compress: bool = False, compress_level: int = 6) -> None:
+        super().__init__(encode, partition, index, sync_interval, buffer_size)
+        self.path = path
+        self.compress = compress
+        self.compress_level = compress_level
+        self._files: Dict[str, BinaryIO] = {}
+        self._lines: Dict[str, int] = {}
+
+    def file_name(self, is_valid: bool) -> str:
+        """
+        Returns the name of the file samples are written to
+        """
+        if not self.partition:
+            return self.path
+        directory, name = os.path.split(self.path)
+        stem, dot, extension = name.partition('.')
+        return os.path.join(directory, f"{stem}.{_partition_name(is_valid)}{dot}{extension}")
+
+    def _open(self, file_name: str) -> BinaryIO:
+        if self.compress:
+            # Buffer before compressing, GzipFile compresses each write separately
+            return io.BufferedWriter(gzip.GzipFile(file_name, 'wb', self.compress_level), self.buffer_size)
+        return open(file_name, 'wb', buffering=self.buffer_size)
+
+    def _write(self, data: bytes, is_valid: bool) -> Tuple[str, Optional[int]]:
+        if b'\n' in data:
+            raise ValueError("Sample contains a line break")
+        file_name = self.file_name(is_valid)
+        try:
+            file = self._files[file_name]
+        except KeyError:
+            file = self._open(file_name)
+            self._files[file_name] = file
+            self._lines[file_name] = 0
+        file.write(data)
+        file.write(b'\n')
+        line = self._lines[file_name]
+        self._lines[file_name] = line + 1
+        return file_name, line
+
+    def _sync(self):
+        for file in self._files.values():
+            file.flush()
+            if isinstance(file.raw, gzip.GzipFile):
+                file.raw.flush()
+            os.fsync(file.fileno())
+
+    def _close(self):
+        for file in self._files.values():
+            file.close()
+
+
+class NdjsonSink(LineSink):
+    """
+    Writes samples as newline delimited JSON (one JSON document per line)
+    """
+
+    def __init__(self, path: str, partition: bool = False, index: Optional[str] = None,
+                 sync_interval: int = 0, buffer_size: int = 2**20, compress: bool = False) -> None:
+        super().__init__(path, encode_json, partition, index, sync_interval, buffer_size, compress)
+
+
+class GzipNdjsonSink(NdjsonSink):
+    """
+    Writes samples as gzip compressed, newline delimited JSON (e.g. 'samples.jsonl.gz')
+    """
+
+    def __init__(self, path: str, partition: bool = False, index: Optional[str] = None,
+                 sync_interval: int = 0, buffer_size: int = 2**20) -> None:
+        super().__init__(path, partition, index, sync_interval, buffer_size, True)
+
+
+class XmlLineSink(LineSink):
+    """
+    Writes one XML document per line
+    """
+
+    def __init__(self, path: str, partition: bool = False, index: Optional[str] = None,
+                 sync_interval: int = 0, buffer_size: int = 2**20, compress: bool = False) -> None:
+        super().__init__(path, encode_xml, partition, index, sync_interval, buffer_size, compress)
+
+
+class DirectorySink(Sink):
+    """
+    Writes each sample to its own file in a directory, named by the number of the sample, e.g. '42.json'.
+    If partition is set, valid and invalid samples are written to the sub directories 'valid' and 'invalid'.
+    """
+
+    def __init__(self, directory: str, suffix: str = '.json', encode: Callable[[any], bytes] = encode_json,
+                 partition: bool = False, index: Optional[str] = None, sync_interval: int = 0) -> None:
+        os.makedirs(directory, exist_ok=True)
+        if partition:
+            for is_valid in [True, False]:
+                os.makedirs(os.path.join(directory, _partition_name(is_valid)), exist_ok=True)
+        super().__init__(encode, partition, index, sync_interval)
+        self.directory = directory
+        self.suffix = suffix
+        # Files written since the last sync
+        self._unsynced: List[str] = []
+
+    def _write(self, data: bytes, is_valid: bool) -> Tuple[str, Optional[int]]:
+        directory = self.directory
+        if self.partition:
+            directory = os.path.join(directory, _partition_name(is_valid))
+        file_name = os.path.join(directory, f"{self.num_samples}{self.suffix}")
+        with open(file_name, 'wb') as file:
+            file.write(data)
+        if self.sync_interval:
+            self._unsynced.append(file_name)
+        return file_name, None
+
+    def _sync(self):
+        directories = set()
+        for file_name in self._unsynced:
+            fd = os.open(file_name, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            directories.add(os.path.dirname(file_name))
+        self._unsynced.clear()
+        if not hasattr(os, 'O_DIRECTORY'):
+            # Directories cannot be opened, e.g. on windows
+            return
+        for directory in directories:
+            fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _close(self):
+        pass
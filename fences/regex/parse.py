@@ -19,6 +19,8 @@ class Repetition:
 
 
 class CreateInputNode(Decision):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(None, False)
 
@@ -30,6 +32,8 @@ class CreateInputNode(Decision):
 
 
 class FetchOutputNode(Leaf):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(None, True)
 
@@ -41,6 +45,7 @@ class FetchOutputNode(Leaf):
 
 
 class AppendCharsLeaf(Leaf):
+    __slots__ = ('char',)
 
     def __init__(self, id: str, is_valid: bool, char: str) -> None:
         super().__init__(id, is_valid)
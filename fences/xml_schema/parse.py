@@ -3,6 +3,7 @@ from .config import Config, TypeGenerator
 from .xpath import NormalizedXPath
 
 from fences.core.node import Leaf, Decision, NoOpLeaf, NoOpDecision, Node, Reference
+from fences.core.cache import GraphCache
 from fences.core.random import generate_random_number, generate_random_string, StringProperties
 
 from xml.etree import ElementTree
@@ -98,6 +99,7 @@ class Binding:
 
 
 class StartNode(Decision):
+    __slots__ = ()
 
     def apply(self, data: any) -> Binding:
         return Binding(ElementTree.Element('dummy'), None)
@@ -107,6 +109,8 @@ class StartNode(Decision):
 
 
 class FetchOutput(Leaf):
+    __slots__ = ('namespace',)
+
     def __init__(self, namespace: Optional[str]) -> None:
         super().__init__(None, True)
         self.namespace = namespace
@@ -122,6 +126,8 @@ class FetchOutput(Leaf):
 
 
 class StartAttribute(Decision):
+    __slots__ = ('attr',)
+
     def __init__(self, id: str, all_transitions: bool, attr: str) -> None:
         super().__init__(id, all_transitions)
         self.attr = attr
@@ -134,6 +140,7 @@ class StartAttribute(Decision):
 
 
 class StartNewElement(Decision):
+    __slots__ = ('tag',)
 
     def __init__(self, id: str, all_transitions: bool, tag: str) -> None:
         super().__init__(id, all_transitions)
@@ -149,6 +156,8 @@ class StartNewElement(Decision):
 
 
 class SetValueLeaf(Leaf):
+    __slots__ = ('value',)
+
     def __init__(self, id: str, is_valid: bool, value: any) -> None:
         super().__init__(id, is_valid)
         self.value = value
@@ -488,7 +497,9 @@ def resolve_type(type: str, element: ElementTree.Element, config: Config, path:
         return Reference(None, type)
 
 
-def parse(schema: ElementTree.Element, config: Optional[dict] = None) -> Node:
+def parse(schema: ElementTree.Element, config: Optional[dict] = None, cache: Optional[GraphCache] = None) -> Node:
+    if cache is not None:
+        return cache.get(lambda: parse(schema, config), 'xml_schema', ElementTree.tostring(schema), config)
     actual_config = default_config()
     if config is not None:
         actual_config.merge(config)
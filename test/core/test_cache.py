@@ -0,0 +1,128 @@
+from fences.core.cache import GraphCache
+from fences.core.node import NoOpDecision, NoOpLeaf
+from fences.json_schema.parse import parse, default_config
+
+from unittest import TestCase
+from dataclasses import dataclass
+import pickle
+import tempfile
+import shutil
+import os
+
+
+@dataclass
+class MockConfig:
+    value: int
+    handler: any
+
+
+def create_graph():
+    root = NoOpDecision('root', False)
+    root.add_transition(NoOpLeaf('valid', True))
+    root.add_transition(NoOpLeaf('invalid', False))
+    return root
+
+
+class SlottedConfig:
+    __slots__ = ('value',)
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class UnpicklingFails:
+
+    def __reduce__(self):
+        return int, ('not a number',)
+
+
+class GraphCacheTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = GraphCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        key = self.cache.key({'type': 'string'}, MockConfig(1, len))
+        self.assertEqual(key, self.cache.key({'type': 'string'}, MockConfig(1, len)))
+        self.assertNotEqual(key, self.cache.key({'type': 'number'}, MockConfig(1, len)))
+        self.assertNotEqual(key, self.cache.key({'type': 'string'}, MockConfig(2, len)))
+        self.assertNotEqual(key, self.cache.key({'type': 'string'}, MockConfig(1, repr)))
+
+    def test_key_lambdas(self):
+        handlers = [lambda x: 1, lambda x: 2]
+        self.assertNotEqual(self.cache.key(handlers[0]), self.cache.key(handlers[1]))
+
+    def test_key_closures(self):
+        def create_handler(value, default=1):
+            return lambda x, y=default: x + value
+        key = self.cache.key(create_handler(1))
+        self.assertEqual(key, self.cache.key(create_handler(1)))
+        self.assertNotEqual(key, self.cache.key(create_handler(2)))
+        self.assertNotEqual(key, self.cache.key(create_handler(1, 2)))
+
+    def test_key_slots(self):
+        key = self.cache.key(SlottedConfig(1))
+        self.assertEqual(key, self.cache.key(SlottedConfig(1)))
+        self.assertNotEqual(key, self.cache.key(SlottedConfig(2)))
+        # The representation would contain the address
+        with self.assertRaises(ValueError):
+            self.cache.key(object())
+
+    def test_key_cycle(self):
+        def create_handler():
+            def handler(x):
+                return handler(x)
+            return handler
+        with self.assertRaises(ValueError):
+            self.cache.key(create_handler())
+        # Not cached
+        self.assertIsNotNone(self.cache.get(create_graph, create_handler()))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_get(self):
+        calls = []
+
+        def create():
+            calls.append(None)
+            return create_graph()
+
+        first = self.cache.get(create, 'source')
+        second = self.cache.get(create, 'source')
+        self.assertEqual(len(calls), 1)
+        self.assertIsNot(first, second)
+        self.assertEqual(
+            [(i.path, i.is_valid) for i in first.generate_paths()],
+            [(i.path, i.is_valid) for i in second.generate_paths()],
+        )
+        self.assertIs(second.compile(), second.compile())
+
+    def test_corrupted(self):
+        key = self.cache.key('source')
+        self.cache.store(key, create_graph())
+        with open(os.path.join(self.directory, key + '.pickle'), 'wb') as f:
+            f.write(b'corrupted')
+        self.assertIsNone(self.cache.load(key))
+        self.assertIsNotNone(self.cache.get(create_graph, 'source'))
+
+        # Any failure while loading is a cache miss
+        with open(os.path.join(self.directory, key + '.pickle'), 'wb') as f:
+            pickle.dump(UnpicklingFails(), f)
+        self.assertIsNone(self.cache.load(key))
+
+    def test_json_schema(self):
+        schema = {
+            'type': 'object',
+            'properties': {'a': {'type': 'string'}},
+        }
+        expected = parse(schema)
+        for _ in range(2):
+            graph = parse(schema, default_config(), cache=self.cache)
+            self.assertEqual(
+                [graph.execute(i.path) for i in graph.generate_paths()],
+                [expected.execute(i.path) for i in expected.generate_paths()],
+            )
+        self.assertEqual(len(os.listdir(self.directory)), 1)
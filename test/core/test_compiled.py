@@ -0,0 +1,415 @@
+from unittest import TestCase
+import pickle
+from fences.core.node import NoOpDecision, NoOpLeaf, Decision, Leaf
+from fences.core.compiled import CompiledGraph, INFINITE_DISTANCE
+from fences.core.exception import InternalException
+from fences.core.debug import check_consistency
+
+
+class AppendDecision(Decision):
+    def apply(self, data: any) -> any:
+        return data + [self.id]
+
+
+class AppendLeaf(Leaf):
+    def apply(self, data: any) -> any:
+        return data + [self.id]
+
+
+class CompileTest(TestCase):
+
+    def test_cached(self):
+        root = NoOpDecision('root', False)
+        root.add_transition(NoOpLeaf('leaf1', True))
+        graph = root.compile()
+        self.assertIs(root.compile(), graph)
+
+        # Modifying the graph invalidates the cache
+        root.add_transition(NoOpLeaf('leaf2', True))
+        new_graph = root.compile()
+        self.assertIsNot(new_graph, graph)
+        self.assertEqual(len(new_graph.nodes), 3)
+
+    def test_cached_per_graph(self):
+        root = NoOpDecision('root', False)
+        inner = NoOpDecision('inner', False)
+        root.add_transition(inner)
+        inner.add_transition(NoOpLeaf('leaf1', True))
+        graph = root.compile()
+        inner_graph = inner.compile()
+        other = NoOpDecision('other', False)
+        other.add_transition(NoOpLeaf('leaf2', True))
+        other_graph = other.compile()
+
+        # Modifying another graph keeps the cache
+        other.add_transition(NoOpLeaf('leaf3', True))
+        self.assertIs(root.compile(), graph)
+        self.assertIs(inner.compile(), inner_graph)
+        self.assertIsNot(other.compile(), other_graph)
+
+        # Modifying a node invalidates all graphs containing it
+        inner.add_transition(NoOpLeaf('leaf4', True))
+        self.assertEqual(len(root.compile().nodes), 4)
+        self.assertEqual(len(inner.compile().nodes), 3)
+
+    def test_one_node(self):
+        root = NoOpLeaf('leaf', True)
+        graph = root.compile()
+        self.assertIsInstance(graph, CompiledGraph)
+        self.assertEqual(graph.nodes, [root])
+        self.assertEqual(list(graph.succ_offsets), [0, 0])
+        self.assertEqual(list(graph.pred_offsets), [0, 0])
+        self.assertEqual(list(graph.is_leaf), [1])
+        self.assertEqual(list(graph.is_valid), [1])
+
+    def test_layout(self):
+        root = NoOpDecision('root', True)
+        child = NoOpDecision('child', False)
+        leaf1 = NoOpLeaf('leaf1', True)
+        leaf2 = NoOpLeaf('leaf2', False)
+        root.add_transition(child)
+        root.add_transition(leaf1)
+        child.add_transition(leaf1)
+        child.add_transition(leaf2)
+        graph = root.compile()
+
+        self.assertEqual(graph.nodes, [root, child, leaf1, leaf2])
+        self.assertEqual(list(graph.all_transitions), [1, 0, 0, 0])
+        self.assertEqual(list(graph.is_valid), [0, 0, 1, 0])
+        self.assertEqual(list(graph.succ_offsets), [0, 2, 4, 4, 4])
+        self.assertEqual(list(graph.succ_targets), [1, 2, 2, 3])
+        self.assertEqual(list(graph.edge_sources), [0, 0, 1, 1])
+        self.assertEqual(list(graph.pred_offsets), [0, 0, 1, 3, 4])
+        self.assertEqual(list(graph.pred_edges), [0, 1, 2, 3])
+
+    def test_distances(self):
+        root = NoOpDecision('root', False)
+        child = NoOpDecision('child', False)
+        valid = NoOpLeaf('valid', True)
+        invalid = NoOpLeaf('invalid', False)
+        root.add_transition(child)
+        root.add_transition(invalid)
+        child.add_transition(valid)
+        graph = root.compile()
+        self.assertEqual(list(graph.len_to_root), [0, 0, 1])
+        self.assertEqual(list(graph.len_to_valid_node), [1, INFINITE_DISTANCE, 0])
+
+    def test_distances_all_transitions(self):
+        root = NoOpDecision('root', False)
+        all_node = NoOpDecision('all', True)
+        short = NoOpLeaf('short', True)
+        long = NoOpDecision('long', False)
+        root.add_transition(all_node)
+        all_node.add_transition(short)
+        all_node.add_transition(long)
+        long.add_transition(NoOpLeaf('leaf', True))
+        graph = root.compile()
+        # all_transitions takes the maximum, without adding one
+        self.assertEqual(list(graph.len_to_valid_node), [1, 0, 1, 0])
+        self.assertEqual(list(graph.len_to_root), [0, 1, 1, 2])
+
+    def test_distances_cycle(self):
+        root = NoOpDecision('root', False)
+        loop = NoOpDecision('loop', True)
+        root.add_transition(loop)
+        root.add_transition(NoOpLeaf('leaf', True))
+        loop.add_transition(loop)
+        graph = root.compile()
+        self.assertEqual(list(graph.len_to_valid_node), [INFINITE_DISTANCE, 0, INFINITE_DISTANCE])
+        self.assertEqual(list(graph.len_to_root), [0, 0, 1])
+
+    def test_route_tree(self):
+        root = NoOpDecision('root', False)
+        left = NoOpDecision('left', False)
+        right = NoOpDecision('right', False)
+        leaf = NoOpLeaf('leaf', True)
+        root.add_transition(left)
+        root.add_transition(right)
+        right.add_transition(leaf)
+        left.add_transition(leaf)
+        graph = root.compile()
+        self.assertEqual(graph.nodes, [root, left, leaf, right])
+        self.assertEqual(list(graph.route_edge), [-1, 0, 3, 1])
+
+    def test_shared_route(self):
+        root = NoOpDecision('root', True)
+        for idx in range(3):
+            child = NoOpDecision(f"child{idx}", False)
+            child.add_transition(NoOpLeaf(None, True))
+            child.add_transition(NoOpLeaf(None, False))
+            root.add_transition(child)
+        paths = [(i.path, i.is_valid) for i in root.generate_paths()]
+        self.assertEqual(paths, [
+            ([0, 0, 0], True),
+            ([1, 0, 0], False),
+            ([0, 1, 0], False),
+            ([0, 0, 1], False),
+        ])
+
+    def test_completion(self):
+        root = NoOpDecision('root', True)
+        option = NoOpDecision('option', False)
+        root.add_transition(option)
+        root.add_transition(option)
+        option.add_transition(NoOpLeaf('invalid', False))
+        option.add_transition(NoOpLeaf('valid', True))
+        graph = root.compile()
+        fragment, satisfiable = graph.completion(0)
+        self.assertEqual(fragment, (1, 1))
+        self.assertTrue(satisfiable)
+        # memoized
+        self.assertIs(graph.completion(1)[0], graph.completion(1)[0])
+        self.assertEqual(graph.completion(2), ((), True))
+
+    def test_completion_unsatisfiable(self):
+        root = NoOpDecision('root', False)
+        root.add_transition(NoOpLeaf('invalid1', False))
+        root.add_transition(NoOpLeaf('invalid2', False))
+        graph = root.compile()
+        self.assertEqual(graph.completion(0), ((0,), False))
+
+    def test_completion_cycle(self):
+        root = NoOpDecision('root', True)
+        root.add_transition(NoOpLeaf('invalid', False))
+        root.add_transition(root)
+        graph = root.compile()
+        with self.assertRaises(InternalException):
+            graph.completion(0)
+
+    def test_completion_deep(self):
+        root = NoOpDecision('root', True)
+        node = root
+        for _ in range(10000):
+            child = NoOpDecision(None, False)
+            node.add_transition(child)
+            node = child
+        node.add_transition(NoOpLeaf('valid', True))
+        fragment, satisfiable = root.compile().completion(0)
+        self.assertEqual(fragment, (0,) * 10000)
+        self.assertTrue(satisfiable)
+
+    def test_unreachable_source(self):
+        root = NoOpDecision('root', False)
+        unreachable = NoOpDecision('unreachable', False)
+        leaf = NoOpLeaf('leaf', True)
+        unreachable.add_transition(leaf)
+        root.add_transition(leaf)
+        graph = root.compile()
+        self.assertEqual(list(graph.pred_edges), [0])
+        paths = list(graph.generate_paths())
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(paths[0].path, [0])
+        self.assertTrue(paths[0].is_valid)
+
+    def test_pickle(self):
+        root = NoOpDecision('root', True)
+        node = root
+        for idx in range(10000):
+            child = NoOpDecision(f"node{idx}", idx % 2 == 0)
+            node.add_transition(child)
+            node = child
+        node.add_transition(NoOpLeaf('valid', True))
+        node.add_transition(NoOpLeaf('invalid', False))
+
+        graph = pickle.loads(pickle.dumps(root.compile()))
+        new_root = graph.nodes[0]
+        self.assertIsNot(new_root, root)
+        self.assertIs(new_root.compile(), graph)
+        self.assertEqual(
+            [(i.path, i.is_valid) for i in new_root.generate_paths()],
+            [(i.path, i.is_valid) for i in root.generate_paths()]
+        )
+        check_consistency(new_root)
+
+    def test_generate_paths(self):
+        root = NoOpDecision('root', True)
+        option = NoOpDecision('option', False)
+        root.add_transition(option)
+        root.add_transition(NoOpLeaf('fixed', True))
+        option.add_transition(NoOpLeaf('valid', True))
+        option.add_transition(NoOpLeaf('invalid', False))
+        paths = [(i.target.id, i.path, i.is_valid) for i in root.generate_paths()]
+        self.assertEqual(paths, [
+            ('valid', [0], True),
+            ('invalid', [1], False),
+        ])
+
+
+class CompilePathTest(TestCase):
+
+    def create_graph(self):
+        root = AppendDecision('root', True)
+        option = AppendDecision('option', False)
+        empty = AppendDecision('empty', True)
+        root.add_transition(option)
+        root.add_transition(empty)
+        root.add_transition(AppendLeaf('last', True))
+        option.add_transition(AppendLeaf('valid', True))
+        option.add_transition(AppendLeaf('invalid', False))
+        return root
+
+    def test_same_as_execute(self):
+        root = self.create_graph()
+        paths = [i.path for i in root.generate_paths()]
+        self.assertEqual(len(paths), 2)
+        for path in paths:
+            plan = root.compile_path(path)
+            self.assertEqual(plan.execute([]), root.execute(path, []))
+        self.assertEqual(root.compile_path([1]).execute([]), ['root', 'last'])
+
+    def test_result_of_empty_decision(self):
+        root = AppendDecision('root', True)
+        root.add_transition(AppendLeaf('leaf', True))
+        root.add_transition(AppendDecision('empty', True))
+        self.assertIsNone(root.compile_path([]).execute([]))
+
+    def test_execute_many(self):
+        root = self.create_graph()
+        plan = root.compile_path([1])
+        results = list(root.execute_many([[0], plan, plan], []))
+        self.assertEqual(results, [
+            ['root', 'last'],
+            ['root', 'last'],
+            ['root', 'last'],
+        ])
+
+    def test_invalid_path(self):
+        root = self.create_graph()
+        with self.assertRaises(InternalException):
+            root.compile_path([])
+        with self.assertRaises(InternalException):
+            root.compile_path([0, 0])
+        with self.assertRaises(InternalException):
+            root.compile_path([2])
+
+
+class MinimalTest(TestCase):
+
+    def create_graph(self):
+        root = NoOpDecision('root', True)
+        for idx in range(3):
+            option = NoOpDecision(f"option{idx}", False)
+            option.add_transition(NoOpLeaf(f"a{idx}", True))
+            option.add_transition(NoOpLeaf(f"b{idx}", True))
+            option.add_transition(NoOpLeaf(f"invalid{idx}", False))
+            root.add_transition(option)
+        return root
+
+    def test_minimal(self):
+        root = self.create_graph()
+        self.assertEqual(sum(i.is_valid for i in root.generate_paths()), 4)
+        paths = [(i.path, i.is_valid) for i in root.generate_paths(minimal=True)]
+        self.assertEqual(paths, [
+            ([0, 0, 0], True),
+            ([1, 1, 1], True),
+            ([2, 0, 0], False),
+            ([0, 2, 0], False),
+            ([0, 0, 2], False),
+        ])
+
+    def test_cycle(self):
+        root = NoOpDecision('root', False)
+        loop = NoOpDecision('loop', True)
+        root.add_transition(NoOpLeaf('leaf', True))
+        root.add_transition(loop)
+        loop.add_transition(NoOpLeaf('loop_leaf', True))
+        loop.add_transition(root)
+        paths = [(i.path, i.is_valid) for i in root.generate_paths(minimal=True)]
+        self.assertEqual(paths, [([0], True), ([1, 0], True)])
+
+    def test_no_valid_path(self):
+        root = NoOpDecision('root', True)
+        root.add_transition(NoOpLeaf('valid', True))
+        root.add_transition(NoOpLeaf('invalid', False))
+        # Falls back to targeting leafs one by one
+        paths = [(i.target.id, i.path, i.is_valid) for i in root.generate_paths(minimal=True)]
+        self.assertEqual(paths, [(i.target.id, i.path, i.is_valid) for i in root.generate_paths()])
+
+    def test_shards(self):
+        root = self.create_graph()
+        paths = [i.path for i in root.generate_paths(minimal=True)]
+        shards = [[i.path for i in root.generate_paths(idx, 2, minimal=True)] for idx in range(2)]
+        self.assertEqual(shards[0] + shards[1], paths[0::2] + paths[1::2])
+
+
+class OrderByCoverageTest(TestCase):
+
+    def create_graph(self):
+        root = NoOpDecision('root', False)
+        root.add_transition(NoOpLeaf('single', True))
+        many = NoOpDecision('many', True)
+        for idx in range(3):
+            many.add_transition(NoOpLeaf(f"leaf{idx}", True))
+        root.add_transition(many)
+        root.add_transition(NoOpLeaf('invalid', False))
+        return root
+
+    def test_order(self):
+        root = self.create_graph()
+        self.assertEqual([i.path for i in root.generate_paths()], [[0], [1], [2]])
+        self.assertEqual([i.coverage for i in root.generate_paths()], [None, None, None])
+        entries = [(i.path, i.is_valid, i.coverage) for i in root.generate_paths(order_by_coverage=True)]
+        self.assertEqual(entries, [
+            ([1], True, 0.6),
+            ([0], True, 0.8),
+            ([2], False, 1.0),
+        ])
+
+    def test_shards(self):
+        root = self.create_graph()
+        shard = [i.path for i in root.generate_paths(1, 2, order_by_coverage=True)]
+        self.assertEqual(shard, [[0]])
+
+    def test_leafs_on_path(self):
+        root = self.create_graph()
+        graph = root.compile()
+        self.assertEqual([graph.nodes[i].id for i in graph.leafs_on_path([1])], ['leaf0', 'leaf1', 'leaf2'])
+        with self.assertRaises(InternalException):
+            graph.leafs_on_path([])
+        with self.assertRaises(InternalException):
+            graph.leafs_on_path([3])
+        with self.assertRaises(InternalException):
+            graph.leafs_on_path([0, 0])
+
+
+class EdgeCoverageTest(TestCase):
+
+    def create_graph(self):
+        # Both options lead to the same shared node
+        root = NoOpDecision('root', True)
+        shared = NoOpDecision('shared', False)
+        shared.add_transition(NoOpLeaf('valid', True))
+        shared.add_transition(NoOpLeaf('invalid', False))
+        for idx in range(2):
+            option = NoOpDecision(f"option{idx}", False)
+            option.add_transition(NoOpLeaf(f"leaf{idx}", True))
+            option.add_transition(shared)
+            root.add_transition(option)
+        return root
+
+    def test_cover_edges(self):
+        root = self.create_graph()
+        graph = root.compile()
+        paths = [i.path for i in root.generate_paths()]
+        self.assertEqual(graph.edge_coverage(paths), (7, 8))
+
+        entries = list(root.generate_paths(cover_edges=True))
+        self.assertEqual(len(entries), len(paths) + 1)
+        self.assertEqual(entries[-1].path, [0, 1, 0])
+        self.assertEqual(entries[-1].target.id, 'valid')
+        self.assertTrue(entries[-1].is_valid)
+        self.assertEqual(graph.edge_coverage(i.path for i in entries), (8, 8))
+
+    def test_minimal(self):
+        root = self.create_graph()
+        graph = root.compile()
+        entries = list(root.generate_paths(minimal=True, cover_edges=True))
+        self.assertEqual(graph.edge_coverage(i.path for i in entries), (8, 8))
+
+    def test_edges_on_path(self):
+        graph = self.create_graph().compile()
+        self.assertEqual(
+            [(graph.nodes[graph.edge_sources[i]].id, graph.nodes[graph.succ_targets[i]].id)
+             for i in graph.edges_on_path([0, 1, 1])],
+            [('root', 'option0'), ('root', 'option1'), ('option0', 'leaf0'),
+             ('option1', 'shared'), ('shared', 'invalid')])
@@ -0,0 +1,45 @@
+from fences.core.dedup import Deduplicator, canonical_bytes
+from fences import parse_regex
+
+from unittest import TestCase
+from xml.etree import ElementTree
+
+
+class CanonicalBytesTest(TestCase):
+
+    def test_json(self):
+        self.assertEqual(canonical_bytes({'a': 1, 'b': [None]}), canonical_bytes({'b': [None], 'a': 1}))
+        self.assertNotEqual(canonical_bytes(1), canonical_bytes(1.0))
+        self.assertNotEqual(canonical_bytes(1), canonical_bytes(True))
+        self.assertNotEqual(canonical_bytes(1), canonical_bytes('1'))
+
+    def test_xml(self):
+        element = ElementTree.fromstring('<a x="1"><b/></a>')
+        self.assertEqual(canonical_bytes(ElementTree.ElementTree(element)), b'<a x="1"><b /></a>')
+
+
+class DeduplicatorTest(TestCase):
+
+    def test_filter(self):
+        dedup = Deduplicator()
+        samples = [{'a': 1, 'b': 2}, 'x', {'b': 2, 'a': 1}, 'x', 'y']
+        self.assertEqual(list(dedup.filter(samples)), [{'a': 1, 'b': 2}, 'x', 'y'])
+        self.assertEqual(dedup.num_samples, 5)
+        self.assertEqual(dedup.num_duplicates, 2)
+        self.assertEqual(dedup.rate, 0.4)
+
+    def test_capacity(self):
+        dedup = Deduplicator(capacity=2)
+        self.assertEqual(list(dedup.filter(['a', 'b', 'a', 'c', 'a'])), ['a', 'b', 'c', 'a'])
+
+    def test_graph(self):
+        graph = parse_regex('a{2}|aa')
+        dedup = Deduplicator()
+        samples = [graph.execute(i.path) for i in graph.generate_paths()]
+        self.assertEqual(samples, ['aa', 'aa'])
+        self.assertEqual(list(dedup.filter(samples)), ['aa'])
+
+    def test_empty(self):
+        self.assertEqual(Deduplicator().rate, 0)
+        with self.assertRaises(ValueError):
+            Deduplicator(capacity=0)
@@ -192,3 +192,191 @@ class OptimizeTest(TestCase):
         root.optimize()
         self.assertEqual(len(list(root.items())), 2)
         self.assertTrue(root.all_transitions)
+
+
+class DeepGraphTest(TestCase):
+    """
+    Graphs deeper than the recursion limit
+    """
+
+    DEPTH = 10000
+
+    def create_graph(self):
+        # Alternating all/any decisions, each having an invalid leaf
+        root = NoOpDecision('root', True)
+        node = root
+        for idx in range(self.DEPTH):
+            child = NoOpDecision(f"node{idx}", idx % 2 == 1)
+            node.add_transition(NoOpLeaf(None, False))
+            node.add_transition(child)
+            node = child
+        node.add_transition(NoOpLeaf('valid', True))
+        return root
+
+    def test_items(self):
+        root = self.create_graph()
+        self.assertEqual(len(list(root.items())), 2 * self.DEPTH + 2)
+
+    def test_generate_paths(self):
+        root = self.create_graph()
+        paths = list(root.generate_paths())
+        self.assertEqual(len(paths), self.DEPTH // 2 + 1)
+        self.assertTrue(paths[0].is_valid)
+        for path in [paths[0], paths[-1]]:
+            root.execute(path.path)
+
+    def test_resolve(self):
+        nodes = [NoOpDecision(f"node{idx}") for idx in range(self.DEPTH)]
+        for idx, node in enumerate(nodes[:-1]):
+            node.add_transition(Reference(None, f"node{idx+1}"))
+        nodes[-1].add_transition(NoOpLeaf('leaf', True))
+        root = nodes[0].resolve(nodes[1:])
+        self.assertEqual(len(list(root.items())), self.DEPTH + 1)
+
+    def test_optimize(self):
+        root = NoOpDecision('root', False)
+        node = root
+        for _ in range(self.DEPTH):
+            child = NoOpDecision(None, False)
+            node.add_transition(child)
+            node = child
+        node.add_transition(NoOpLeaf('leaf', True))
+        root.optimize()
+        self.assertEqual(len(list(root.items())), 2)
+
+
+class ShardTest(TestCase):
+
+    def create_graph(self):
+        root = NoOpDecision('root', True)
+        for idx in range(5):
+            child = NoOpDecision(f"child{idx}", False)
+            child.add_transition(NoOpLeaf(None, True))
+            child.add_transition(NoOpLeaf(None, False))
+            child.add_transition(NoOpLeaf(None, False))
+            root.add_transition(child)
+        return root
+
+    def test_shards(self):
+        root = self.create_graph()
+        expected = [(i.path, i.is_valid) for i in root.generate_paths()]
+        self.assertEqual(len(expected), 11)
+        shards = [
+            [(i.path, i.is_valid) for i in root.generate_paths(shard_index=idx, shard_count=3)]
+            for idx in range(3)
+        ]
+        self.assertEqual([len(i) for i in shards], [4, 4, 3])
+        self.assertEqual(sorted(sum(shards, [])), sorted(expected))
+
+    def test_more_shards_than_paths(self):
+        root = self.create_graph()
+        self.assertEqual(list(root.generate_paths(shard_index=20, shard_count=21)), [])
+
+    def test_invalid_shard(self):
+        root = self.create_graph()
+        with self.assertRaises(ValueError):
+            list(root.generate_paths(shard_index=3, shard_count=3))
+        with self.assertRaises(ValueError):
+            list(root.generate_paths(shard_index=0, shard_count=0))
+
+
+class InternLeafsTest(TestCase):
+
+    def test_intern(self):
+        root = NoOpDecision('root', True)
+        option1 = NoOpDecision('option1', False)
+        option2 = NoOpDecision('option2', False)
+        root.add_transition(option1)
+        root.add_transition(option2)
+        for option in [option1, option2]:
+            option.add_transition(NoOpLeaf(None, True))
+            option.add_transition(NoOpLeaf(None, False))
+            option.add_transition(MockLeaf(None, False))
+        option1.add_transition(NoOpLeaf('with_id', True))
+        self.assertEqual(len(list(root.items())), 10)
+
+        self.assertEqual(root.intern_leafs(), 3)
+        self.assertEqual(len(list(root.items())), 7)
+        check_consistency(root)
+        self.assertIs(option1.outgoing_transitions[0].target, option2.outgoing_transitions[0].target)
+        self.assertEqual(len(list(root.generate_paths())), 4)
+
+    def test_different_values(self):
+        root = NoOpDecision('root', False)
+        for idx in range(3):
+            root.add_transition(MockLeaf(None, True))
+            root.outgoing_transitions[-1].target.count = idx
+        self.assertEqual(root.intern_leafs(), 0)
+
+    def test_values(self):
+        root = NoOpDecision('root', False)
+        shared = []
+        # Equal values of different types and equal, but unhashable values are kept
+        for value in [1, True, 1.0, [], [], shared, shared, 'a', 'a']:
+            root.add_transition(MockLeaf(None, True))
+            root.outgoing_transitions[-1].target.count = value
+        self.assertEqual(root.intern_leafs(), 2)
+        targets = [i.target for i in root.outgoing_transitions]
+        self.assertIs(targets[5], targets[6])
+        self.assertIs(targets[7], targets[8])
+        self.assertIsNot(targets[3], targets[4])
+
+
+class ShareSubgraphsTest(TestCase):
+
+    def create_option(self, id: str) -> NoOpDecision:
+        option = NoOpDecision(id, False)
+        all_node = NoOpDecision(None, True)
+        all_node.add_transition(NoOpLeaf(None, True))
+        all_node.add_transition(MockLeaf(None, False))
+        option.add_transition(all_node)
+        option.add_transition(NoOpLeaf(None, False))
+        return option
+
+    def test_share(self):
+        root = NoOpDecision('root', True)
+        for idx in range(3):
+            root.add_transition(self.create_option(f"option{idx}"))
+        self.assertEqual(len(list(root.items())), 16)
+
+        root.optimize(share_subgraphs=True)
+        self.assertEqual(len(list(root.items())), 6)
+        check_consistency(root)
+        targets = set(id(i.target) for i in root.outgoing_transitions)
+        self.assertEqual(len(targets), 1)
+        self.assertEqual(len(root.outgoing_transitions[0].target.incoming_transitions), 3)
+        self.assertEqual(len(list(root.generate_paths())), 2)
+
+    def test_different_shapes(self):
+        root = NoOpDecision('root', True)
+        root.add_transition(self.create_option('option1'))
+        option2 = self.create_option('option2')
+        option2.all_transitions = True
+        root.add_transition(option2)
+        self.assertEqual(root.share_subgraphs(), 4)
+        self.assertEqual(len(list(root.items())), 7)
+        self.assertIsNot(root.outgoing_transitions[0].target, root.outgoing_transitions[1].target)
+        check_consistency(root)
+
+    def test_cycle(self):
+        root = NoOpDecision('root', False)
+        loop1 = NoOpDecision('loop1', False)
+        loop2 = NoOpDecision('loop2', False)
+        root.add_transition(loop1)
+        root.add_transition(loop2)
+        for loop in [loop1, loop2]:
+            loop.add_transition(loop)
+            loop.add_transition(NoOpLeaf(None, True))
+        self.assertEqual(root.share_subgraphs(), 1)
+        self.assertIsNot(root.outgoing_transitions[0].target, root.outgoing_transitions[1].target)
+        check_consistency(root)
+
+    def test_root_is_kept(self):
+        root = NoOpDecision('root', False)
+        child = NoOpDecision('child', False)
+        child.add_transition(NoOpLeaf(None, True))
+        root.add_transition(child)
+        root.add_transition(NoOpLeaf(None, True))
+        root.share_subgraphs()
+        self.assertIs(next(root.items()), root)
+        check_consistency(root)
@@ -0,0 +1,70 @@
+from fences.core.parallel import generate_samples
+from fences.core.dedup import Deduplicator
+from fences.core.node import NoOpDecision, NoOpLeaf
+from fences import parse_regex
+
+from unittest import TestCase
+
+
+def to_upper(sample: str) -> str:
+    return sample.upper()
+
+
+class GenerateSamplesTest(TestCase):
+
+    def setUp(self):
+        self.graph = parse_regex('a(b|c|d)*[e-g]?x')
+        self.expected = [
+            (i.path, i.is_valid, self.graph.execute(i.path))
+            for i in self.graph.generate_paths()
+        ]
+
+    def check(self, samples):
+        self.assertEqual(
+            [(i.path, i.is_valid, sample) for i, sample in samples],
+            self.expected
+        )
+
+    def test_ordered(self):
+        self.check(generate_samples(self.graph, max_workers=2, chunk_size=1))
+
+    def test_unordered(self):
+        samples = list(generate_samples(self.graph, max_workers=2, chunk_size=2, ordered=False))
+        samples.sort(key=lambda i: self.expected.index((i[0].path, i[0].is_valid, i[1])))
+        self.check(samples)
+
+    def test_postprocess(self):
+        samples = generate_samples(self.graph, max_workers=1, postprocess=to_upper)
+        self.assertEqual([i for _, i in samples], [i.upper() for _, _, i in self.expected])
+
+    def test_shard(self):
+        samples = generate_samples(self.graph, max_workers=1, shard_index=1, shard_count=2)
+        self.assertEqual(
+            [(i.path, i.is_valid, sample) for i, sample in samples],
+            self.expected[1::2]
+        )
+
+    def test_deduplicate(self):
+        dedup = Deduplicator()
+        samples = generate_samples(self.graph, max_workers=1, postprocess=to_upper, deduplicator=dedup)
+        expected = []
+        for _, _, sample in self.expected:
+            if sample.upper() not in expected:
+                expected.append(sample.upper())
+        self.assertEqual([i for _, i in samples], expected)
+        self.assertEqual(dedup.num_samples, len(self.expected))
+
+    def test_deep_graph(self):
+        root = NoOpDecision('root', False)
+        node = root
+        for _ in range(10000):
+            child = NoOpDecision(None, False)
+            node.add_transition(child)
+            node = child
+        node.add_transition(NoOpLeaf('leaf', True))
+        samples = list(generate_samples(root, max_workers=1))
+        self.assertEqual(len(samples), 1)
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            list(generate_samples(self.graph, chunk_size=0))
@@ -1,5 +1,6 @@
-from fences.core.random import generate_random_string, StringProperties, generate_random_number
+from fences.core.random import generate_random_string, StringProperties, generate_random_number, RandomWalker
 from fences.core.exception import FencesException
+from fences.core.node import NoOpDecision, NoOpLeaf
 
 from unittest import TestCase
 
@@ -72,3 +73,46 @@ class GenerateNumberTest(TestCase):
     
     def test_trivial_interval(self):
         self.check(12, 12)
+
+
+class RandomWalkerTest(TestCase):
+
+    def create_graph(self):
+        # root -> (leaf | root root), i.e. a binary tree of any size
+        root = NoOpDecision('root', False)
+        pair = NoOpDecision('pair', True)
+        root.add_transition(NoOpLeaf('leaf', True))
+        root.add_transition(pair)
+        root.add_transition(NoOpLeaf('invalid', False))
+        pair.add_transition(root)
+        pair.add_transition(root)
+        return root
+
+    def test_valid(self):
+        root = self.create_graph()
+        walker = RandomWalker(root, seed=42, max_decisions=10)
+        graph = root.compile()
+        for path in walker.generate_paths(100):
+            self.assertNotIn(2, path)
+            self.assertTrue(all(graph.is_valid[i] for i in graph.leafs_on_path(path)))
+            # Each path ends after max_decisions choices plus the shortest completion
+            self.assertLessEqual(len(path), 10 + 11)
+
+    def test_seed(self):
+        root = self.create_graph()
+        paths1 = list(RandomWalker(root, seed=1).generate_paths(20))
+        paths2 = list(RandomWalker(root, seed=1).generate_paths(20))
+        self.assertEqual(paths1, paths2)
+        self.assertGreater(len(set(tuple(i) for i in paths1)), 1)
+
+    def test_weight(self):
+        root = self.create_graph()
+        walker = RandomWalker(root, seed=1, weight=lambda decision, idx: 1 if idx == 0 else 0)
+        self.assertEqual(list(walker.generate_paths(3)), [[0], [0], [0]])
+        self.assertEqual(list(walker.generate_samples(2)), [None, None])
+
+    def test_no_valid_path(self):
+        root = NoOpDecision('root', False)
+        root.add_transition(NoOpLeaf('invalid', False))
+        with self.assertRaises(ValueError):
+            RandomWalker(root)
@@ -1,5 +1,7 @@
-from fences.core.util import ConfusionMatrix, render_table
+from fences.core.util import ConfusionMatrix, render_table, trampoline, BitSet, encode_key
 from unittest import TestCase
+from enum import Enum
+import json
 
 
 class RenderTableTest(TestCase):
@@ -119,3 +121,55 @@ class ConfusionMatrixTest(TestCase):
         c = ConfusionMatrix()
         self.assertEqual(c.accuracy(), 0)
         self.assertEqual(c.balanced_accuracy(), 0)
+
+
+class TrampolineTest(TestCase):
+
+    def test_deep(self):
+        def count(n: int):
+            if n == 0:
+                return 0
+            return (yield count(n - 1)) + 1
+        self.assertEqual(trampoline(count(100000)), 100000)
+
+    def test_exception(self):
+        def fail(n: int):
+            if n == 0:
+                raise ValueError()
+            try:
+                return (yield fail(n - 1))
+            except ValueError:
+                return n
+        self.assertEqual(trampoline(fail(5)), 1)
+
+        def fail_uncaught(n: int):
+            if n == 0:
+                raise ValueError()
+            yield fail_uncaught(n - 1)
+        with self.assertRaises(ValueError):
+            trampoline(fail_uncaught(5))
+
+
+class BitSetTest(TestCase):
+
+    def test_bitset(self):
+        bits = BitSet(20)
+        self.assertEqual(len(bits), 0)
+        for idx in [0, 7, 8, 19, 7]:
+            bits.add(idx)
+        self.assertEqual(len(bits), 4)
+        self.assertIn(8, bits)
+        self.assertNotIn(9, bits)
+        self.assertEqual(list(bits), [0, 7, 8, 19])
+        self.assertEqual(bits.size, 20)
+
+
+class EncodeKeyTest(TestCase):
+
+    def test_values(self):
+        class Color(Enum):
+            RED = 'red'
+        data = json.dumps([{1, 2}, b'\x01', Color.RED], default=encode_key)
+        self.assertEqual(data, '[[1, 2], "01", "red"]')
+        with self.assertRaises(ValueError):
+            json.dumps(object(), default=encode_key)
@@ -0,0 +1,84 @@
+from fences.json_schema.parse import parse, SetValueLeaf, FetchOutputNode, CreateInputNode
+from fences.json_schema.emit import JsonEmitter
+from fences.core.node import NoOpDecision, NoOpLeaf
+
+from unittest import TestCase
+import json
+
+
+class JsonEmitterTest(TestCase):
+
+    def check(self, schema: dict, compact: bool = False) -> JsonEmitter:
+        graph = parse(schema)
+        emitter = JsonEmitter(graph, compact)
+        separators = (',', ':') if compact else None
+        paths = [i.path for i in graph.generate_paths()]
+        expected = [json.dumps(graph.execute(path), separators=separators).encode() for path in paths]
+        self.assertEqual([emitter.emit(path) for path in paths], expected)
+        self.assertEqual(list(emitter.emit_many(paths)), expected)
+        buffer = bytearray(b'x')
+        for path in paths:
+            emitter.write(path, buffer)
+        self.assertEqual(bytes(buffer), b'x' + b''.join(expected))
+        return emitter
+
+    def test_object(self):
+        emitter = self.check({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'string'},
+                'b/"c"': {'type': 'object', 'properties': {'c': {'type': 'boolean'}}},
+                'd': {'enum': [1, 2.5, 'ä']},
+            },
+            'required': ['a', 'e'],
+        })
+        self.assertEqual(emitter.num_fallbacks, 0)
+
+    def test_compact(self):
+        self.check({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'array', 'items': {'type': 'number'}, 'minItems': 2},
+                'b': {'type': 'null'},
+            },
+        }, True)
+
+    def test_array(self):
+        emitter = self.check({
+            'type': 'array',
+            'items': {'type': 'object', 'properties': {'a': {'type': 'number'}}},
+            'minItems': 2,
+        })
+        self.assertEqual(emitter.num_fallbacks, 0)
+
+    def test_recursion(self):
+        self.check({
+            '$defs': {
+                'node': {
+                    'type': 'object',
+                    'properties': {'children': {'type': 'array', 'items': {'$ref': '#/$defs/node'}}},
+                }
+            },
+            '$ref': '#/$defs/node',
+        })
+
+    def test_overwrite(self):
+        # A value is set twice, falls back to execute()
+        values = NoOpDecision(None, True)
+        values.add_transition(SetValueLeaf(None, True, 1))
+        values.add_transition(SetValueLeaf(None, True, 2))
+        root = NoOpDecision(None, True)
+        root.add_transition(values)
+        root.add_transition(FetchOutputNode())
+        create_input = CreateInputNode()
+        create_input.add_transition(root)
+        emitter = JsonEmitter(create_input)
+        self.assertEqual(emitter.emit([0]), b'2')
+        self.assertEqual(emitter.num_fallbacks, 1)
+
+    def test_other_graph(self):
+        root = NoOpDecision(None, False)
+        root.add_transition(NoOpLeaf(None, True))
+        emitter = JsonEmitter(root)
+        self.assertEqual(emitter.emit([0]), b'null')
+        self.assertEqual(emitter.num_fallbacks, 1)
@@ -0,0 +1,77 @@
+from fences.json_schema.parse import parse
+from fences.json_schema.execute import CopyOnWriteExecutor
+
+from unittest import TestCase
+import json
+
+
+class CopyOnWriteExecutorTest(TestCase):
+
+    def check(self, schema: dict):
+        graph = parse(schema)
+        paths = [i.path for i in graph.generate_paths()]
+        for base_path in [None, *paths]:
+            executor = CopyOnWriteExecutor(graph, base_path)
+            for path in paths:
+                # Same key order, too
+                self.assertEqual(json.dumps(executor.execute(path)), json.dumps(graph.execute(path)))
+
+    def test_object(self):
+        self.check({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'string'},
+                'b': {'type': 'object', 'properties': {'c': {'type': 'boolean'}}},
+                'd': {'enum': [1, 2]},
+            },
+            'required': ['a', 'e'],
+        })
+
+    def test_array(self):
+        self.check({
+            'type': 'array',
+            'items': {'type': 'object', 'properties': {'a': {'type': 'number'}}},
+            'minItems': 2,
+        })
+
+    def test_all_of(self):
+        self.check({
+            'allOf': [
+                {'type': 'array', 'prefixItems': [{'type': 'string'}]},
+                {'type': 'array', 'items': {'type': 'boolean'}},
+            ]
+        })
+
+    def test_recursion(self):
+        self.check({
+            '$defs': {
+                'node': {
+                    'type': 'object',
+                    'properties': {'children': {'type': 'array', 'items': {'$ref': '#/$defs/node'}}},
+                }
+            },
+            '$ref': '#/$defs/node',
+        })
+
+    def test_sharing(self):
+        graph = parse({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'object', 'properties': {'x': {'type': 'string'}}, 'required': ['x']},
+                'b': {'type': 'string'},
+            },
+            'required': ['a', 'b'],
+        })
+        executor = CopyOnWriteExecutor(graph)
+        self.assertEqual(executor.base_sample, {'a': {'x': ''}, 'b': ''})
+        sample = executor.execute(executor.base_path)
+        self.assertIsNot(sample, executor.base_sample)
+        self.assertIs(sample['a'], executor.base_sample['a'])
+
+        # Invalid values of b do not change a
+        shared = 0
+        for i in graph.generate_paths():
+            sample = executor.execute(i.path)
+            if isinstance(sample, dict) and sample.get('a') is executor.base_sample['a']:
+                shared += 1
+        self.assertGreater(shared, 3)
@@ -1,6 +1,7 @@
 from fences.json_schema import parse, normalize
 from fences.json_schema.config import FormatSamples
 from fences.core.debug import check_consistency
+from fences.core.exception import NormalizationException
 from jsonschema import Draft202012Validator, ValidationError
 import unittest
 import yaml
@@ -294,6 +295,47 @@ class TestSpecial(TestGenerateBase):
         }
         self.check(schema, strict_invalid=False)
 
+    def test_deep(self):
+        # Deeper than the recursion limit allows for parsing
+        depth = 2000
+        schema = {}
+        sub_schema = schema
+        for _ in range(depth):
+            sub_schema['type'] = 'object'
+            sub_schema['properties'] = {'a': {}}
+            sub_schema['required'] = ['a']
+            sub_schema = sub_schema['properties']['a']
+        sub_schema['type'] = 'string'
+        graph = parse.parse(schema)
+        path = next(i.path for i in graph.generate_paths() if i.is_valid)
+        sample = graph.execute(path)
+        for _ in range(depth):
+            sample = sample['a']
+        self.assertIsInstance(sample, str)
+
+    def test_custom_handler(self):
+        def parse_string(data, config, unparsed_keys, pointer):
+            root = parse.NoOpDecision()
+            root.add_transition(parse.SetValueLeaf(None, True, 'custom'))
+            return root
+        config = parse.default_config()
+        config.type_handlers['string'] = parse_string
+        graph = parse.parse({'type': 'object', 'properties': {'a': {'type': 'string'}}, 'required': ['a']}, config)
+        samples = [graph.execute(i.path) for i in graph.generate_paths() if i.is_valid]
+        self.assertIn({'a': 'custom'}, samples)
+
+    def test_parse_object(self):
+        config = parse.default_config()
+        data = {'properties': {'a': {'anyOf': [{'type': 'string'}]}}, 'required': []}
+        node = parse.parse_object(data, config, set(data), parse.JsonPointer())
+        self.assertIsInstance(node, parse.Node)
+
+    def test_pointer_ids(self):
+        graph = parse.parse({'type': 'object', 'properties': {'a': {'type': 'object', 'properties': {'b': {'type': 'string'}}}}})
+        node = graph.get_by_id('#/anyOf/0/properties/a/anyOf/0/properties/b__KEY')
+        self.assertIsNotNone(node)
+        self.assertEqual(str(node.id), '#/anyOf/0/properties/a/anyOf/0/properties/b__KEY')
+
 
 class TestLogicalApplicators(TestGenerateBase):
 
@@ -461,3 +503,57 @@ class AasTest(TestGenerateBase):
             #     validator.validate(sample)
             num_samples += 1
         print(f"Generated {num_samples} samples")
+
+
+class LazyNormalizationTest(unittest.TestCase):
+
+    def samples(self, graph) -> list:
+        return [(i.is_valid, json.dumps(graph.execute(i.path))) for i in graph.generate_paths()]
+
+    def test_same_samples(self):
+        schema = {
+            '$defs': {
+                'node': {
+                    'type': 'object',
+                    'properties': {
+                        'value': {'anyOf': [{'type': 'string'}, {'type': 'boolean'}]},
+                        'children': {'type': 'array', 'items': {'$ref': '#/$defs/node'}},
+                    },
+                    'required': ['value'],
+                },
+            },
+            'type': 'object',
+            'properties': {
+                'root': {'$ref': '#/$defs/node'},
+                'tags': {'type': 'array', 'items': False, 'prefixItems': [True]},
+            },
+        }
+        config = parse.default_config()
+        config.normalizer = normalize.LazyNormalizer(schema)
+        self.assertEqual(self.samples(parse.parse(schema, config)), self.samples(parse.parse(schema)))
+
+    def test_sub_schema(self):
+        # Only the definitions used by the parsed schema are normalized
+        document = {
+            '$defs': {
+                'a': {'type': 'object', 'properties': {'b': {'$ref': '#/$defs/b'}}},
+                'b': {'type': 'string', 'minLength': 2},
+                # Cannot be normalized
+                'c': {'allOf': [{'x-unknown': 1}, {'x-unknown': 2}]},
+            }
+        }
+        statistics = normalize.NormalizationStatistics()
+        config = parse.default_config()
+        config.normalizer = normalize.LazyNormalizer(document, statistics=statistics)
+        graph = parse.parse({'$ref': '#/$defs/a'}, config)
+        samples = [graph.execute(i.path) for i in graph.generate_paths() if i.is_valid]
+        self.assertTrue(any(len(i.get('b', '')) >= 2 for i in samples))
+        num_options = statistics.num_options
+
+        # Normalized sub-schemas are reused
+        parse.parse({'$ref': '#/$defs/b'}, config)
+        parse.parse({'$ref': '#/$defs/a'}, config)
+        self.assertEqual(statistics.num_options, num_options)
+
+        with self.assertRaises(NormalizationException):
+            parse.parse({'$ref': '#/$defs/c'}, config)
@@ -1,9 +1,11 @@
 from unittest import TestCase
 from jsonschema import validators
-from fences.json_schema.normalize import normalize, check_normalized
+from fences.json_schema.normalize import normalize, check_normalized, NormalizationConfig, NormalizationStatistics
+from fences.json_schema.parse import parse, default_config
 from fences.core.exception import NormalizationException
 
 import yaml
+import copy
 
 
 class CheckNormalizedTest(TestCase):
@@ -252,6 +254,16 @@ class NormalizeTestCase(TestCase):
         }
         self.check(n)
 
+    def test_deep(self):
+        # Deeper than the recursion limit allows for copying and serializing
+        n = {}
+        sub_schema = n
+        for _ in range(400):
+            sub_schema['properties'] = {'a': {}}
+            sub_schema['required'] = ['a']
+            sub_schema = sub_schema['properties']['a']
+        self.check(n)
+
     def test_recursive_ref(self):
         n = {
             'type': 'object',
@@ -317,4 +329,174 @@ class NormalizeTestCase(TestCase):
             }
         }
         }
-        self.check(n)
\ No newline at end of file
+        self.check(n)
+
+    def test_equal_sub_schemas(self):
+        item = {'type': 'object', 'properties': {'x': {'anyOf': [{'type': 'string'}, {'minimum': 1}]}}}
+        n = {
+            'properties': {
+                'a': item,
+                'b': copy.deepcopy(item),
+                'c': {'type': 'array', 'items': item},
+            }
+        }
+        before = copy.deepcopy(n)
+        result = normalize(n)
+        check_normalized(result)
+        self.assertEqual(n, before)
+        props = result['anyOf'][0]['properties']
+        self.assertEqual(props['a'], props['b'])
+        # Equal sub-schemas share their result
+        self.assertIs(props['a'], props['b'])
+
+    def test_equal_refs(self):
+        # Equal referencing schemas are defined once
+        n = {
+            '$defs': {'node': {'properties': {'next': {'$ref': '#/$defs/node'}}}},
+            'properties': {
+                'a': {'$ref': '#/$defs/node'},
+                'b': {'$ref': '#/$defs/node'},
+            }
+        }
+        before = copy.deepcopy(n)
+        result = normalize(n)
+        check_normalized(result)
+        self.assertEqual(n, before)
+        props = result['anyOf'][0]['properties']
+        self.assertEqual(props['a'], props['b'])
+        self.assertEqual(len(result['$defs']), 1)
+
+    def test_shared_definitions(self):
+        # Equal sub-schemas share one definition, hence one node of the parsed graph,
+        # even if they are reached through different options
+        n = {
+            '$defs': {
+                'kind': {},
+                'named': {'allOf': [{'properties': {'kind': {}}}]},
+                'typed': {'properties': {'kind': {'$ref': '#/$defs/kind'}}},
+                'attributes': {'allOf': [{'$ref': '#/$defs/named'}, {'$ref': '#/$defs/typed'}]},
+                'blob': {'allOf': [{'$ref': '#/$defs/named'}, {'$ref': '#/$defs/typed'}]},
+                'collection': {'allOf': [{'$ref': '#/$defs/attributes'}]},
+                'element': {
+                    'allOf': [{'$ref': '#/$defs/attributes'}],
+                    'anyOf': [{'$ref': '#/$defs/blob'}, {'$ref': '#/$defs/collection'}],
+                },
+            },
+            'properties': {
+                'element': {'$ref': '#/$defs/element'},
+                'collection': {'$ref': '#/$defs/collection'},
+            }
+        }
+        # Otherwise, the equal options are merged
+        result = normalize(n, NormalizationConfig(remove_redundant_options=False))
+        check_normalized(result)
+        element_ref = result['anyOf'][0]['properties']['element']['anyOf'][0]['$ref']
+        element = result['$defs'][element_ref.split('/')[-1]]
+        refs = [i['properties']['kind']['anyOf'][0]['$ref'] for i in element['anyOf']]
+        self.assertEqual(len(refs), 2)
+        self.assertEqual(refs[0], refs[1])
+        self.assertEqual(len(result['$defs']), 4)
+        config = default_config()
+        config.normalize = False
+        graph = parse(result, config)
+        self.assertEqual(len(graph.get_by_id(refs[0]).incoming_transitions), 2)
+
+    def test_circular_schema(self):
+        n = {'properties': {}}
+        n['properties']['a'] = n
+        with self.assertRaises(NormalizationException):
+            normalize(n)
+
+    def test_plain_output(self):
+        # The output consists of plain dicts and lists only
+        n = {
+            '$defs': {'a': {'enum': [{'x': [1]}, 2], 'required': ['b']}},
+            'properties': {
+                'b': {'$ref': '#/$defs/a'},
+                'c': {'const': {'y': []}},
+            },
+            'allOf': [{'$ref': '#/$defs/a'}],
+        }
+        result = normalize(n)
+        stack = [result]
+        while stack:
+            value = stack.pop()
+            self.assertIn(type(value), [dict, list, str, int, bool, type(None)])
+            if isinstance(value, dict):
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+        yaml.safe_dump(result)
+
+    def test_unsatisfiable_conjunctions(self):
+        n = {
+            'allOf': [
+                {'oneOf': [{'type': 'string', 'minLength': i}, {'type': 'boolean'}]}
+                for i in range(12)
+            ]
+        }
+        result = normalize(n)
+        check_normalized(result)
+        self.assertEqual(len(result['anyOf']), 2)
+
+        result = normalize({'allOf': [{'type': 'string'}, {'type': 'boolean'}]})
+        self.assertEqual(result['anyOf'], [{'enum': []}])
+        result = normalize({'anyOf': [{'type': 'number', 'minimum': 5, 'maximum': 2}, {'minItems': 1}]})
+        self.assertEqual(result['anyOf'], [{'minItems': 1}])
+
+        # Bounds do not restrict other types
+        for schema in [{'allOf': [{'minimum': 5}, {'maximum': 3}]}, {'minItems': 3, 'maxItems': 1},
+                       {'type': ['string', 'number'], 'minimum': 5, 'maximum': 3}]:
+            result = normalize(schema)
+            self.assertNotEqual(result['anyOf'], [{'enum': []}])
+            self.assertEqual(len(result['anyOf']), 1)
+
+    def test_max_conjunctions(self):
+        n = {
+            'allOf': [
+                {'anyOf': [{'pattern': f"a{i}"}, {'pattern': f"b{i}"}, {'pattern': f"c{i}"}]}
+                for i in range(5)
+            ]
+        }
+        self.assertEqual(len(normalize(n)['anyOf']), 3**5)
+        result = normalize(n, NormalizationConfig(max_conjunctions=100))
+        check_normalized(result)
+        self.assertEqual(len(result['anyOf']), 3)
+
+    def test_redundant_options(self):
+        n = {
+            'anyOf': [
+                {'type': 'string', 'minLength': 2},
+                {'type': 'string', 'minLength': 5, 'pattern': 'a+'},
+                {'minLength': 2, 'type': ['string']},
+                {'required': ['a', 'b'], 'properties': {'a': {'type': 'number'}}},
+                {'properties': {'a': {'type': 'number'}}, 'required': ['b', 'a']},
+                # Accepts all values which are not numbers
+                {'minimum': 2, 'maximum': 1},
+                {'type': ['string', 'null']},
+            ]
+        }
+        statistics = NormalizationStatistics()
+        result = normalize(n, statistics=statistics)
+        check_normalized(result)
+        self.assertEqual(len(result['anyOf']), 3)
+        self.assertEqual(result['anyOf'][1], {'minimum': 2, 'maximum': 1})
+        self.assertEqual(set(result['anyOf'][2]['type']), {'string', 'null'})
+        self.assertGreaterEqual(statistics.num_options, 7)
+        self.assertEqual(statistics.num_duplicates, 2)
+        self.assertEqual(statistics.num_subsumed, 2)
+
+        result = normalize(n, NormalizationConfig(remove_redundant_options=False))
+        self.assertEqual(len(result['anyOf']), 7)
+
+    def test_duplicate_options_key_order(self):
+        n = {
+            'anyOf': [
+                {'type': 'object', 'properties': {'a': {'type': 'number', 'minimum': 1}}},
+                {'type': 'object', 'properties': {'a': {'minimum': 1, 'type': 'number'}}},
+            ]
+        }
+        statistics = NormalizationStatistics()
+        result = normalize(n, statistics=statistics)
+        self.assertEqual(len(result['anyOf']), 1)
+        self.assertEqual(statistics.num_duplicates, 1)
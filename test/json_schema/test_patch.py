@@ -0,0 +1,117 @@
+from fences.json_schema.parse import parse
+from fences.json_schema.patch import make_patch, apply_patch, write_patches, read_patches
+from fences.core.exception import JsonPointerException
+
+from unittest import TestCase
+import io
+import json
+
+
+class MakePatchTest(TestCase):
+
+    def check(self, base: any, sample: any):
+        patch = make_patch(base, sample)
+        result = apply_patch(base, patch)
+        self.assertEqual(json.dumps(result, sort_keys=True), json.dumps(sample, sort_keys=True))
+        return patch
+
+    def test_equal(self):
+        self.assertEqual(self.check({'a': [1, 2]}, {'a': [1, 2]}), [])
+
+    def test_object(self):
+        patch = self.check({'a': 1, 'b': 2, 'c': {'d': 3}}, {'a': 1, 'c': {'d': 4}, 'e': 5})
+        self.assertEqual(patch, [
+            {'op': 'remove', 'path': '/b'},
+            {'op': 'add', 'path': '/e', 'value': 5},
+            {'op': 'replace', 'path': '/c/d', 'value': 4},
+        ])
+
+    def test_array(self):
+        self.check([1, 2, 3], [1])
+        self.check([1], [1, 2, 3])
+        self.check([[1], 2], [[2], 2, {}])
+
+    def test_types(self):
+        self.assertEqual(len(self.check([1, True, 1.0], [True, 1.0, 1])), 3)
+        self.check({'a': []}, {'a': {}})
+        self.check({'a': 1}, [1])
+        self.check(None, 'x')
+
+    def test_escape(self):
+        patch = self.check({}, {'a/b': {'~c': 1}})
+        self.assertEqual(patch[0]['path'], '/a~1b')
+        self.check({'a/b': {'~c': 1}}, {'a/b': {'~c': 2}})
+
+    def test_shared(self):
+        # Shared sub-documents are skipped
+        child = {'a': 1}
+        self.assertEqual(make_patch({'x': child}, {'x': child}), [])
+
+    def test_base_not_modified(self):
+        base = {'a': [1]}
+        apply_patch(base, [{'op': 'add', 'path': '/a/-', 'value': 2}])
+        self.assertEqual(base, {'a': [1]})
+
+    def test_copy_on_write(self):
+        base = {'a': {'b': [1]}, 'c': {'d': 2}}
+        value = {'e': 3}
+        result = apply_patch(base, [
+            {'op': 'add', 'path': '/a/b/-', 'value': value},
+            {'op': 'add', 'path': '/a/b/1/f', 'value': 4},
+        ])
+        self.assertEqual(result, {'a': {'b': [1, {'e': 3, 'f': 4}]}, 'c': {'d': 2}})
+        self.assertEqual(base, {'a': {'b': [1]}, 'c': {'d': 2}})
+        self.assertEqual(value, {'e': 3})
+        # Unchanged sub-documents are not copied
+        self.assertIs(result['c'], base['c'])
+
+    def test_invalid(self):
+        with self.assertRaises(JsonPointerException):
+            apply_patch({'a': 1}, [{'op': 'replace', 'path': '/b', 'value': 1}])
+        with self.assertRaises(JsonPointerException):
+            apply_patch([1], [{'op': 'remove', 'path': '/1'}])
+        with self.assertRaises(ValueError):
+            apply_patch({}, [{'op': 'move', 'from': '/a', 'path': '/b'}])
+
+
+class WritePatchesTest(TestCase):
+
+    def check(self, schema: dict):
+        graph = parse(schema)
+        file = io.StringIO()
+        count = write_patches(file, graph)
+        entries = list(graph.generate_paths())
+        self.assertEqual(count, len(entries))
+        file.seek(0)
+        samples = list(read_patches(file))
+        self.assertEqual(len(samples), len(entries))
+        for entry, (sample, is_valid) in zip(entries, samples):
+            self.assertEqual(is_valid, entry.is_valid)
+            self.assertEqual(json.dumps(sample, sort_keys=True),
+                             json.dumps(graph.execute(entry.path), sort_keys=True))
+
+    def test_object(self):
+        self.check({
+            'type': 'object',
+            'properties': {
+                'a': {'type': 'string'},
+                'b': {'type': 'object', 'properties': {'c': {'type': 'boolean'}}},
+                'd': {'enum': [1, 2]},
+            },
+            'required': ['a'],
+        })
+
+    def test_array(self):
+        self.check({
+            'type': 'array',
+            'items': {'type': 'object', 'properties': {'a/b': {'type': 'number'}}},
+            'minItems': 2,
+        })
+
+    def test_any_of(self):
+        self.check({
+            'anyOf': [
+                {'type': 'string'},
+                {'type': 'object', 'properties': {'a': {'type': 'integer'}}},
+            ]
+        })
@@ -3,6 +3,7 @@ from fences.open_api.open_api import OpenApi
 from fences.core.render import render
 
 import unittest
+import json
 import os
 import yaml
 
@@ -23,6 +24,8 @@ class GenerateTestCase(unittest.TestCase):
                 request: Request = graph.execute(i.path)
                 if debug:
                     request.dump()
+                if request.body is not None:
+                    self.assertEqual(request.encode_body(), json.dumps(request.body).encode())
 
     def test_simple(self):
         schema = {
@@ -69,6 +72,25 @@ class GenerateTestCase(unittest.TestCase):
         }
         self.check(schema)
 
+    def test_encode_body(self):
+        request = Request(None)
+        self.assertIsNone(request.encode_body())
+        request.set_body({'a': 1}, b'{"a": 1}')
+        self.assertEqual(request.encode_body(), b'{"a": 1}')
+        # The encoding is not used for another body
+        request.body = {'a': 2}
+        self.assertEqual(request.encode_body(), b'{"a": 2}')
+
+    def test_sample_cache_normalizers(self):
+        sample_cache = SampleCache()
+        components = {'schemas': {'a': {'type': 'string'}}}
+        sample_cache.add({'type': 'string'}, False)
+        sample_cache.add({'type': 'number'}, False)
+        sample_cache.add({'$ref': '#/components/schemas/a', 'components': components}, True)
+        sample_cache.add({'type': 'array', 'items': {'$ref': '#/components/schemas/a'}, 'components': components}, True)
+        # One normalizer for all schemas without components, one for the components
+        self.assertEqual(len(sample_cache._normalizers), 2)
+
     def test_aas(self):
         with open(os.path.join(SCRIPT_DIR, '..', 'fixtures', 'open_api', 'aas.yml')) as file:
             schema = yaml.safe_load(file)
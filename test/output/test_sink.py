@@ -0,0 +1,112 @@
+from fences.output.sink import NdjsonSink, GzipNdjsonSink, XmlLineSink, DirectorySink, \
+    encode_json, encode_xml, iterate_samples
+from fences import parse_json_schema, parse_regex
+
+from unittest import TestCase
+from xml.etree import ElementTree
+import gzip
+import json
+import os
+import tempfile
+
+
+class EncodeTest(TestCase):
+
+    def test_json(self):
+        self.assertEqual(encode_json({'a': 'x\ny'}), b'{"a": "x\\ny"}')
+        self.assertEqual(encode_json(b'[1]'), b'[1]')
+
+    def test_xml(self):
+        element = ElementTree.fromstring('<a x="1">b\nc</a>')
+        self.assertEqual(encode_xml(ElementTree.ElementTree(element)), b'<a x="1">b&#10;c</a>')
+        self.assertEqual(ElementTree.fromstring(encode_xml(element)).text, 'b\nc')
+
+
+class SinkTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.graph = parse_json_schema({
+            'type': 'object',
+            'properties': {'a': {'type': 'string'}, 'b': {'type': 'boolean'}},
+            'required': ['a'],
+        })
+        self.samples = list(iterate_samples(self.graph))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, *names: str) -> str:
+        return os.path.join(self.directory.name, *names)
+
+    def read_lines(self, file_name: str, compressed: bool = False) -> list:
+        with (gzip.open if compressed else open)(file_name, 'rb') as file:
+            return [json.loads(line) for line in file]
+
+    def test_ndjson(self):
+        with NdjsonSink(self.path('samples.jsonl'), sync_interval=3) as sink:
+            self.assertEqual(sink.write_all(self.samples), len(self.samples))
+        self.assertEqual(self.read_lines(self.path('samples.jsonl')), [i[1] for i in self.samples])
+
+    def test_partition(self):
+        with GzipNdjsonSink(self.path('samples.jsonl.gz'), partition=True, index=self.path('index.tsv')) as sink:
+            sink.write_all(self.samples)
+        valid = self.read_lines(self.path('samples.valid.jsonl.gz'), True)
+        invalid = self.read_lines(self.path('samples.invalid.jsonl.gz'), True)
+        self.assertEqual(valid, [sample for entry, sample in self.samples if entry.is_valid])
+        self.assertEqual(invalid, [sample for entry, sample in self.samples if not entry.is_valid])
+
+        with open(self.path('index.tsv')) as file:
+            lines = [line.rstrip('\n').split('\t') for line in file]
+        self.assertEqual(lines[0], ['sample', 'valid', 'file', 'line'])
+        self.assertEqual(len(lines), len(self.samples) + 1)
+        for idx, (number, is_valid, file_name, line) in enumerate(lines[1:]):
+            self.assertEqual(int(number), idx)
+            entry, sample = self.samples[idx]
+            self.assertEqual(is_valid, '1' if entry.is_valid else '0')
+            data = valid if entry.is_valid else invalid
+            self.assertEqual(file_name, 'samples.valid.jsonl.gz' if entry.is_valid else 'samples.invalid.jsonl.gz')
+            self.assertEqual(data[int(line)], sample)
+
+    def test_directory(self):
+        with DirectorySink(self.path('out'), partition=True, index=self.path('out', 'index.tsv'),
+                           sync_interval=2) as sink:
+            sink.write_all(self.samples)
+        for idx, (entry, sample) in enumerate(self.samples):
+            file_name = self.path('out', 'valid' if entry.is_valid else 'invalid', f"{idx}.json")
+            with open(file_name) as file:
+                self.assertEqual(json.load(file), sample)
+        with open(self.path('out', 'index.tsv')) as file:
+            self.assertEqual(file.readlines()[1].split('\t')[2:], [os.path.join('valid', '0.json'), '\n'])
+
+    def test_xml(self):
+        elements = [ElementTree.Element('a'), ElementTree.Element('b', {'x': '1\n2'})]
+        with XmlLineSink(self.path('samples.xml')) as sink:
+            for element in elements:
+                sink.write(element, True)
+        with open(self.path('samples.xml'), 'rb') as file:
+            lines = file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(ElementTree.fromstring(lines[1]).get('x'), '1\n2')
+
+    def test_lazy(self):
+        # Samples are written before the next one is created
+        graph = parse_regex('a|b|c')
+        sink = NdjsonSink(self.path('samples.jsonl'))
+
+        def samples():
+            for idx, sample in enumerate(iterate_samples(graph)):
+                self.assertEqual(sink.num_samples, idx)
+                yield sample
+        sink.write_all(samples())
+        sink.close()
+        self.assertEqual(self.read_lines(self.path('samples.jsonl')), ['a', 'b', 'c'])
+
+    def test_invalid(self):
+        with NdjsonSink(self.path('samples.jsonl')) as sink:
+            with self.assertRaises(ValueError):
+                sink.write(b'1\n2', True)
+        with self.assertRaises(ValueError):
+            sink.write(1, True)
+        with self.assertRaises(ValueError):
+            NdjsonSink(self.path('samples.jsonl'), sync_interval=-1)